@@ -0,0 +1,235 @@
+"""Gera arquivos de empresa sintéticos no formato dos dados da Predictus.
+
+Os valores seguem distribuições enviesadas (Zipf) como nos dados reais:
+poucos tribunais, assuntos, partes e advogados concentram a maior parte dos
+processos. A mesma semente gera sempre os mesmos arquivos.
+
+    python benchmarks/generate.py 100k --files 3 --out .cache/bench/100k
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+# Raiz de CNPJ do grupo econômico e as filiais que aparecem como parte
+COMPANY_NAME = "EMPRESA EXEMPLO S/A"
+COMPANY_ROOT = "00000000"
+COMPANY_BRANCHES = ["000191", "000272", "000353", "000434", "000515"]
+
+TRIBUNAIS = (
+    [("TJ" + uf, uf, "JUSTIÇA ESTADUAL") for uf in ("SP", "RJ", "MG", "RS", "PR", "BA", "SC", "PE", "GO", "CE", "DF", "ES", "PA", "MA", "MT", "MS", "PB", "RN", "AL", "PI", "SE", "AM", "RO", "TO", "AC", "AP", "RR")]
+    + [(f"TRT{region}", uf, "JUSTIÇA DO TRABALHO") for region, uf in ((2, "SP"), (1, "RJ"), (3, "MG"), (4, "RS"), (15, "SP"), (9, "PR"), (5, "BA"), (6, "PE"))]
+    + [(f"TRF{region}", uf, "JUSTIÇA FEDERAL") for region, uf in ((3, "SP"), (2, "RJ"), (1, "DF"), (4, "RS"), (5, "PE"))]
+    + [("STJ", "DF", "SUPERIOR"), ("TST", "DF", "SUPERIOR")]
+)
+RAMOS = ["CÍVEL", "TRABALHISTA", "CONSUMIDOR", "TRIBUTÁRIO", "PREVIDENCIÁRIO", "ADMINISTRATIVO", "PENAL", "AMBIENTAL"]
+STATUS = ["ATIVO", "ARQUIVADO", "SUSPENSO", "BAIXADO"]
+JULGAMENTOS = ["PROCEDENTE", "IMPROCEDENTE", "PARCIALMENTE PROCEDENTE", "ACORDO", "EXTINTO SEM MÉRITO", "DESISTÊNCIA"]
+CLASSES = [
+    "Procedimento Comum Cível", "Reclamação Trabalhista", "Execução de Título Extrajudicial",
+    "Procedimento do Juizado Especial Cível", "Cumprimento de Sentença", "Monitória",
+    "Execução Fiscal", "Agravo de Instrumento", "Apelação Cível", "Mandado de Segurança",
+    "Recurso Ordinário Trabalhista", "Embargos à Execução",
+]
+ASSUNTOS = [
+    "Indenização por Dano Moral", "Indenização por Dano Material", "Rescisão do Contrato de Trabalho",
+    "Horas Extras", "Verbas Rescisórias", "Contratos Bancários", "Cobrança", "Inclusão Indevida em Cadastro de Inadimplentes",
+    "Tarifas", "Juros", "Adicional de Insalubridade", "ICMS", "Responsabilidade do Fornecedor", "Planos de Saúde",
+    "Fornecimento de Energia Elétrica", "Seguro", "Acidente de Trânsito", "Obrigação de Fazer / Não Fazer",
+] + [f"Assunto CNJ {code}" for code in range(10000, 10300)]
+MOVIMENTOS = ["Juntada de Petição", "Conclusos para Despacho", "Publicação", "Audiência Designada", "Expedição de Mandado", "Decisão Interlocutória"]
+
+# Variantes de grafia de uma mesma entidade, como aparecem nas bases reais
+BANCOS = ["BANCO ALFA", "BANCO BETA", "BANCO GAMA", "BANCO DELTA", "BANCO OMEGA"]
+SUFIXOS_BANCO = ["S/A", "S.A.", "SA", "S A", ""]
+FIRST_NAMES = ["MARIA", "JOSE", "ANA", "JOAO", "ANTONIO", "FRANCISCO", "CARLOS", "PAULO", "PEDRO", "LUCAS", "LUIZ", "MARCOS", "LUCIANA", "FERNANDA", "PATRICIA", "JULIANA"]
+LAST_NAMES = ["SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "RODRIGUES", "FERREIRA", "ALVES", "PEREIRA", "LIMA", "GOMES", "COSTA", "RIBEIRO", "MARTINS", "CARVALHO", "ALMEIDA", "LOPES"]
+
+
+def zipf_weights(n, exponent=1.1):
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(n)))
+
+
+class ProcessGenerator:
+    def __init__(self, seed=0, people=50_000, companies=2_000, lawyers=5_000):
+        self.random = random.Random(seed)
+        r = self.random
+        self.people = [
+            (f"{r.choice(FIRST_NAMES)} {r.choice(LAST_NAMES)} {r.choice(LAST_NAMES)}", f"{r.randrange(10**11):011d}")
+            for _ in range(people)
+        ]
+        self.companies = [
+            (f"{r.choice(LAST_NAMES)} {r.choice(['COMERCIO', 'SERVICOS', 'INDUSTRIA', 'TRANSPORTES'])} {index} {r.choice(['LTDA', 'LTDA.', 'ME', 'EIRELI', 'S/A'])}", f"{r.randrange(10**14):014d}")
+            for index in range(companies)
+        ]
+        self.banks = [
+            (f"{bank} {suffix}".strip(), f"{r.randrange(10**8):08d}0001{r.randrange(100):02d}")
+            for bank in BANCOS
+            for suffix in SUFIXOS_BANCO
+        ]
+        self.lawyers = [
+            (f"{r.choice(FIRST_NAMES)} {r.choice(LAST_NAMES)}", str(r.randrange(1, 500_000)), r.choice(["SP", "RJ", "MG", "RS", "PR"]))
+            for _ in range(lawyers)
+        ]
+        self.weights = {
+            "tribunal": zipf_weights(len(TRIBUNAIS), 1.3),
+            "assunto": zipf_weights(len(ASSUNTOS), 1.2),
+            "classe": zipf_weights(len(CLASSES)),
+            "ramo": zipf_weights(len(RAMOS)),
+            "julgamento": zipf_weights(len(JULGAMENTOS), 0.8),
+            "people": zipf_weights(people, 0.9),
+            "companies": zipf_weights(companies, 1.1),
+            "banks": zipf_weights(len(self.banks), 0.6),
+            "lawyers": zipf_weights(lawyers, 1.0),
+        }
+
+    def _pick(self, population, weights_key):
+        return self.random.choices(population, cum_weights=self.weights[weights_key])[0]
+
+    def _lawyers(self):
+        r = self.random
+        lawyers = []
+        for _ in range(r.choice((0, 1, 1, 1, 2, 2, 3))):
+            nome, numero, uf = self._pick(self.lawyers, "lawyers")
+            oab = {"numero": numero, "uf": uf} if r.random() > 0.05 else None
+            lawyers.append({"nome": nome, "cpf": None, "oab": oab})
+        return lawyers
+
+    def _party(self, polo):
+        r = self.random
+        kind = r.random()
+        if kind < 0.55:
+            nome, cpf = self._pick(self.people, "people")
+            party = {"nome": nome, "cpf": cpf, "tipo": "FISICA"}
+        elif kind < 0.85:
+            nome, cnpj = self._pick(self.companies, "companies")
+            party = {"nome": nome, "cnpj": cnpj, "tipo": "JURIDICA"}
+        else:
+            nome, cnpj = self._pick(self.banks, "banks")
+            party = {"nome": nome, "cnpj": cnpj, "tipo": "JURIDICA"}
+        party.update(polo=polo, advogados=self._lawyers())
+        return party
+
+    def process(self, number):
+        r = self.random
+        tribunal, uf, segmento = self._pick(TRIBUNAIS, "tribunal")
+        distribuicao = datetime(2008, 1, 1) + timedelta(days=r.randrange(17 * 365), seconds=r.randrange(86400))
+        year = distribuicao.year
+
+        company = {
+            "nome": COMPANY_NAME,
+            "cnpj": COMPANY_ROOT + r.choice(COMPANY_BRANCHES),
+            "tipo": "JURIDICA",
+            "polo": "ATIVO" if r.random() < 0.3 else "PASSIVO",
+            "advogados": self._lawyers(),
+        }
+        other_polo = "PASSIVO" if company["polo"] == "ATIVO" else "ATIVO"
+        partes = [company] + [self._party(other_polo) for _ in range(r.choice((1, 1, 1, 2, 2, 3, 5)))]
+        if r.random() < 0.2:
+            partes.append(self._party(r.choice(("ATIVO", "PASSIVO", "TERCEIRO"))))
+        r.shuffle(partes)
+
+        assuntos = [
+            {"codigoCNJ": 1000 + ASSUNTOS.index(titulo), "titulo": titulo, "ePrincipal": index == 0}
+            for index, titulo in enumerate(dict.fromkeys(self._pick(ASSUNTOS, "assunto") for _ in range(r.choice((1, 1, 2, 2, 3)))))
+        ]
+
+        status = r.choices(STATUS, weights=(45, 40, 5, 10))[0]
+        status_predictus = {
+            "ramoDireito": self._pick(RAMOS, "ramo"),
+            "statusProcesso": status,
+            "julgamentos": [
+                {"tipoJulgamento": self._pick(JULGAMENTOS, "julgamento"), "data": (distribuicao + timedelta(days=r.randrange(30, 1500))).strftime("%Y-%m-%d")}
+                for _ in range(r.choice((0, 0, 1, 1, 2)))
+            ],
+            "valorExecucao": {"valor": round(r.lognormvariate(8.5, 1.6), 2), "data": None} if r.random() < 0.35 else None,
+        }
+        if status in ("ARQUIVADO", "BAIXADO"):
+            status_predictus["dataArquivamento"] = (distribuicao + timedelta(days=int(r.expovariate(1 / 500)))).strftime("%Y-%m-%d")
+        if r.random() < 0.4:
+            status_predictus["dataTransitoJulgado"] = (distribuicao + timedelta(days=int(r.expovariate(1 / 400)))).strftime("%Y-%m-%d")
+
+        return {
+            "numeroProcessoUnico": f"{number:07d}-{r.randrange(100):02d}.{year}.8.{r.randrange(1, 28):02d}.{r.randrange(10000):04d}",
+            "urlProcesso": None,
+            "grauProcesso": r.choices((1, 2, 3), weights=(75, 22, 3))[0],
+            "uf": uf,
+            "tribunal": tribunal,
+            "segmento": segmento,
+            "dataDistribuicao": distribuicao.strftime("%Y-%m-%dT%H:%M:%S"),
+            "classeProcessual": {"codigoCNJ": 100 + r.randrange(900), "nome": self._pick(CLASSES, "classe")},
+            "assuntosCNJ": assuntos,
+            "valorCausa": {"valor": round(r.lognormvariate(9.2, 1.8), 2), "moeda": "R$"} if r.random() < 0.9 else None,
+            "partes": partes,
+            "movimentos": [
+                {"data": (distribuicao + timedelta(days=r.randrange(2000))).strftime("%Y-%m-%d"), "nomeOriginal": r.choice(MOVIMENTOS)}
+                for _ in range(r.randrange(12))
+            ],
+            "statusPredictus": status_predictus,
+        }
+
+
+def generate(out_dir, processes, files=1, seed=0, duplicates=0.02, ndjson=False):
+    """Grava ``processes`` processos em ``files`` arquivos de empresa.
+
+    Uma fração ``duplicates`` dos processos se repete entre arquivos, como
+    quando duas empresas do grupo são partes da mesma ação.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    generator = ProcessGenerator(seed)
+    extension = "ndjson" if ndjson else "json"
+    paths = [os.path.join(out_dir, f"dados_empresa{index + 1}.{extension}") for index in range(files)]
+    handles = [open(path, "w") for path in paths]
+    first = [True] * files
+    try:
+        if not ndjson:
+            for handle in handles:
+                handle.write('{"processos": [\n')
+        recent = []
+        for number in range(processes):
+            target = number % files
+            if files > 1 and recent and generator.random.random() < duplicates:
+                record = generator.random.choice(recent)
+                target = (target + 1) % files
+            else:
+                record = generator.process(number)
+                recent = (recent + [record])[-1000:]
+            line = json.dumps(record, ensure_ascii=False)
+            if ndjson:
+                handles[target].write(line + "\n")
+            else:
+                handles[target].write(("" if first[target] else ",\n") + line)
+                first[target] = False
+        if not ndjson:
+            for handle in handles:
+                handle.write("\n]}\n")
+    finally:
+        for handle in handles:
+            handle.close()
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos de processos.")
+    parser.add_argument("size", help=f"quantidade de processos ou um de {', '.join(SIZES)}")
+    parser.add_argument("--out", default=None, help="diretório de saída (padrão: .cache/bench/<size>)")
+    parser.add_argument("--files", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--duplicates", type=float, default=0.02)
+    parser.add_argument("--ndjson", action="store_true")
+    args = parser.parse_args(argv)
+
+    processes = SIZES.get(args.size.lower()) or int(args.size)
+    out_dir = args.out or os.path.join(".cache", "bench", args.size.lower())
+    for path in generate(out_dir, processes, args.files, args.seed, args.duplicates, args.ndjson):
+        print(f"{path}: {os.path.getsize(path) / 1024 ** 2:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
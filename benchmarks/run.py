@@ -0,0 +1,221 @@
+"""Mede tempo e memória da carga e das extrações sobre dados sintéticos.
+
+Para cada tamanho, gera os arquivos (uma vez, em .cache/bench/<tamanho>) e
+mede ``load_data``, a montagem das tabelas do ``Dataset``, ``extract_data``
+completo e cada ``extract_*``. O resultado vai para um JSON, por padrão
+``benchmarks/results/<commit>.json``, que pode ser comparado com o de outro
+commit via ``--compare``.
+
+    python benchmarks/run.py --sizes 10k 100k
+    python benchmarks/run.py --sizes 10k --compare benchmarks/results/abc1234.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd  # noqa: E402
+
+import generate  # noqa: E402
+import main as app  # noqa: E402
+from cube import build_process_cube  # noqa: E402
+from dataset import Dataset  # noqa: E402
+from entities import EntityResolver, cnpj_roots, resolve_names  # noqa: E402
+from filters import FilterIndex, TimeIndex  # noqa: E402
+from ingest import DEDUP_MERGE_PARTIES, deduplicate  # noqa: E402
+from names import normalize_names  # noqa: E402
+from tables import CnpjIndex, arrow_nested_columns, build_parties_tables, build_subjects_table  # noqa: E402
+
+TERM = generate.COMPANY_ROOT + generate.COMPANY_BRANCHES[0]
+FILES_PER_SIZE = 3
+# Filtro cruzado típico: um estado e dois anos de distribuição
+FILTER = {"uf": ["SP"], "anoDistribuicao": [2021, 2022]}
+# Período que corta dois anos ao meio
+PERIOD = (pd.Timestamp("2019-07-01"), pd.Timestamp("2022-07-01"))
+
+
+def measure(function, memory=True):
+    """Executa ``function`` e devolve o resultado, o tempo de parede, o tempo
+    de CPU e, com ``memory``, o pico de memória alocada pelo Python durante
+    uma segunda execução (o tracemalloc distorce o tempo)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = function()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+        peak = None
+        if memory:
+            tracemalloc.start()
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return result, {"seconds": wall, "cpu_seconds": cpu, "peak_bytes": peak}
+
+
+def dataset_benchmarks(files):
+    """Lista de (nome, função[, preparo]) medidos para um conjunto de
+    arquivos. Funções que dependem do dataset recebem o frame já carregado e
+    tipado; o preparo, se houver, roda antes e fica fora da medida."""
+    loaded = {}
+
+    def dataset():
+        if "dataset" not in loaded:
+            loaded["dataset"] = app.load_dataset(files, use_cache=False, fields=app.EXTRACT_DATA_FIELDS)
+            loaded["df"] = loaded["dataset"].df
+        return loaded["dataset"]
+
+    def fresh():
+        # Dataset novo sobre o mesmo frame: tabelas derivadas recalculadas
+        return Dataset(dataset().df)
+
+    def panel():
+        # Painel depois da primeira troca de filtro: tabelas, cubo do termo e
+        # índices já montados (o cubo pode vir do disco, sem montar o índice
+        # de CNPJ que as pontas de um período usam; ver "CnpjIndex" e
+        # "FilterIndex" para o custo único de cada um)
+        if "panel" not in loaded:
+            app.compute_data(dataset(), TERM)
+            dataset().cnpj_index
+            dataset().filter_index
+            loaded["panel"] = True
+        return dataset()
+
+    def arrow_df():
+        if "arrow_df" not in loaded:
+            loaded["arrow_df"] = arrow_nested_columns(dataset().df)
+        return loaded["arrow_df"]
+
+    ds = lambda: dataset()  # noqa: E731
+    df = lambda: dataset().df  # noqa: E731
+
+    return [
+        ("load_data", lambda: app.load_data(files, use_cache=False)),
+        ("load_data[fields]", lambda: app.load_data(files, use_cache=False, fields=app.EXTRACT_DATA_FIELDS)),
+        ("load_data[cache]", lambda: app.load_data(files, fields=app.EXTRACT_DATA_FIELDS)),
+        ("load_data[cache+arrow]", lambda: app.load_data(files, fields=app.EXTRACT_DATA_FIELDS, arrow_nested=True)),
+        ("deduplicate", lambda: deduplicate(pd.concat([df(), df()], ignore_index=True))),
+        ("deduplicate[merge_partes]", lambda: deduplicate(pd.concat([df(), df()], ignore_index=True), policy=DEDUP_MERGE_PARTIES)),
+        ("build_parties_tables[arrow]", lambda: build_parties_tables(arrow_df())),
+        ("build_subjects_table", lambda: build_subjects_table(df())),
+        ("build_parties_tables", lambda: build_parties_tables(df())),
+        ("CnpjIndex", lambda: CnpjIndex(ds().parties)),
+        ("cnpj_root", lambda: ds().rows_by_cnpj(generate.COMPANY_ROOT, "PASSIVO")),
+        ("build_process_cube", lambda: build_process_cube(df(), ds().rows_by_cnpj(TERM, "ATIVO"), ds().rows_by_cnpj(TERM, "PASSIVO"))),
+        ("FilterIndex", lambda: FilterIndex(df())),
+        ("filter[uf+ano]", lambda: ds().filter_index.rows(FILTER)),
+        ("TimeIndex", lambda: TimeIndex(df()["dataDistribuicao"], df()["anoDistribuicao"])),
+        ("cube[period]", lambda: ds().filtered({}, PERIOD).cube(TERM)),
+        ("extract_data", lambda: app.compute_data(fresh(), TERM)),
+        ("extract_data[filtered]", lambda: app.compute_data(ds().filtered(FILTER), TERM)),
+        ("extract_data[period]", lambda: app.compute_data(ds().filtered({}, PERIOD), TERM)),
+        ("extract_data[tables ready]", lambda: app.compute_data(ds(), TERM)),
+        # Troca de filtro no painel: recorte pelo FilterIndex e fatia do cubo,
+        # sem o cache em memória (o snapshot do recorte não existe)
+        ("filter_change[uf+ano]", lambda: app.load_or_compute_data(panel().filtered(FILTER), TERM), panel),
+        ("filter_change[uf+ano+period]", lambda: app.load_or_compute_data(panel().filtered(FILTER, PERIOD), TERM), panel),
+        ("extract_dist_vs_arq", lambda: app.extract_dist_vs_arq(df().copy(deep=False))),
+        ("extract_distribution_by_column", lambda: app.extract_distribution_by_column(df(), "tribunal", ["Tribunal", "Total"], True)),
+        ("extract_top_principal_subjects", lambda: app.extract_top_principal_subjects(ds().subjects, True)),
+        ("extract_distribution_from_principal_subjects", lambda: app.extract_distribution_from_principal_subjects(ds().subjects, ["Assunto", "Total"], True)),
+        ("extract_principal_subjects_per_year", lambda: app.extract_principal_subjects_per_year(ds().subjects)),
+        ("resolve_entities", lambda: resolve_names(normalize_names(ds().parties["nome"]), EntityResolver(cache_dir=None), cnpj_roots(ds().parties["cnpj"]))),
+        ("extract_top_parties", lambda: app.extract_top_parties(ds().parties, 10)),
+        ("extract_top_parties[merge]", lambda: app.extract_top_parties(ds().parties, 10, merge_variants=True)),
+        ("extract_top_lawyers", lambda: app.extract_top_lawyers(ds().lawyers, 10)),
+        ("extract_top_parties_approximate", lambda: app.extract_top_parties_approximate(df()["partes"], 10)),
+        ("extract_state_data", lambda: app.extract_state_data(df())),
+    ]
+
+
+def run_size(size, seed, memory, only=None):
+    data_dir = os.path.join(ROOT, ".cache", "bench", f"{size}-s{seed}")
+    files = [os.path.join(data_dir, f"dados_empresa{index + 1}.json") for index in range(FILES_PER_SIZE)]
+    if not all(os.path.exists(path) for path in files):
+        print(f"[{size}] gerando dados em {data_dir}", file=sys.stderr)
+        generate.generate(data_dir, generate.SIZES[size], FILES_PER_SIZE, seed)
+
+    # Cache em disco já aquecido para medir só a leitura
+    app.load_data(files, fields=app.EXTRACT_DATA_FIELDS)
+
+    results = []
+    for name, function, *setup in dataset_benchmarks(files):
+        if only and not any(pattern in name for pattern in only):
+            continue
+        for step in setup:
+            step()
+        _, metrics = measure(function, memory)
+        results.append({"size": size, "name": name, **metrics})
+        peak = f"{metrics['peak_bytes'] / 1024 ** 2:9.1f} MB" if metrics["peak_bytes"] is not None else ""
+        print(f"[{size}] {name:<46} {metrics['seconds']:9.3f} s {peak}", file=sys.stderr)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current, previous_path):
+    with open(previous_path, "r") as f:
+        previous = {(row["size"], row["name"]): row for row in json.load(f)["results"]}
+    print(f"\ncomparação com {previous_path} (razão atual / anterior):")
+    for row in current["results"]:
+        before = previous.get((row["size"], row["name"]))
+        if before is None or not before["seconds"]:
+            continue
+        ratio = row["seconds"] / before["seconds"]
+        flag = "  <-- regressão" if ratio > 1.2 else ""
+        print(f"  [{row['size']}] {row['name']:<46} {ratio:6.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de carga e extração.")
+    parser.add_argument("--sizes", nargs="+", default=["10k", "100k"], choices=list(generate.SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="*", help="roda só os benchmarks cujo nome contém um destes trechos")
+    parser.add_argument("--no-memory", action="store_true", help="não mede o pico de memória")
+    parser.add_argument("--output", help="arquivo JSON de saída")
+    parser.add_argument("--compare", help="resultado anterior para comparar")
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)  # caminhos de resource/ são relativos à raiz
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "seed": args.seed,
+        "results": [],
+    }
+    for size in args.sizes:
+        report["results"] += run_size(size, args.seed, not args.no_memory, args.only)
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"resultados em {output}", file=sys.stderr)
+
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,419 @@
+import argparse
+import gc
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from ingest import load_company_file
+from tables import arrow_nested_columns
+
+CACHE_DIR = ".cache/datasets"
+CACHE_VERSION = 1
+
+_JSON_COLUMNS_KEY = b"general_vision.json_columns"
+
+
+def content_hash(file_path, block_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(file_path):
+    stat = os.stat(file_path)
+    return {
+        "path": os.path.abspath(file_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def fields_options(fields):
+    """Opções de cache de uma carga que mantém só ``fields`` (``None``
+    para os registros inteiros), as mesmas usadas por ``main.load_data``."""
+    return {"fields": sorted(fields)} if fields is not None else None
+
+
+def options_key(options):
+    return json.dumps({"version": CACHE_VERSION, **(options or {})}, sort_keys=True)
+
+
+def frame_to_arrow(df):
+    """Converte o frame normalizado para Arrow. Colunas aninhadas viram
+    list<struct>; as que o Arrow não consegue tipar são gravadas como JSON."""
+    arrays, json_columns = [], []
+    for column in df.columns:
+        try:
+            arrays.append(pa.array(df[column], from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            arrays.append(
+                pa.array([json.dumps(value) for value in df[column]], type=pa.string())
+            )
+            json_columns.append(column)
+    table = pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns])
+    return table.replace_schema_metadata(
+        {_JSON_COLUMNS_KEY: json.dumps(json_columns).encode()}
+    )
+
+
+@contextmanager
+def _gc_paused():
+    # Milhões de listas e dicts criados de uma vez disparam o coletor de
+    # ciclos a cada poucos milhares de objetos, sem nada para coletar
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def frame_from_arrow(table, arrow_nested=False, arrow_strings=False):
+    """Frame de uma tabela gravada por ``frame_to_arrow``. Com
+    ``arrow_nested`` (list<struct>) e ``arrow_strings`` (textos), essas
+    colunas ficam nos buffers da tabela, sem cópia, como ``pd.ArrowDtype``."""
+    with _gc_paused():
+        return _frame_from_arrow(table, arrow_nested, arrow_strings)
+
+
+def _frame_from_arrow(table, arrow_nested, arrow_strings):
+    metadata = table.schema.metadata or {}
+    json_columns = set(json.loads(metadata.get(_JSON_COLUMNS_KEY, b"[]")))
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        if name in json_columns:
+            columns[name] = pd.Series(
+                [json.loads(value) for value in column.to_pylist()], dtype=object
+            )
+        elif (
+            arrow_nested
+            and pa.types.is_list(column.type)
+            and pa.types.is_struct(column.type.value_type)
+        ):
+            # Sem cópia: a coluna fica nos buffers lidos do arquivo
+            columns[name] = pd.Series(pd.arrays.ArrowExtensionArray(column))
+        elif arrow_strings and (
+            pa.types.is_string(column.type) or pa.types.is_large_string(column.type)
+        ):
+            columns[name] = pd.Series(pd.arrays.ArrowExtensionArray(column))
+        elif pa.types.is_list(column.type) or pa.types.is_struct(column.type):
+            # Mantém listas/dicts do Python, como sai do json_normalize
+            columns[name] = pd.Series(column.to_pylist(), dtype=object)
+        else:
+            columns[name] = column.to_pandas()
+    return pd.DataFrame(columns, index=pd.RangeIndex(table.num_rows))
+
+
+class DatasetCache:
+    """Cache em disco (Arrow IPC) dos frames normalizados de cada arquivo.
+
+    Cada entrada é identificada pelo caminho do arquivo e pelas opções de
+    carga, e guarda tamanho, mtime e hash do conteúdo da fonte. Se o arquivo
+    mudou de tamanho ou de conteúdo, a entrada é descartada automaticamente.
+
+    ``get_frame``/``put_frame`` guardam, do mesmo jeito, o frame final de um
+    conjunto de arquivos (já sem duplicados e tipado), para que a carga
+    seguinte seja só a leitura de um arquivo.
+    """
+
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+
+    def _key_paths(self, key, options):
+        key = key + "\0" + options_key(options)
+        name = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        base = os.path.join(self.root, name)
+        return base + ".json", base + ".arrow"
+
+    def _entry_paths(self, file_path, options=None):
+        return self._key_paths(os.path.abspath(file_path), options)
+
+    def _frame_paths(self, file_paths, options=None):
+        key = "\0".join(os.path.abspath(path) for path in file_paths)
+        return self._key_paths("frame\0" + key, options)
+
+    def _read_meta(self, meta_path):
+        try:
+            with open(meta_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, meta_path, meta):
+        tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def _invalidate(self, meta_path, data_path):
+        for path in (meta_path, data_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _source_meta(self, file_path):
+        return {**file_fingerprint(file_path), "content_hash": content_hash(file_path)}
+
+    def _source_changed(self, source):
+        """Se o arquivo de ``source`` (o que ``_source_meta`` gravou) mudou.
+        Um arquivo só tocado tem o mtime atualizado em ``source``."""
+        try:
+            current = file_fingerprint(source["path"])
+        except OSError:
+            return True
+        if current["size"] != source["size"]:
+            return True
+        if current["mtime_ns"] != source["mtime_ns"]:
+            # Arquivo tocado: só o hash decide se o conteúdo mudou
+            if content_hash(source["path"]) != source["content_hash"]:
+                return True
+            source["mtime_ns"] = current["mtime_ns"]
+        return False
+
+    def _fresh_meta(self, meta_path, data_path, sources):
+        # Meta da entrada se todas as fontes estão como foram gravadas
+        meta = self._read_meta(meta_path)
+        if meta is None or not os.path.exists(data_path):
+            return None
+        entries = sources(meta)
+        mtimes = [entry["mtime_ns"] for entry in entries]
+        if any(self._source_changed(entry) for entry in entries):
+            self._invalidate(meta_path, data_path)
+            return None
+        if mtimes != [entry["mtime_ns"] for entry in entries]:
+            self._write_meta(meta_path, meta)
+        return meta
+
+    def _read_table(self, data_path):
+        with pa.memory_map(data_path, "r") as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def _write_table(self, data_path, df):
+        table = frame_to_arrow(df)
+        tmp_path = f"{data_path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, data_path)
+
+    def is_fresh(self, file_path, options=None):
+        meta_path, data_path = self._entry_paths(file_path, options)
+        return self._fresh_meta(meta_path, data_path, lambda meta: [meta]) is not None
+
+    def get(self, file_path, options=None, arrow_nested=False):
+        """Frame em cache do arquivo, ou ``None``. Com ``arrow_nested``, as
+        colunas de listas de dicts ficam em Arrow em vez de virar objetos."""
+        if not self.is_fresh(file_path, options):
+            return None
+        _, data_path = self._entry_paths(file_path, options)
+        return frame_from_arrow(self._read_table(data_path), arrow_nested)
+
+    def put(self, file_path, df, options=None):
+        os.makedirs(self.root, exist_ok=True)
+        meta_path, data_path = self._entry_paths(file_path, options)
+        meta = {**self._source_meta(file_path), "options": options_key(options)}
+        self._write_table(data_path, df)
+        self._write_meta(meta_path, meta)
+
+    def get_frame(self, file_paths, options=None, arrow_nested=False):
+        """Frame final de ``file_paths`` gravado por ``put_frame``, ou
+        ``None`` se algum dos arquivos mudou. Os ``attrs`` do frame gravado
+        são restaurados; os tipos do schema, não (ver ``schema.apply_schema``)."""
+        meta_path, data_path = self._frame_paths(file_paths, options)
+        meta = self._fresh_meta(meta_path, data_path, lambda meta: meta["sources"])
+        if meta is None:
+            return None
+        df = frame_from_arrow(self._read_table(data_path), arrow_nested)
+        df.attrs.update(meta["attrs"])
+        return df
+
+    def put_frame(self, file_paths, df, options=None):
+        os.makedirs(self.root, exist_ok=True)
+        meta_path, data_path = self._frame_paths(file_paths, options)
+        meta = {
+            "sources": [self._source_meta(path) for path in file_paths],
+            "options": options_key(options),
+            "attrs": json.loads(json.dumps(df.attrs, default=str)),
+        }
+        self._write_table(data_path, df)
+        self._write_meta(meta_path, meta)
+
+    def load(
+        self,
+        file_path,
+        loader=load_company_file,
+        options=None,
+        arrow_nested=False,
+        **kwargs,
+    ):
+        df = self.get(file_path, options, arrow_nested)
+        if df is None:
+            df = loader(file_path, **kwargs)
+            self.put(file_path, df, options)
+            if arrow_nested:
+                df = arrow_nested_columns(df)
+        return df
+
+    def purge(self, file_paths=None):
+        """Remove as entradas dos arquivos informados, ou o cache inteiro."""
+        if not os.path.isdir(self.root):
+            return 0
+        if file_paths is None:
+            names = os.listdir(self.root)
+        else:
+            targets = {os.path.abspath(path) for path in file_paths}
+            names = []
+            for name in os.listdir(self.root):
+                if not name.endswith(".json"):
+                    continue
+                meta = self._read_meta(os.path.join(self.root, name))
+                if meta is None:
+                    continue
+                # Entradas de um arquivo ou frames de um conjunto deles
+                paths = [meta["path"]] if "path" in meta else []
+                paths += [source["path"] for source in meta.get("sources", [])]
+                if targets.intersection(paths):
+                    names += [name, name[: -len(".json")] + ".arrow"]
+        removed = 0
+        for name in names:
+            try:
+                os.remove(os.path.join(self.root, name))
+                removed += name.endswith(".arrow")
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+def estimate_size(value):
+    """Estimativa, em bytes, da memória ocupada por um resultado."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(key) + estimate_size(item) for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class MemoryCache:
+    """Cache LRU em memória, limitado pelo tamanho estimado dos valores.
+
+    Compartilhado entre as sessões do Streamlit (que rodam em threads do
+    mesmo processo). Conta acertos, faltas e descartes em ``stats()``.
+    """
+
+    def __init__(self, max_bytes, sizeof=estimate_size):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return  # não cabe nem sozinho: não vale expulsar os demais
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cache dos dados normalizados.")
+    parser.add_argument("--dir", default=CACHE_DIR, help="diretório do cache")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    warm = commands.add_parser("warm", help="carrega e grava os arquivos no cache")
+    warm.add_argument("files", nargs="+")
+    warm.add_argument("--fields", nargs="+", help="campos mantidos na carga")
+    warm.add_argument(
+        "--dashboard",
+        action="store_true",
+        help="usa os campos do painel (main.EXTRACT_DATA_FIELDS)",
+    )
+
+    purge = commands.add_parser("purge", help="remove entradas do cache")
+    purge.add_argument("files", nargs="*", help="padrão: todo o cache")
+
+    args = parser.parse_args(argv)
+    cache = DatasetCache(args.dir)
+
+    if args.command == "warm":
+        fields = args.fields
+        if args.dashboard:
+            # Mesma chave que o painel lê; importado só aqui por causa do Streamlit
+            from main import EXTRACT_DATA_FIELDS
+
+            fields = EXTRACT_DATA_FIELDS
+        options = fields_options(fields)
+        for file in args.files:
+            fresh = cache.is_fresh(file, options)
+            df = cache.load(file, options=options, fields=fields)
+            print(
+                f"{file}: {len(df)} processos ({'já em cache' if fresh else 'gravado'})"
+            )
+    else:
+        removed = cache.purge(args.files or None)
+        print(f"{removed} entradas removidas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,403 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import schema
+import tables
+from distributions import distribution_frame
+from schema import YEAR_COLUMN
+from versions import code_version
+
+CUBE_DIR = ".cache/cubes"
+# Incrementar quando o formato do arquivo mudar; mudanças no código que monta
+# o cubo já mudam CUBE_CODE_VERSION
+CUBE_VERSION = 1
+
+POLE_DIMENSION = "polo"
+# Polo do termo em cada processo: bit 1 = ativo, bit 2 = passivo
+POLES = ["NENHUM", "ATIVO", "PASSIVO", "AMBOS"]
+ACTIVE_POLES = ["ATIVO", "AMBOS"]
+PASSIVE_POLES = ["PASSIVO", "AMBOS"]
+
+CUBE_DIMENSIONS = [
+    YEAR_COLUMN,
+    "uf",
+    "tribunal",
+    "statusPredictus.ramoDireito",
+    "statusPredictus.statusProcesso",
+    "grauProcesso",
+    "segmento",
+]
+
+COUNT = "quantidade"
+CUBE_MEASURES = {
+    "valor_causa": "valorCausa.valor",
+    "valor_execucao": "statusPredictus.valorExecucao.valor",
+}
+
+_METADATA_KEY = b"general_vision.cube"
+
+
+def _encode(values):
+    # Códigos (-1 para nulos) e rótulos, na ordem das categorias ou crescente
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return (
+            values.cat.codes.to_numpy().astype(np.int64),
+            values.cat.categories.tolist(),
+        )
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes.astype(np.int64), uniques.tolist()
+
+
+def _aggregate(codes, sizes, measures):
+    """Agrupa as linhas com os mesmos códigos em células: devolve os códigos
+    de cada célula (uma coluna por dimensão) e a soma de cada medida."""
+    shifted = [column + 1 for column in codes]  # nulo (-1) vira o código 0
+    sizes = [size + 1 for size in sizes]
+    if np.prod(sizes, dtype="float64") < 2**62:
+        # Uma chave inteira por linha; `np.unique` num array 1-D é bem mais rápido
+        cells, inverse = np.unique(
+            np.ravel_multi_index(shifted, sizes), return_inverse=True
+        )
+        cell_codes = [column - 1 for column in np.unravel_index(cells, sizes)]
+    else:
+        cells, inverse = np.unique(
+            np.stack(shifted, axis=1), axis=0, return_inverse=True
+        )
+        cell_codes = [column - 1 for column in cells.T]
+    inverse = inverse.reshape(-1)
+    aggregated = {
+        name: np.bincount(inverse, weights=values, minlength=len(cells)).astype(
+            values.dtype
+        )
+        for name, values in measures.items()
+    }
+    return [column.astype(np.int32) for column in cell_codes], aggregated
+
+
+class Cube:
+    """Cubo de agregação dos processos: contagem e somas de valores por
+    combinação das dimensões.
+
+    Guarda só as combinações que existem (células), como arrays: um código
+    por dimensão (-1 para nulo) e uma soma por medida. ``rollup`` e
+    ``slice`` devolvem cubos menores, sem voltar ao frame, e ``series``
+    dá uma medida por valor de uma dimensão, pronta para os gráficos.
+    """
+
+    def __init__(self, dimensions, labels, codes, measures):
+        self.dimensions = list(dimensions)
+        self.labels = dict(zip(self.dimensions, labels))
+        self.codes = dict(zip(self.dimensions, codes))
+        self.measures = measures
+
+    @classmethod
+    def from_columns(cls, dimensions, measures):
+        """Cubo a partir de colunas alinhadas: ``dimensions`` e ``measures``
+        mapeiam cada nome a uma Series. Valores nulos das medidas somam 0."""
+        encoded = [_encode(values) for values in dimensions.values()]
+        size = len(next(iter(dimensions.values()))) if dimensions else 0
+        weights = {COUNT: np.ones(size, dtype=np.int64)}
+        for name, values in measures.items():
+            weights[name] = np.nan_to_num(
+                values.to_numpy(dtype="float64", na_value=np.nan)
+            )
+        codes, aggregated = _aggregate(
+            [codes for codes, _ in encoded],
+            [len(labels) for _, labels in encoded],
+            weights,
+        )
+        return cls(
+            dimensions.keys(), [labels for _, labels in encoded], codes, aggregated
+        )
+
+    def __len__(self):
+        return len(self.measures[COUNT])
+
+    def rollup(self, dimensions):
+        """Cubo só com ``dimensions``, somando as demais."""
+        codes, aggregated = _aggregate(
+            [self.codes[dimension].astype(np.int64) for dimension in dimensions],
+            [len(self.labels[dimension]) for dimension in dimensions],
+            self.measures,
+        )
+        return Cube(
+            dimensions,
+            [self.labels[dimension] for dimension in dimensions],
+            codes,
+            aggregated,
+        )
+
+    def slice(self, filters):
+        """Cubo com as células cujos valores estão em ``filters`` (``{dimensão:
+        valores}``); dimensões sem valores não filtram."""
+        keep = np.ones(len(self), dtype=bool)
+        for dimension, values in filters.items():
+            if not values:
+                continue
+            by_label = {
+                str(label): code for code, label in enumerate(self.labels[dimension])
+            }
+            wanted = [
+                by_label[str(value)] for value in values if str(value) in by_label
+            ]
+            keep &= np.isin(self.codes[dimension], wanted)
+        return Cube(
+            self.dimensions,
+            [self.labels[dimension] for dimension in self.dimensions],
+            [self.codes[dimension][keep] for dimension in self.dimensions],
+            {name: values[keep] for name, values in self.measures.items()},
+        )
+
+    def scaled(self, factor):
+        """Cubo com as medidas multiplicadas por ``factor``; com -1, somá-lo
+        a outro via ``merge`` desconta as suas células."""
+        return Cube(
+            self.dimensions,
+            [self.labels[dimension] for dimension in self.dimensions],
+            [self.codes[dimension] for dimension in self.dimensions],
+            {name: values * factor for name, values in self.measures.items()},
+        )
+
+    def merge(self, other):
+        """Cubo com as células dos dois cubos somadas, sem as que ficam sem
+        processos. As dimensões e medidas são as deste cubo; rótulos que só
+        ``other`` tem entram no fim."""
+        labels, codes = [], []
+        for dimension in self.dimensions:
+            merged = list(self.labels[dimension])
+            position = {str(label): code for code, label in enumerate(merged)}
+            # Última posição para o código -1 (nulo) continuar nulo
+            remap = np.full(len(other.labels[dimension]) + 1, -1, dtype=np.int64)
+            for code, label in enumerate(other.labels[dimension]):
+                if str(label) not in position:
+                    position[str(label)] = len(merged)
+                    merged.append(label)
+                remap[code] = position[str(label)]
+            labels.append(merged)
+            codes.append(
+                np.concatenate(
+                    (self.codes[dimension], remap[other.codes[dimension]])
+                ).astype(np.int64)
+            )
+        measures = {
+            name: np.concatenate((values, other.measures[name]))
+            for name, values in self.measures.items()
+        }
+        cell_codes, aggregated = _aggregate(
+            codes, [len(dimension_labels) for dimension_labels in labels], measures
+        )
+        keep = aggregated[COUNT] != 0
+        return Cube(
+            self.dimensions,
+            labels,
+            [column[keep] for column in cell_codes],
+            {name: values[keep] for name, values in aggregated.items()},
+        )
+
+    def totals(self):
+        return {name: values.sum().item() for name, values in self.measures.items()}
+
+    def series(self, dimension, measure=COUNT):
+        """``measure`` por valor de ``dimension`` (nulos de fora), na ordem
+        dos rótulos."""
+        codes = self.codes[dimension]
+        valid = codes >= 0
+        labels = self.labels[dimension]
+        values = np.bincount(
+            codes[valid], weights=self.measures[measure][valid], minlength=len(labels)
+        ).astype(self.measures[measure].dtype)
+        return pd.Series(values, index=pd.Index(labels, dtype=object))
+
+    def to_arrow(self):
+        columns = {
+            f"d{index}": self.codes[dimension]
+            for index, dimension in enumerate(self.dimensions)
+        }
+        columns.update({f"m:{name}": values for name, values in self.measures.items()})
+        table = pa.table(columns)
+        metadata = {
+            "version": CUBE_VERSION,
+            "dimensions": self.dimensions,
+            "labels": [self.labels[dimension] for dimension in self.dimensions],
+        }
+        return table.replace_schema_metadata(
+            {_METADATA_KEY: json.dumps(metadata, default=str).encode()}
+        )
+
+    @classmethod
+    def from_arrow(cls, table):
+        metadata = json.loads(table.schema.metadata[_METADATA_KEY])
+        dimensions = metadata["dimensions"]
+        codes = [
+            table.column(f"d{index}").to_numpy() for index in range(len(dimensions))
+        ]
+        measures = {
+            name[2:]: table.column(name).to_numpy()
+            for name in table.column_names
+            if name.startswith("m:")
+        }
+        return cls(dimensions, metadata["labels"], codes, measures)
+
+
+def build_process_cube(df, active_rows, passive_rows):
+    """Cubo dos processos de ``df`` sobre ``CUBE_DIMENSIONS`` e o polo do
+    termo, a partir das linhas em que ele é parte ativa e passiva."""
+    poles = np.zeros(len(df), dtype=np.int8)
+    poles[active_rows] |= 1
+    poles[passive_rows] |= 2
+    dimensions = {
+        dimension: df[dimension]
+        for dimension in CUBE_DIMENSIONS
+        if dimension in df.columns
+    }
+    dimensions[POLE_DIMENSION] = pd.Series(
+        pd.Categorical.from_codes(poles, categories=POLES)
+    )
+    measures = {
+        name: df[column]
+        for name, column in CUBE_MEASURES.items()
+        if column in df.columns
+    }
+    return Cube.from_columns(dimensions, measures)
+
+
+def cube_distributions(cube, specs):
+    """Como ``distributions.count_distributions``, mas lendo as contagens do
+    cubo: ``specs`` mapeia cada chave a ``(dimensão, nomes, cut, cut_limit)``."""
+    return {
+        key: distribution_frame(
+            cube.series(dimension), new_column_names, cut, cut_limit
+        )
+        for key, (dimension, new_column_names, cut, cut_limit) in specs.items()
+    }
+
+
+# Versão do código que monta os cubos, gravada com cada um
+CUBE_CODE_VERSION = code_version(
+    CUBE_VERSION,
+    CUBE_DIMENSIONS,
+    CUBE_MEASURES,
+    POLES,
+    _encode,
+    _aggregate,
+    Cube,
+    build_process_cube,
+    schema,
+    tables.CnpjIndex,
+    tables.normalize_term,
+)
+
+_META_FILE = "meta.json"
+
+
+def _current(metadata, version):
+    return metadata.get("version") == CUBE_VERSION and metadata.get("code") == version
+
+
+class CubeStore:
+    """Cubos gravados em disco (Arrow IPC), um arquivo por (fingerprint do
+    dataset, termo), lidos por memory map.
+
+    Cada cubo guarda a versão do código que o montou, e um cubo de outra
+    versão não é lido. O ``meta.json`` de cada dataset guarda as fontes e
+    as opções de carga, para que ``prune`` remova os cubos de datasets que
+    mudaram.
+    """
+
+    def __init__(self, root=CUBE_DIR, version=CUBE_CODE_VERSION):
+        self.root = root
+        self.version = version
+
+    def _path(self, fingerprint, term):
+        name = hashlib.blake2b(str(term).encode(), digest_size=8).hexdigest()
+        return os.path.join(self.root, fingerprint, f"{name}.arrow")
+
+    def get(self, fingerprint, term):
+        path = self._path(fingerprint, term)
+        if not os.path.exists(path):
+            return None
+        try:
+            with pa.memory_map(path, "r") as source:
+                table = pa.ipc.open_file(source).read_all()
+            if not _current(
+                json.loads(table.schema.metadata[_METADATA_KEY]), self.version
+            ):
+                return None
+            return Cube.from_arrow(table)
+        except (OSError, KeyError, TypeError, ValueError, pa.ArrowInvalid):
+            return None  # arquivo incompleto: recalculado
+
+    def put(self, fingerprint, term, cube, sources=None, options=None):
+        path = self._path(fingerprint, term)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        table = cube.to_arrow()
+        metadata = json.loads(table.schema.metadata[_METADATA_KEY])
+        metadata["code"] = self.version
+        table = table.replace_schema_metadata(
+            {_METADATA_KEY: json.dumps(metadata, default=str).encode()}
+        )
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        if sources is not None:
+            meta = {
+                "sources": [os.path.abspath(source) for source in sources],
+                "options": options or {},
+            }
+            tmp_meta = os.path.join(directory, f"{_META_FILE}.{os.getpid()}.tmp")
+            with open(tmp_meta, "w") as f:
+                json.dump(meta, f, default=str)
+            os.replace(tmp_meta, os.path.join(directory, _META_FILE))
+
+    def _read_meta(self, directory):
+        try:
+            with open(os.path.join(directory, _META_FILE), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def prune(self, fingerprint_of):
+        """Remove os cubos de datasets que mudaram (ou sem ``meta.json``) e
+        os montados por outra versão do código. ``fingerprint_of(sources,
+        options)`` recalcula o fingerprint atual de um dataset."""
+        if not os.path.isdir(self.root):
+            return 0
+        removed = 0
+        for fingerprint in os.listdir(self.root):
+            directory = os.path.join(self.root, fingerprint)
+            meta = self._read_meta(directory)
+            try:
+                fresh = (
+                    meta is not None
+                    and fingerprint_of(meta["sources"], meta["options"]) == fingerprint
+                )
+            except OSError:
+                fresh = False  # fonte removida
+            for name in os.listdir(directory):
+                if not name.endswith(".arrow"):
+                    continue
+                path = os.path.join(directory, name)
+                if fresh:
+                    try:
+                        with pa.memory_map(path, "r") as source:
+                            metadata = json.loads(
+                                pa.ipc.open_file(source).schema.metadata[_METADATA_KEY]
+                            )
+                        if _current(metadata, self.version):
+                            continue
+                    except (OSError, KeyError, TypeError, ValueError, pa.ArrowInvalid):
+                        pass
+                os.remove(path)
+                removed += 1
+            if not any(name.endswith(".arrow") for name in os.listdir(directory)):
+                shutil.rmtree(directory, ignore_errors=True)
+        return removed
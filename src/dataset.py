@@ -0,0 +1,206 @@
+import hashlib
+import json
+import uuid
+from functools import cached_property
+
+import numpy as np
+
+from cache import file_fingerprint
+from cube import build_process_cube
+from filters import FilterIndex, TimeIndex, filters_key, normalize_filters
+from schema import YEAR_COLUMN
+from tables import (
+    CnpjIndex,
+    build_parties_tables,
+    build_subjects_table,
+    normalize_term,
+    row_remap,
+    select_parties_tables,
+    select_rows,
+)
+
+
+def dataset_fingerprint(file_paths, options=None):
+    """Identificador estável de um conjunto de dados: caminho, tamanho e
+    mtime de cada arquivo de origem mais as opções de carga. Custa um
+    ``stat`` por arquivo, sem ler o conteúdo."""
+    payload = json.dumps(
+        {
+            "sources": [file_fingerprint(path) for path in file_paths],
+            "options": options or {},
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class Dataset:
+    """Frame dos processos carregados e as tabelas derivadas dele.
+
+    As tabelas filhas (assuntos, partes, advogados) e o índice de CNPJ são
+    montados uma única vez por conjunto de dados, na primeira vez em que são
+    usados, e compartilhados por todas as extrações.
+
+    ``fingerprint`` identifica o conjunto de dados para os caches. Quando o
+    dataset vem de arquivos (``from_files``), ele é calculado a partir das
+    fontes e opções de carga, e o frame só é lido quando alguém o usa.
+    """
+
+    def __init__(
+        self, df=None, loader=None, fingerprint=None, sources=None, options=None
+    ):
+        if df is not None:
+            self.__dict__["df"] = df
+        self._loader = loader
+        self.fingerprint = fingerprint or uuid.uuid4().hex
+        self.sources = sources or []
+        self.options = options or {}
+
+    @classmethod
+    def from_files(cls, file_paths, loader, options=None):
+        file_paths = list(file_paths)
+        return cls(
+            loader=lambda: loader(file_paths),
+            fingerprint=dataset_fingerprint(file_paths, options),
+            sources=file_paths,
+            options=options,
+        )
+
+    @cached_property
+    def df(self):
+        return self._loader()
+
+    def __len__(self):
+        return len(self.df)
+
+    @cached_property
+    def subjects(self):
+        return build_subjects_table(self.df)
+
+    @cached_property
+    def _parties_tables(self):
+        return build_parties_tables(self.df)
+
+    @property
+    def parties(self):
+        return self._parties_tables[0]
+
+    @property
+    def lawyers(self):
+        return self._parties_tables[1]
+
+    @cached_property
+    def cnpj_index(self):
+        return CnpjIndex(self.parties)
+
+    def rows_by_cnpj(self, cnpj, polo):
+        return self.cnpj_index.rows(cnpj, polo)
+
+    def cube(self, term, store=None):
+        """Cubo de agregação dos processos para ``term`` (ver
+        ``cube.build_process_cube``), montado uma vez por termo. Com
+        ``store`` (um ``cube.CubeStore``), é lido de e gravado em disco."""
+        term = normalize_term(term)
+        cubes = self.__dict__.setdefault("_cubes", {})
+        if term not in cubes:
+            cube = store.get(self.fingerprint, term) if store else None
+            if cube is None:
+                cube = self.cube_of_rows(term)
+                if store:
+                    store.put(self.fingerprint, term, cube, self.sources, self.options)
+            cubes[term] = cube
+        return cubes[term]
+
+    def cube_of_rows(self, term, rows=None):
+        """Cubo só das linhas ``rows`` (todas com ``None``), sem cache."""
+        active, passive = self.rows_by_cnpj(term, "ATIVO"), self.rows_by_cnpj(
+            term, "PASSIVO"
+        )
+        if rows is None:
+            return build_process_cube(self.df, active, passive)
+        return build_process_cube(
+            self.df.iloc[rows],
+            np.flatnonzero(np.isin(rows, active)),
+            np.flatnonzero(np.isin(rows, passive)),
+        )
+
+    @cached_property
+    def filter_index(self):
+        return FilterIndex(self.df)
+
+    @cached_property
+    def time_index(self):
+        return TimeIndex(self.df["dataDistribuicao"], self.df[YEAR_COLUMN])
+
+    def filtered(self, filters, period=None):
+        """Recorte com os processos que passam em ``filters`` (``{dimensão:
+        valores}``, ver ``filters.FILTER_DIMENSIONS``) e, com ``period``
+        (``(início, fim)``, fim exclusivo), distribuídos nesse intervalo.
+        Sem filtros nem período, o próprio dataset."""
+        if not filters_key(filters, period):
+            return self
+        return FilteredDataset(self, filters, period)
+
+
+class FilteredDataset(Dataset):
+    """Subconjunto das linhas de um ``Dataset``.
+
+    O frame só é recortado quando alguém o usa, e as tabelas filhas vêm das
+    tabelas já montadas do dataset de origem, filtradas pela linha do
+    processo, sem achatar as colunas aninhadas de novo. O cubo é o do
+    dataset de origem fatiado pelos mesmos filtros; com um período, só os
+    anos das pontas dele são agregados de novo, a partir das linhas.
+    """
+
+    def __init__(self, parent, filters, period=None):
+        self.filters = normalize_filters(filters)
+        self.period = period
+        rows = parent.filter_index.rows(self.filters)
+        if period is not None:
+            # Fatia contínua do índice de datas, cruzada com os filtros
+            in_period = np.zeros(len(parent), dtype=bool)
+            in_period[parent.time_index.rows(*period)] = True
+            rows = rows[in_period[rows]]
+        payload = json.dumps(
+            [parent.fingerprint, filters_key(self.filters, period)], default=str
+        )
+        super().__init__(
+            loader=lambda: parent.df.iloc[rows].reset_index(drop=True),
+            fingerprint=hashlib.blake2b(payload.encode(), digest_size=16).hexdigest(),
+            sources=parent.sources,
+            options=parent.options,
+        )
+        self.parent = parent
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    @cached_property
+    def _remap(self):
+        return row_remap(self.rows, len(self.parent))
+
+    @cached_property
+    def subjects(self):
+        return select_rows(self.parent.subjects, self._remap)[0]
+
+    @cached_property
+    def _parties_tables(self):
+        return select_parties_tables(
+            self.parent.parties, self.parent.lawyers, self._remap
+        )
+
+    def cube(self, term, store=None):
+        # Só o cubo do dataset de origem vai para o disco
+        term = normalize_term(term)
+        cubes = self.__dict__.setdefault("_cubes", {})
+        if term not in cubes:
+            cube = self.parent.cube(term, store).slice(self.filters)
+            if self.period is not None:
+                years, boundary = self.parent.time_index.split(*self.period)
+                boundary = np.intersect1d(boundary, self.rows, assume_unique=True)
+                edges = self.parent.cube_of_rows(term, boundary)
+                cube = cube.slice({YEAR_COLUMN: years}).merge(edges) if years else edges
+            cubes[term] = cube
+        return cubes[term]
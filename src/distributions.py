@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+OTHERS_LABEL = "OUTROS"
+
+
+def _hashable(value):
+    # Listas de dicts (ex.: assuntosCNJ) viram chaves com a mesma igualdade
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, dict):
+        return frozenset((key, _hashable(item)) for key, item in value.items())
+    return value
+
+
+def _encode(values):
+    """Códigos inteiros (-1 para nulos) e os valores distintos, na ordem das
+    categorias ou da primeira aparição, como o ``value_counts`` espera."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories.astype(object), True
+
+    if isinstance(values.dtype, pd.ArrowDtype):
+        # Colunas em Arrow (ex.: list<struct>) voltam como objetos do Python
+        array = pd.Series(pa.array(values.array).to_pylist(), dtype=object).to_numpy()
+    else:
+        array = values.to_numpy(dtype=object)
+    nested = any(isinstance(value, (list, dict)) for value in array)
+    if not nested:
+        codes, uniques = pd.factorize(array)
+        return codes, pd.Index(uniques, dtype=object), False
+
+    codes, _ = pd.factorize(
+        pd.Series([_hashable(value) for value in array], dtype=object)
+    )
+    # O valor representante de cada chave é a sua primeira ocorrência
+    _, first = np.unique(codes, return_index=True)
+    first = first[codes[first] >= 0]
+    return codes, pd.Index(list(array[first]), dtype=object, tupleize_cols=False), False
+
+
+def _distribution_frame(counts, new_column_names, cut, cut_limit):
+    label, total = new_column_names
+    if cut and len(counts) > cut_limit:
+        # Linha "OUTROS" somada direto, sem montar e concatenar outro frame
+        return pd.DataFrame(
+            {
+                label: pd.Series(
+                    list(counts.index[:cut_limit]) + [OTHERS_LABEL], dtype=object
+                ),
+                total: np.append(
+                    counts.to_numpy()[:cut_limit], counts.to_numpy()[cut_limit:].sum()
+                ),
+            }
+        )
+    distribution = counts.reset_index()
+    distribution.columns = new_column_names
+    return distribution
+
+
+def distribution_frame(counts, new_column_names, cut=False, cut_limit=5):
+    """Frame de uma distribuição a partir das contagens de cada valor (na
+    ordem das categorias ou da primeira aparição): ordenado como o
+    ``value_counts``, sem os valores zerados e com o corte em "OUTROS"
+    quando ``cut``."""
+    # Mesma ordenação do `value_counts`; as categorias sem processos saem
+    # só depois dela, como antes
+    counts = counts.sort_values(ascending=False)
+    counts = counts[counts > 0]
+    return _distribution_frame(counts, new_column_names, cut, cut_limit)
+
+
+def count_distributions(df, specs):
+    """Calcula várias distribuições de uma vez.
+
+    ``specs`` mapeia cada chave do resultado a ``(coluna, nomes, cut,
+    cut_limit)``, em que ``coluna`` é o nome de uma coluna de ``df`` ou uma
+    Series já pronta e ``nomes`` são os dois nomes das colunas do frame. Cada
+    coluna vira códigos inteiros (os do categórico, ou via ``factorize``) e
+    todas são contadas num único ``bincount``; o resultado é igual ao de um
+    ``value_counts`` por coluna, com o corte em "OUTROS" quando ``cut``.
+    """
+    encoded, offsets, total = [], [], 0
+    for key, (column, *_rest) in specs.items():
+        values = df[column] if isinstance(column, str) else column
+        codes, uniques, categorical = _encode(values)
+        encoded.append((key, uniques, categorical))
+        offsets.append((codes, total))
+        total += len(uniques)
+
+    all_codes = np.concatenate(
+        [codes[codes >= 0].astype(np.int64) + offset for codes, offset in offsets]
+        + [np.empty(0, dtype=np.int64)]
+    )
+    all_counts = np.bincount(all_codes, minlength=total)
+
+    result = {}
+    for (key, uniques, _categorical), (_, offset) in zip(encoded, offsets):
+        _, new_column_names, cut, cut_limit = specs[key]
+        counts = pd.Series(all_counts[offset : offset + len(uniques)], index=uniques)
+        result[key] = distribution_frame(counts, new_column_names, cut, cut_limit)
+    return result
+
+
+def bin_codes(values, edges):
+    """Índice da faixa de cada valor para faixas ``(edges[i], edges[i+1]]``,
+    com a primeira fechada à esquerda (como ``pd.cut(right=True,
+    include_lowest=True)``). Valores fora das faixas ou nulos ficam com -1."""
+    values = np.asarray(values, dtype="float64")
+    edges = np.asarray(edges, dtype="float64")
+    codes = np.searchsorted(edges, values, side="left")
+    codes[values == edges[0]] = 1
+    codes -= 1
+    codes[(codes < 0) | (codes >= len(edges) - 1) | np.isnan(values)] = -1
+    return codes
+
+
+def count_histograms(specs):
+    """Conta vários histogramas de uma vez.
+
+    ``specs`` mapeia cada chave do resultado a ``(valores, limites, rótulos,
+    nomes)``: os valores (Series ou array numérico, ex.: uma diferença de
+    datas em dias), os limites das faixas, um rótulo por faixa e os nomes das
+    colunas do frame. Cada frame traz todas as faixas, na ordem, com a faixa
+    como categórico ordenado, como ``pd.cut(...).value_counts().sort_index()``.
+    """
+    return {
+        key: histogram_frame(bin_counts(values, edges), labels, column_names)
+        for key, (values, edges, labels, column_names) in specs.items()
+    }
+
+
+def bin_counts(values, edges):
+    """Quantidade de valores em cada faixa de ``edges`` (ver ``bin_codes``)."""
+    codes = bin_codes(
+        pd.Series(values).to_numpy(dtype="float64", na_value=np.nan), edges
+    )
+    return np.bincount(codes[codes >= 0], minlength=len(edges) - 1)
+
+
+def histogram_frame(counts, labels, column_names):
+    label, total = column_names
+    return pd.DataFrame(
+        {
+            label: pd.Categorical(labels, categories=labels, ordered=True),
+            total: np.asarray(counts).astype("int64"),
+        }
+    )
@@ -0,0 +1,311 @@
+import hashlib
+import json
+import os
+import re
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+ENTITY_CACHE_DIR = ".cache/entities"
+# Incrementar quando as regras de união mudarem (invalida os mapas gravados)
+ENTITY_VERSION = 2
+
+# Similaridade de Jaccard mínima entre os trigramas de dois nomes para que
+# sejam a mesma entidade. Com 16 faixas de 4 linhas, um par com 0,8 de
+# similaridade vira candidato com probabilidade > 99,9%.
+ENTITY_THRESHOLD = 0.8
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+SHINGLE_SIZE = 3
+
+# Baldes LSH maiores que isso (nomes quase idênticos em massa) são
+# comparados só com o primeiro nome do balde, para não virar quadrático
+MAX_BUCKET_PAIRS = 64
+
+# Abreviações comuns nas bases dos tribunais, expandidas antes da comparação
+ABBREVIATIONS = {
+    "BCO": "BANCO",
+    "BC": "BANCO",
+    "CIA": "COMPANHIA",
+    "COMP": "COMPANHIA",
+    "CO": "COMPANHIA",
+    "SEG": "SEGUROS",
+    "SEGS": "SEGUROS",
+    "IND": "INDUSTRIA",
+    "COM": "COMERCIO",
+    "SERV": "SERVICOS",
+    "ADM": "ADMINISTRADORA",
+    "ADMIN": "ADMINISTRADORA",
+    "DISTR": "DISTRIBUIDORA",
+    "DIST": "DISTRIBUIDORA",
+    "TELECOM": "TELECOMUNICACOES",
+    "PART": "PARTICIPACOES",
+    "EMPR": "EMPREENDIMENTOS",
+    "BRAS": "BRASIL",
+    "BR": "BRASIL",
+    "NAC": "NACIONAL",
+    "INTERN": "INTERNACIONAL",
+    "FIN": "FINANCEIRA",
+}
+
+_PRIME = np.uint64(4294967311)  # primo logo acima de 2**32
+_DIGITS_PATTERN = re.compile(r"\d+")
+_NON_DIGITS_PATTERN = re.compile(r"\D")
+
+
+def expand_abbreviations(name):
+    return " ".join(ABBREVIATIONS.get(token, token) for token in name.split())
+
+
+def shingles(name, size=SHINGLE_SIZE):
+    padded = f" {name} "
+    return {
+        padded[index : index + size] for index in range(max(1, len(padded) - size + 1))
+    }
+
+
+def _hash_shingles(grams):
+    return [zlib.crc32(gram.encode()) for gram in grams]
+
+
+def minhash_signatures(shingle_sets, permutations=MINHASH_PERMUTATIONS, seed=0):
+    """Assinaturas MinHash (uma linha por conjunto) calculadas de uma vez com
+    ``np.minimum.reduceat`` sobre os hashes de todos os conjuntos."""
+    lengths = np.array([len(grams) for grams in shingle_sets])
+    hashes = np.fromiter(
+        (value for grams in shingle_sets for value in _hash_shingles(grams)),
+        dtype=np.uint64,
+        count=int(lengths.sum()),
+    )
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    random = np.random.default_rng(seed)
+    a = random.integers(1, 2**32, size=permutations, dtype=np.uint64)
+    b = random.integers(0, 2**32, size=permutations, dtype=np.uint64)
+    signatures = np.empty((len(shingle_sets), permutations), dtype=np.uint64)
+    for column in range(permutations):
+        permuted = (a[column] * hashes + b[column]) % _PRIME
+        signatures[:, column] = np.minimum.reduceat(permuted, starts)
+    return signatures
+
+
+def candidate_pairs(signatures, bands=MINHASH_BANDS, max_bucket_pairs=MAX_BUCKET_PAIRS):
+    """Pares (i, j), i < j, que caem no mesmo balde em alguma faixa."""
+    rows = signatures.shape[1] // bands
+    pairs = set()
+    for band in range(bands):
+        block = signatures[:, band * rows : (band + 1) * rows]
+        buckets = (
+            pd.DataFrame(block)
+            .groupby(list(range(rows)), sort=False)
+            .ngroup()
+            .to_numpy()
+        )
+        order = np.argsort(buckets, kind="stable")
+        boundaries = np.flatnonzero(np.diff(buckets[order])) + 1
+        for members in np.split(order, boundaries):
+            if len(members) < 2:
+                continue
+            if len(members) * (len(members) - 1) // 2 > max_bucket_pairs:
+                pairs.update((int(members[0]), int(member)) for member in members[1:])
+            else:
+                members = members.tolist()
+                pairs.update(
+                    (first, second)
+                    for index, first in enumerate(members)
+                    for second in members[index + 1 :]
+                )
+    return pairs
+
+
+def _find(parents, item):
+    while parents[item] != item:
+        parents[item] = parents[parents[item]]
+        item = parents[item]
+    return item
+
+
+def _compatible(identifiers, first, second):
+    # Sem identificadores, qualquer par pode ser unido; com eles, só nomes
+    # que têm um identificador e compartilham algum (mesma raiz de CNPJ,
+    # mesma OAB). Pessoas físicas, sem CNPJ, nunca são unidas.
+    if identifiers is None:
+        return True
+    return bool(identifiers[first] and identifiers[first] & identifiers[second])
+
+
+def resolve_entities(names, weights=None, threshold=ENTITY_THRESHOLD, identifiers=None):
+    """Agrupa nomes (já normalizados) que são variações da mesma entidade.
+
+    As abreviações são expandidas e os pares candidatos vêm de MinHash com
+    LSH por faixas; um par é unido se a similaridade de Jaccard dos
+    trigramas passa de ``threshold``, os números do nome (filial, unidade)
+    são os mesmos e, com ``identifiers`` (um conjunto por nome, ex.: as
+    raízes de CNPJ com que o nome aparece), os dois têm um identificador em
+    comum. O nome canônico de cada grupo é o de maior peso (``weights``,
+    ex.: contagens).
+
+    Devolve ``{nome: canônico}`` só para os nomes que mudam.
+    """
+    names = list(names)
+    if not names:
+        return {}
+    weights = (
+        np.ones(len(names)) if weights is None else np.asarray(weights, dtype=float)
+    )
+    keys = [expand_abbreviations(name) for name in names]
+
+    parents = list(range(len(names)))
+    if len(names) > 1:
+        grams = [shingles(key) for key in keys]
+        digits = [_DIGITS_PATTERN.findall(key) for key in keys]
+        signatures = minhash_signatures(grams)
+        for first, second in candidate_pairs(signatures):
+            if digits[first] != digits[second] or not _compatible(
+                identifiers, first, second
+            ):
+                continue
+            a, b = grams[first], grams[second]
+            if len(a & b) / len(a | b) >= threshold:
+                root_a, root_b = _find(parents, first), _find(parents, second)
+                if root_a != root_b:
+                    parents[max(root_a, root_b)] = min(root_a, root_b)
+
+    clusters = np.array([_find(parents, index) for index in range(len(names))])
+    # Canônico: o nome de maior peso do grupo; empate fica com o que aparece antes
+    order = np.lexsort((np.arange(len(names)), -weights, clusters))
+    first_of_cluster = order[np.concatenate(([True], np.diff(clusters[order]) != 0))]
+    canonical = dict(
+        zip(clusters[first_of_cluster].tolist(), first_of_cluster.tolist())
+    )
+    return {
+        name: names[canonical[cluster]]
+        for name, cluster in zip(names, clusters.tolist())
+        if names[canonical[cluster]] != name
+    }
+
+
+class EntityResolver:
+    """Aplica ``resolve_entities`` a colunas de nomes normalizados.
+
+    O mapa de nomes canônicos depende só dos nomes distintos e das suas
+    contagens, então é guardado por esse conteúdo, em memória e em
+    ``cache_dir``, e reaproveitado entre rankings e execuções.
+    """
+
+    def __init__(
+        self, threshold=ENTITY_THRESHOLD, cache_dir=ENTITY_CACHE_DIR, max_entries=8
+    ):
+        self.threshold = threshold
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._maps = OrderedDict()
+
+    def _key(self, names, weights, identifiers):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(
+            json.dumps(
+                [ENTITY_VERSION, self.threshold, MINHASH_PERMUTATIONS, MINHASH_BANDS]
+            ).encode()
+        )
+        digest.update("\0".join(names).encode())
+        digest.update(np.asarray(weights, dtype=np.int64).tobytes())
+        if identifiers is not None:
+            digest.update(
+                json.dumps([sorted(values) for values in identifiers]).encode()
+            )
+        return digest.hexdigest()
+
+    def canonical_map(self, names, weights, identifiers=None):
+        key = self._key(names, weights, identifiers)
+        if key in self._maps:
+            self._maps.move_to_end(key)
+            return self._maps[key]
+
+        path = os.path.join(self.cache_dir, f"{key}.json") if self.cache_dir else None
+        mapping = None
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    mapping = json.load(f)
+            except (OSError, ValueError):
+                mapping = None
+        if mapping is None:
+            mapping = resolve_entities(names, weights, self.threshold, identifiers)
+            if path:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(mapping, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+
+        self._maps[key] = mapping
+        while len(self._maps) > self.max_entries:
+            self._maps.popitem(last=False)
+        return mapping
+
+    def resolve(self, normalized, identifiers=None):
+        """Troca cada nome da série categórica ``normalized`` pelo canônico
+        do seu grupo, mantendo a ordem de primeira aparição das categorias.
+        ``identifiers``, alinhada a ``normalized``, dá o identificador de
+        cada linha (ver ``resolve_entities``)."""
+        categories = [str(category) for category in normalized.cat.categories]
+        codes = normalized.cat.codes.to_numpy()
+        weights = np.bincount(codes[codes >= 0], minlength=len(categories))
+        if identifiers is not None:
+            identifiers = identifier_sets(codes, identifiers, len(categories))
+        mapping = self.canonical_map(categories, weights, identifiers)
+        if not mapping:
+            return normalized
+
+        canonical_codes, canonical = pd.factorize(
+            pd.Index([mapping.get(name, name) for name in categories], dtype=object)
+        )
+        codes = np.where(codes >= 0, canonical_codes[codes], -1)
+        return pd.Series(
+            pd.Categorical.from_codes(codes, categories=canonical),
+            index=normalized.index,
+            name=normalized.name,
+        )
+
+
+def identifier_sets(codes, identifiers, size):
+    """Conjunto dos identificadores não nulos de cada código (0..size-1),
+    a partir de ``codes`` e ``identifiers`` alinhados por linha."""
+    values = pd.Series(np.asarray(identifiers, dtype=object))
+    keep = (codes >= 0) & values.notna().to_numpy()
+    pairs = pd.DataFrame(
+        {"code": codes[keep], "id": values[keep].astype(str).to_numpy()}
+    ).drop_duplicates()
+    sets = [frozenset() for _ in range(size)]
+    for code, group in pairs.groupby("code", sort=False)["id"]:
+        sets[code] = frozenset(group)
+    return sets
+
+
+def cnpj_roots(cnpjs):
+    """Raiz (8 primeiros dígitos) de cada CNPJ, nula quando não há CNPJ."""
+    digits = cnpjs.astype("string").str.replace(_NON_DIGITS_PATTERN, "", regex=True)
+    return digits.str[:8].where(digits.str.len() > 0)
+
+
+ENTITY_RESOLVER = EntityResolver()
+
+
+def resolve_names(normalized, resolver=ENTITY_RESOLVER, identifiers=None):
+    return resolver.resolve(normalized, identifiers)
+
+
+def resolve_counts(counts, resolver=ENTITY_RESOLVER, identifiers=None):
+    """Soma as contagens de ``counts`` (nome normalizado -> total) no nome
+    canônico de cada grupo, na ordem de primeira aparição. ``identifiers``
+    mapeia cada nome ao conjunto dos seus identificadores."""
+    names = [str(name) for name in counts.index]
+    if identifiers is not None:
+        identifiers = [frozenset(identifiers.get(name, ())) for name in names]
+    mapping = resolver.canonical_map(names, counts.to_numpy(), identifiers)
+    if not mapping:
+        return counts
+    return counts.groupby([mapping.get(name, name) for name in names], sort=False).sum()
@@ -0,0 +1,179 @@
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+from schema import YEAR_COLUMN
+
+# Dimensões que podem filtrar o painel, cada uma com um bitmap por valor
+FILTER_DIMENSIONS = [
+    "uf",
+    "tribunal",
+    "segmento",
+    "grauProcesso",
+    "statusPredictus.ramoDireito",
+    YEAR_COLUMN,
+]
+
+
+def normalize_filters(filters):
+    """``{dimensão: valores}`` sem as dimensões vazias e com os valores em
+    uma ordem estável, para que filtros iguais gerem a mesma chave."""
+    return {
+        dimension: sorted(set(values), key=str)
+        for dimension, values in sorted((filters or {}).items())
+        if values
+    }
+
+
+def filters_key(filters, period=None):
+    """Chave curta e estável de um conjunto de filtros e de um período de
+    distribuição (vazia sem nenhum dos dois)."""
+    filters = normalize_filters(filters)
+    if not filters and period is None:
+        return ""
+    payload = json.dumps([filters, period], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+
+class FilterIndex:
+    """Bitmaps das linhas de cada valor das dimensões filtráveis.
+
+    Cada bitmap tem um bit por processo (``np.packbits``) e é montado uma
+    única vez por conjunto de dados. Um filtro é o OR dos bitmaps dos valores
+    escolhidos em cada dimensão e o AND entre as dimensões, feitos sobre
+    arrays de ``len(df) / 8`` bytes, sem voltar às colunas do frame.
+    """
+
+    def __init__(self, df, dimensions=FILTER_DIMENSIONS):
+        self.size = len(df)
+        self._bitmaps = {}
+        for dimension in dimensions:
+            if dimension not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[dimension], sort=True)
+            # Linhas agrupadas por código: cada valor marca só a sua fatia
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            bitmaps = {}
+            for value, start, stop in zip(uniques.tolist(), bounds[:-1], bounds[1:]):
+                mask = np.zeros(self.size, dtype=bool)
+                mask[order[start:stop]] = True
+                bitmaps[value] = np.packbits(mask)
+            self._bitmaps[dimension] = bitmaps
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, dimension):
+        return dimension in self._bitmaps
+
+    def values(self, dimension):
+        return list(self._bitmaps.get(dimension, {}))
+
+    def match(self, dimension, labels):
+        """Valores da dimensão cujo texto é um dos ``labels`` (ex.: o ano
+        "2021" clicado num gráfico). Rótulos desconhecidos são ignorados."""
+        by_text = {str(value): value for value in self._bitmaps.get(dimension, {})}
+        return [by_text[str(label)] for label in labels if str(label) in by_text]
+
+    def bitmap(self, filters):
+        """Bitmap das linhas que passam em ``filters``, ou ``None`` sem filtros."""
+        result = None
+        for dimension, values in normalize_filters(filters).items():
+            bitmaps = self._bitmaps.get(dimension, {})
+            selected = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+            for value in values:
+                if value in bitmaps:
+                    np.bitwise_or(selected, bitmaps[value], out=selected)
+            result = (
+                selected
+                if result is None
+                else np.bitwise_and(result, selected, out=result)
+            )
+        return result
+
+    def rows(self, filters):
+        """Posições (ordenadas) das linhas que passam em ``filters``."""
+        bitmap = self.bitmap(filters)
+        if bitmap is None:
+            return np.arange(self.size)
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.size))
+
+    def count(self, filters):
+        bitmap = self.bitmap(filters)
+        if bitmap is None:
+            return self.size
+        return int(np.unpackbits(bitmap, count=self.size).sum())
+
+
+class TimeIndex:
+    """Processos ordenados pela data de distribuição.
+
+    Guarda a permutação das linhas que ordena as datas (sem as nulas) e as
+    datas já ordenadas, então um período ``[início, fim)`` vira, com duas
+    buscas binárias, uma fatia contínua dessa permutação. As posições em que
+    cada ano começa permitem separar os anos inteiros de um período das
+    pontas, para que só as pontas precisem ser agregadas de novo.
+    """
+
+    def __init__(self, dates, years):
+        values = dates.to_numpy(dtype="datetime64[ns]", na_value=np.datetime64("NaT"))
+        valid = np.flatnonzero(~np.isnat(values))
+        self.order = valid[np.argsort(values[valid], kind="stable")]
+        self.values = values[self.order]
+        sorted_years = years.to_numpy(dtype="float64", na_value=np.nan)[self.order]
+        # Posição em que cada ano começa em `order`, mais o fim
+        changes = np.flatnonzero(np.diff(sorted_years)) + 1
+        self._year_starts = (
+            np.concatenate(([0], changes, [len(self.order)]))
+            if len(self.order)
+            else np.zeros(1, dtype=np.int64)
+        )
+        self._years = [int(year) for year in sorted_years[self._year_starts[:-1]]]
+
+    def __len__(self):
+        return len(self.order)
+
+    def bounds(self):
+        """Primeira e última data de distribuição (``None`` sem datas)."""
+        if not len(self.values):
+            return None, None
+        return pd.Timestamp(self.values[0]), pd.Timestamp(self.values[-1])
+
+    def positions(self, start=None, end=None):
+        """Intervalo ``[lo, hi)`` de ``order`` com as datas em ``[start, end)``;
+        um limite ``None`` fica em aberto."""
+        lo = (
+            0
+            if start is None
+            else np.searchsorted(self.values, np.datetime64(pd.Timestamp(start), "ns"))
+        )
+        hi = (
+            len(self.values)
+            if end is None
+            else np.searchsorted(self.values, np.datetime64(pd.Timestamp(end), "ns"))
+        )
+        return int(lo), int(max(lo, hi))
+
+    def rows(self, start=None, end=None):
+        """Linhas distribuídas em ``[start, end)``, na ordem das datas."""
+        lo, hi = self.positions(start, end)
+        return self.order[lo:hi]
+
+    def split(self, start=None, end=None):
+        """Anos inteiramente dentro de ``[start, end)`` e as linhas do período
+        que ficam nos anos das pontas."""
+        lo, hi = self.positions(start, end)
+        starts = self._year_starts
+        full = [
+            index
+            for index in range(len(self._years))
+            if lo <= starts[index] and starts[index + 1] <= hi
+        ]
+        if not full:
+            return [], self.order[lo:hi]
+        first, last = starts[full[0]], starts[full[-1] + 1]
+        boundary = np.concatenate((self.order[lo:first], self.order[last:hi]))
+        return [self._years[index] for index in full], boundary
@@ -0,0 +1,166 @@
+import argparse
+import json
+import os
+import sys
+from functools import lru_cache
+
+import numpy as np
+
+GEOJSON_PATH = "resource/brazil_states.geojson"
+GEOJSON_CACHE_DIR = ".cache/geo"
+
+# Tolerância da simplificação (graus, ~1 km) e casas decimais mantidas nas
+# coordenadas (~100 m): bem abaixo do que o mapa do painel consegue mostrar.
+GEOJSON_TOLERANCE = 0.01
+GEOJSON_PRECISION = 3
+GEOJSON_PROPERTIES = ("sigla", "name")
+
+
+def _point_distances(points, start, end):
+    if np.array_equal(start, end):
+        return np.hypot(*(points - start).T)
+    direction = end - start
+    offsets = points - start
+    cross = direction[0] * offsets[:, 1] - direction[1] * offsets[:, 0]
+    return np.abs(cross) / np.hypot(*direction)
+
+
+def simplify_ring(points, tolerance):
+    """Douglas-Peucker sobre um anel (array n x 2), mantendo as pontas."""
+    if len(points) <= 4:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        distances = _point_distances(
+            points[first + 1 : last], points[first], points[last]
+        )
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            middle = first + 1 + farthest
+            keep[middle] = True
+            stack.append((first, middle))
+            stack.append((middle, last))
+    return points[keep]
+
+
+def quantize_ring(points, precision):
+    points = np.round(points, precision)
+    # Pontos que caíram na mesma posição depois do arredondamento
+    changed = np.any(np.diff(points, axis=0) != 0, axis=1)
+    return points[np.concatenate(([True], changed))]
+
+
+def _simplify_polygon(polygon, tolerance, precision):
+    rings = []
+    for ring in polygon:
+        points = quantize_ring(
+            simplify_ring(np.asarray(ring, dtype=float), tolerance), precision
+        )
+        if len(points) >= 4:
+            rings.append(points.tolist())
+        elif not rings:
+            return None  # ilha menor que a tolerância
+    return rings
+
+
+def simplify_geometry(geometry, tolerance, precision):
+    if geometry["type"] == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        return geometry
+
+    simplified = [
+        _simplify_polygon(polygon, tolerance, precision) for polygon in polygons
+    ]
+    kept = [polygon for polygon in simplified if polygon]
+    if not kept:
+        # Nada sobrou: fica o maior polígono só quantizado
+        largest = max(polygons, key=lambda polygon: len(polygon[0]))
+        kept = [_simplify_polygon(largest, 0, precision)]
+    return {"type": "MultiPolygon", "coordinates": kept}
+
+
+def simplify_geojson(
+    geojson,
+    tolerance=GEOJSON_TOLERANCE,
+    precision=GEOJSON_PRECISION,
+    properties=GEOJSON_PROPERTIES,
+):
+    features = []
+    for feature in geojson["features"]:
+        features.append(
+            {
+                "type": "Feature",
+                "properties": {
+                    key: value
+                    for key, value in feature.get("properties", {}).items()
+                    if properties is None or key in properties
+                },
+                "geometry": simplify_geometry(
+                    feature["geometry"], tolerance, precision
+                ),
+            }
+        )
+    return {"type": "FeatureCollection", "features": features}
+
+
+def derived_path(geojson_path, tolerance, precision, cache_dir=GEOJSON_CACHE_DIR):
+    name = os.path.splitext(os.path.basename(geojson_path))[0]
+    return os.path.join(cache_dir, f"{name}.t{tolerance:g}.p{precision}.geojson")
+
+
+def build_simplified_geojson(
+    geojson_path=GEOJSON_PATH, tolerance=GEOJSON_TOLERANCE, precision=GEOJSON_PRECISION
+):
+    """Gera (ou reaproveita) a versão simplificada do arquivo, gravada como
+    asset derivado; é refeita quando a fonte é mais nova que ela."""
+    target = derived_path(geojson_path, tolerance, precision)
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(
+        geojson_path
+    ):
+        return target
+
+    with open(geojson_path, "r") as file:
+        simplified = simplify_geojson(json.load(file), tolerance, precision)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(simplified, file, separators=(",", ":"), ensure_ascii=False)
+    os.replace(tmp_path, target)
+    return target
+
+
+@lru_cache(maxsize=None)
+def load_geojson(
+    geojson_path=GEOJSON_PATH, tolerance=GEOJSON_TOLERANCE, precision=GEOJSON_PRECISION
+):
+    """GeoJSON simplificado, lido uma vez por processo. Com ``tolerance=None``
+    devolve a geometria original."""
+    if tolerance is not None:
+        geojson_path = build_simplified_geojson(geojson_path, tolerance, precision)
+    with open(geojson_path, "r") as file:
+        return json.load(file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera o GeoJSON simplificado do mapa.")
+    parser.add_argument("geojson", nargs="?", default=GEOJSON_PATH)
+    parser.add_argument("--tolerance", type=float, default=GEOJSON_TOLERANCE)
+    parser.add_argument("--precision", type=int, default=GEOJSON_PRECISION)
+    args = parser.parse_args(argv)
+
+    target = build_simplified_geojson(args.geojson, args.tolerance, args.precision)
+    before, after = os.path.getsize(args.geojson), os.path.getsize(target)
+    print(f"{target}: {after / 1024:.0f} KB ({after / before:.1%} do original)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import heapq
+import itertools
+from collections import Counter
+
+# Contadores mantidos pelo Space-Saving e itens lidos por lote. A memória
+# fica em O(capacidade + nomes distintos de um lote), seja qual for o volume.
+TOPK_CAPACITY = 10_000
+TOPK_BATCH_SIZE = 200_000
+
+
+class SpaceSaving:
+    """Itens mais frequentes de um fluxo com memória limitada (Space-Saving,
+    Metwally et al., na versão com lotes de Agarwal et al.).
+
+    Guarda no máximo ``capacity`` contadores. A contagem estimada de um item
+    nunca é menor que a real e a excede em no máximo o ``erro`` devolvido por
+    ``top``; um item fora do resumo aparece no máximo ``error_bound`` vezes.
+    Enquanto cabem todos os itens distintos, as contagens são exatas.
+    """
+
+    def __init__(self, capacity=TOPK_CAPACITY):
+        self.capacity = capacity
+        self.total = 0
+        self._counts = {}
+        self._errors = {}
+        self._floor = 0  # maior contagem possível de um item não monitorado
+
+    @property
+    def error_bound(self):
+        return self._floor
+
+    def update(self, items):
+        """Conta um lote de itens (qualquer iterável de valores hasheáveis)."""
+        batch = Counter(items)
+        self.total += sum(batch.values())
+        counts, errors, floor = self._counts, self._errors, self._floor
+        for item, count in batch.items():
+            if item in counts:
+                counts[item] += count
+            else:
+                # Pode ter aparecido antes e sido descartado com até `floor`
+                counts[item] = count + floor
+                errors[item] = floor
+        if len(counts) > self.capacity:
+            kept = heapq.nlargest(
+                self.capacity, counts.items(), key=lambda entry: entry[1]
+            )
+            self._floor = kept[-1][1]
+            self._counts = dict(kept)
+            self._errors = {item: errors[item] for item in self._counts}
+
+    def update_stream(self, items, batch_size=TOPK_BATCH_SIZE):
+        iterator = iter(items)
+        while True:
+            batch = list(itertools.islice(iterator, batch_size))
+            if not batch:
+                break
+            self.update(batch)
+        return self
+
+    def top(self, n):
+        """Os ``n`` itens de maior contagem estimada: (item, contagem, erro)."""
+        ranked = heapq.nlargest(n, self._counts.items(), key=lambda entry: entry[1])
+        return [(item, count, self._errors[item]) for item, count in ranked]
@@ -0,0 +1,565 @@
+"""Incorpora arquivos novos de processos aos agregados persistidos do painel.
+
+    python src/incremental.py --term 00000000000191 resource/dados_empresa*.json
+    python src/incremental.py --term 00000000000191 --rebuild resource/dados_empresa*.json
+
+Cada estado (por padrão um por termo, em ``.cache/incremental/<nome>``)
+guarda os agregados parciais de todos os painéis e quais arquivos já foram
+incorporados. Só os arquivos novos são lidos: os seus processos somam nos
+agregados, e um processo que já estava no estado (mesmo
+``numeroProcessoUnico``) tem a versão anterior descontada antes. O
+resultado vai para o ``SnapshotStore`` com o fingerprint de todos os
+arquivos, então o painel aberto sobre eles não recalcula nada.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from cache import file_fingerprint
+from cube import Cube, cube_distributions
+from dataset import Dataset, dataset_fingerprint
+from distributions import bin_counts, distribution_frame, histogram_frame
+from entities import cnpj_roots, resolve_counts
+from ingest import DEDUP_LATEST
+from main import (
+    CUBES,
+    DATASET_OPTIONS,
+    DISTRIBUICOES_CUBO,
+    DISTRIBUICOES_FRAME,
+    HISTOGRAMAS,
+    MERGE_NAME_VARIANTS,
+    SNAPSHOTS,
+    dist_vs_arq_frame,
+    histogram_values,
+    indicators_from_cube,
+    load_data,
+    principal_subjects_per_year,
+    rank_names,
+    rank_principal_subjects,
+)
+from names import normalize_names
+from schema import YEAR_COLUMN, YEAR_DTYPE, year_of
+from tables import flatten_records, is_arrow_backed, normalize_term, principal_subjects
+
+STATE_DIR = ".cache/incremental"
+# Incrementar quando os agregados guardados mudarem
+STATE_VERSION = 2
+
+KEY_COLUMN = "numeroProcessoUnico"
+
+# Contadores fora do cubo: nome -> colunas da chave (as demais são somas)
+COUNTERS = {
+    "julgamentos": ["valor"],
+    "classes": ["valor"],
+    "assuntos": ["valor"],
+    "assuntos_principais": ["Ano", "Assunto"],
+    "partes": ["valor", "id"],
+    "advogados": ["valor", "id"],
+    "arquivados": ["Ano"],
+}
+
+_META_FILE = "meta.json"
+
+
+def _count(values):
+    # Total de cada valor não nulo, na ordem de primeira aparição
+    counts = pd.Series(values).value_counts(sort=False)
+    counts = counts[counts > 0]
+    return pd.DataFrame(
+        {"valor": counts.index.astype(object), "total": counts.to_numpy(dtype=np.int64)}
+    )
+
+
+def _subject_keys(values):
+    # Cada lista de `assuntosCNJ` vira um texto JSON, igual para listas com
+    # os mesmos assuntos (como `distributions._hashable`)
+    items = (
+        pa.array(values.array).to_pylist()
+        if is_arrow_backed(values)
+        else values.tolist()
+    )
+    return pd.Series(
+        [
+            (
+                json.dumps(item, sort_keys=True, ensure_ascii=False, default=str)
+                if isinstance(item, list)
+                else None
+            )
+            for item in items
+        ],
+        dtype=object,
+    )
+
+
+def _count_names(names, identifiers):
+    # Total de cada (nome, identificador); o identificador (raiz de CNPJ,
+    # OAB) pode ser nulo e só serve para a união de variações do nome
+    counts = pd.DataFrame(
+        {
+            "valor": names.astype(object).to_numpy(),
+            "id": pd.Series(identifiers).astype(object).to_numpy(),
+        }
+    ).dropna(subset=["valor"])
+    return (
+        counts.groupby(["valor", "id"], dropna=False, sort=False)
+        .size()
+        .reset_index(name="total")
+    )
+
+
+def _ranked_names(counter):
+    totals = counter.groupby("valor", sort=False)["total"].sum()
+    totals.index = totals.index.astype(object)
+    if not MERGE_NAME_VARIANTS:
+        return totals
+    identifiers = (
+        counter.dropna(subset=["id"])
+        .groupby("valor", sort=False)["id"]
+        .agg(frozenset)
+        .to_dict()
+    )
+    return resolve_counts(totals, identifiers=identifiers)
+
+
+def _series(counter, name="total"):
+    # Contador com uma coluna de chave -> Series valor -> total
+    return pd.Series(
+        counter[name].to_numpy(), index=pd.Index(counter["valor"], dtype=object)
+    )
+
+
+def _by_year(counter, name):
+    return pd.Series(
+        counter[name].to_numpy(), index=counter["Ano"].astype("int64").to_numpy()
+    )
+
+
+class PanelState:
+    """Agregados parciais de todos os painéis de um conjunto de processos.
+
+    O cubo guarda as contagens e somas das dimensões do cubo e o polo do
+    termo; os contadores, os totais por valor das demais distribuições, dos
+    assuntos principais por ano, dos nomes de partes e advogados e dos
+    arquivamentos por ano; os histogramas, a contagem de cada faixa. Todos
+    se somam (``merge``), e com ``sign=-1`` um conjunto de processos sai do
+    estado; ``to_data`` devolve o mesmo dicionário do ``compute_data``.
+    """
+
+    def __init__(self, cube, counters, histograms):
+        self.cube = cube
+        self.counters = counters
+        self.histograms = histograms
+
+    @classmethod
+    def from_frame(cls, df, term):
+        dataset = Dataset(df)
+        cube = dataset.cube(term)
+
+        subjects = principal_subjects(dataset.subjects).rename(
+            columns={"titulo": "Assunto"}
+        )
+        julgamentos = flatten_records(
+            df["statusPredictus.julgamentos"], ["tipoJulgamento"]
+        )
+        lawyers = dataset.lawyers.dropna(subset=["oab.numero"])
+        arquivados = pd.DataFrame(
+            {
+                "Ano": year_of(df["statusPredictus.dataArquivamento"]),
+                "valor": df["valorCausa.valor"],
+            }
+        )
+        counters = {
+            "julgamentos": _count(julgamentos["tipoJulgamento"]),
+            "classes": _count(df["classeProcessual.nome"]),
+            "assuntos": _count(_subject_keys(df["assuntosCNJ"])),
+            "assuntos_principais": (
+                subjects.groupby(["Ano", "Assunto"], dropna=False, sort=False)
+                .size()
+                .reset_index(name="total")
+            ),
+            "partes": _count_names(
+                normalize_names(dataset.parties["nome"]),
+                cnpj_roots(dataset.parties["cnpj"]),
+            ),
+            "advogados": _count_names(
+                normalize_names(lawyers["nome"]), lawyers["oab.numero"].astype(str)
+            ),
+            "arquivados": (
+                arquivados.groupby("Ano", sort=False)
+                .agg(total=("valor", "size"), valor=("valor", "sum"))
+                .reset_index()
+            ),
+        }
+        values = histogram_values(df)
+        histograms = {
+            key: bin_counts(values[key], edges)
+            for key, (edges, *_rest) in HISTOGRAMAS.items()
+        }
+        return cls(cube, counters, histograms)
+
+    def merge(self, other, sign=1):
+        """Estado com os agregados de ``other`` somados (``sign=1``) ou
+        descontados (``sign=-1``); chaves que zeram saem."""
+        counters = {}
+        for name, keys in COUNTERS.items():
+            right = other.counters[name].copy()
+            measures = [column for column in right.columns if column not in keys]
+            right[measures] = right[measures] * sign
+            merged = (
+                pd.concat([self.counters[name], right], ignore_index=True)
+                .groupby(keys, dropna=False, sort=False)[measures]
+                .sum()
+                .reset_index()
+            )
+            counters[name] = merged.loc[merged["total"] != 0].reset_index(drop=True)
+        histograms = {
+            key: counts + sign * other.histograms[key]
+            for key, counts in self.histograms.items()
+        }
+        return PanelState(
+            self.cube.merge(other.cube.scaled(sign)), counters, histograms
+        )
+
+    def to_data(self):
+        cube, counters = self.cube, self.counters
+        data = {}
+
+        distribuidos = cube.series(YEAR_COLUMN)
+        keep = (distribuidos > 0).to_numpy()
+        distribuidos.index = distribuidos.index.astype("int64")
+        valor_distribuidos = cube.series(YEAR_COLUMN, "valor_causa")
+        valor_distribuidos.index = distribuidos.index
+        data["dist_arq"] = dist_vs_arq_frame(
+            distribuidos[keep].sort_values(ascending=False, kind="stable"),
+            _by_year(counters["arquivados"], "total").sort_values(
+                ascending=False, kind="stable"
+            ),
+            valor_distribuidos[keep],
+            _by_year(counters["arquivados"], "valor"),
+        )
+
+        data.update(indicators_from_cube(cube))
+        data.update(cube_distributions(cube, DISTRIBUICOES_CUBO))
+        frame_counts = {
+            "distribuicao_julgamento": _series(counters["julgamentos"]),
+            "distribuicao_classes": _series(counters["classes"]),
+            "distribuicao_assuntos": pd.Series(
+                counters["assuntos"]["total"].to_numpy(),
+                index=pd.Index(
+                    [json.loads(key) for key in counters["assuntos"]["valor"]],
+                    dtype=object,
+                    tupleize_cols=False,
+                ),
+            ),
+        }
+        data.update(
+            {
+                key: distribution_frame(frame_counts[key], *spec)
+                for key, spec in DISTRIBUICOES_FRAME.items()
+            }
+        )
+
+        per_year = (
+            counters["assuntos_principais"]
+            .set_index(["Ano", "Assunto"])["total"]
+            .sort_index()
+        )
+        by_subject = (
+            counters["assuntos_principais"]
+            .dropna(subset=["Assunto"])
+            .groupby("Assunto", sort=False)["total"]
+            .sum()
+            .sort_values(ascending=False, kind="stable")
+        )
+        data.update(
+            {
+                "assuntos_principais": rank_principal_subjects(by_subject, True),
+                "assuntos_principais_ano": principal_subjects_per_year(per_year),
+                "assuntos_principais_ano_um": principal_subjects_per_year(per_year, 1),
+                "top_10_partes": rank_names(_ranked_names(counters["partes"]), 10),
+            }
+        )
+
+        data.update(
+            {
+                key: histogram_frame(self.histograms[key], labels, column_names)
+                for key, (_edges, labels, column_names) in HISTOGRAMAS.items()
+            }
+        )
+        return data
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        with pa.OSFile(os.path.join(path, "cube.arrow"), "wb") as sink:
+            table = self.cube.to_arrow()
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        for name, counter in self.counters.items():
+            _write_table(os.path.join(path, f"{name}.arrow"), counter)
+        with open(os.path.join(path, "histograms.json"), "w") as f:
+            json.dump(
+                {key: counts.tolist() for key, counts in self.histograms.items()}, f
+            )
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "histograms.json"), "r") as f:
+            histograms = json.load(f)
+        cube = Cube.from_arrow(_read_table(os.path.join(path, "cube.arrow")))
+        counters = {}
+        for name in COUNTERS:
+            counter = _read_table(os.path.join(path, f"{name}.arrow")).to_pandas()
+            if "Ano" in counter.columns:
+                counter["Ano"] = counter["Ano"].astype(YEAR_DTYPE)
+            for column in COUNTERS[name]:
+                if column != "Ano":
+                    counter[column] = counter[column].astype(object)
+            counters[name] = counter
+        return cls(
+            cube,
+            counters,
+            {
+                key: np.asarray(counts, dtype=np.int64)
+                for key, counts in histograms.items()
+            },
+        )
+
+
+def _write_table(path, df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _read_table(path):
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _latest_versions(df):
+    # Última versão de cada processo no arquivo; linhas sem número ficam todas
+    duplicated = df[KEY_COLUMN].notna() & df.duplicated(KEY_COLUMN, keep="last")
+    return df.loc[~duplicated].reset_index(drop=True)
+
+
+class AppendState:
+    """Estado incremental de um termo: os agregados (``PanelState``), os
+    arquivos já incorporados, na ordem, e de qual deles veio a versão atual
+    de cada processo.
+
+    ``fold`` incorpora um arquivo novo. Os processos dele que já estavam no
+    estado são relidos só dos arquivos de onde vieram (pelo cache de
+    datasets) e descontados antes de a nova versão somar, então o custo
+    depende do arquivo novo e das versões que ele substitui, não do
+    histórico inteiro.
+    """
+
+    def __init__(self, term, panels=None, sources=None, owners=None, options=None):
+        self.term = term
+        self.panels = panels
+        self.sources = sources or []
+        # numeroProcessoUnico -> posição em `sources` da versão atual
+        self.owners = (
+            owners
+            if owners is not None
+            else pd.Series([], dtype=np.int32, index=pd.Index([], dtype=object))
+        )
+        self.options = options or dict(DATASET_OPTIONS)
+
+    @property
+    def file_paths(self):
+        return [source["path"] for source in self.sources]
+
+    def _load(self, file_path):
+        return load_data([file_path], **self.options)
+
+    def _source_index(self, file_path):
+        path = os.path.abspath(file_path)
+        for index, source in enumerate(self.sources):
+            if source["path"] == path:
+                if source != file_fingerprint(path):
+                    raise ValueError(
+                        f"{file_path} mudou depois de incorporado; reconstrua o estado (--rebuild)"
+                    )
+                return index
+        return None
+
+    def fold(self, file_path):
+        """Incorpora ``file_path``. Devolve (processos lidos, versões
+        substituídas), ou ``None`` se o arquivo já estava no estado."""
+        if self._source_index(file_path) is not None:
+            return None
+
+        df = _latest_versions(self._load(file_path))
+        keys = df[KEY_COLUMN].dropna().astype(str)
+        replaced = self.owners.reindex(keys.to_numpy()).dropna().astype(np.int64)
+
+        panels = self.panels
+        for source_index, owned in replaced.groupby(replaced, sort=True):
+            source = self.sources[source_index]
+            if source != file_fingerprint(source["path"]):
+                raise ValueError(
+                    f"{source['path']} mudou depois de incorporado; reconstrua o estado (--rebuild)"
+                )
+            previous = _latest_versions(self._load(source["path"]))
+            previous = previous.loc[
+                previous[KEY_COLUMN].astype(str).isin(owned.index)
+            ].reset_index(drop=True)
+            panels = panels.merge(PanelState.from_frame(previous, self.term), sign=-1)
+
+        delta = PanelState.from_frame(df, self.term)
+        self.panels = delta if panels is None else panels.merge(delta)
+        new_owners = pd.Series(
+            len(self.sources),
+            index=pd.Index(keys.to_numpy(), dtype=object),
+            dtype=np.int32,
+        )
+        self.owners = pd.concat([self.owners.drop(replaced.index), new_owners])
+        self.sources.append(file_fingerprint(file_path))
+        return len(df), len(replaced)
+
+    def save(self, path):
+        # Grava ao lado e troca de uma vez, para não deixar um estado pela metade
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        self.panels.save(tmp_path)
+        _write_table(
+            os.path.join(tmp_path, "owners.arrow"),
+            pd.DataFrame(
+                {
+                    "chave": self.owners.index.astype(str),
+                    "fonte": self.owners.to_numpy(dtype=np.int32),
+                }
+            ),
+        )
+        meta = {
+            "version": STATE_VERSION,
+            "term": self.term,
+            "options": self.options,
+            "sources": self.sources,
+        }
+        with open(os.path.join(tmp_path, _META_FILE), "w") as f:
+            json.dump(meta, f)
+        old_path = f"{path}.{os.getpid()}.old"
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, term):
+        """Estado gravado em ``path`` para ``term``, ou um estado vazio se não
+        houver um atual (outra versão, outro termo ou outras opções)."""
+        state = cls(term)
+        try:
+            with open(os.path.join(path, _META_FILE), "r") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return state
+        if (
+            meta.get("version") != STATE_VERSION
+            or meta.get("term") != term
+            or meta.get("options") != state.options
+        ):
+            return state
+        owners = _read_table(os.path.join(path, "owners.arrow")).to_pandas()
+        return cls(
+            term,
+            PanelState.load(path),
+            meta["sources"],
+            pd.Series(
+                owners["fonte"].to_numpy(),
+                index=pd.Index(owners["chave"], dtype=object),
+            ),
+            meta["options"],
+        )
+
+
+def append_files(term, file_paths, name=None, root=STATE_DIR, rebuild=False):
+    """Incorpora ``file_paths`` ao estado ``name`` (o termo, por padrão) e
+    grava o snapshot do painel sobre todos os arquivos do estado."""
+    term = normalize_term(term)
+    path = os.path.join(root, name or term)
+    state = AppendState(term) if rebuild else AppendState.load(path, term)
+    if state.options.get("dedup") != DEDUP_LATEST:
+        # O estado troca cada processo pela última versão; com outra política
+        # o snapshot não bateria com o dataset do mesmo fingerprint
+        raise ValueError(
+            f"a incorporação incremental só segue a política {DEDUP_LATEST!r}; "
+            f"DEDUP_POLICY é {state.options.get('dedup')!r}"
+        )
+    results = []
+    for file_path in file_paths:
+        start = time.perf_counter()
+        folded = state.fold(file_path)
+        results.append((file_path, folded, time.perf_counter() - start))
+    if state.panels is None:
+        return state, results
+
+    state.save(path)
+    fingerprint = dataset_fingerprint(state.file_paths, state.options)
+    # O cubo também vai para o disco: a barra de filtros do painel o lê
+    CUBES.put(fingerprint, term, state.panels.cube, state.file_paths, state.options)
+    SNAPSHOTS.put(
+        fingerprint,
+        term,
+        state.panels.to_data(),
+        state.file_paths,
+        state.options,
+    )
+    return state, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Incorpora arquivos novos aos agregados do painel."
+    )
+    parser.add_argument(
+        "files", nargs="+", help="arquivos de processos, na ordem de chegada"
+    )
+    parser.add_argument(
+        "--term",
+        required=True,
+        help="CNPJ, raiz de CNPJ ou lista separada por vírgulas",
+    )
+    parser.add_argument("--name", help="nome do estado (padrão: o termo)")
+    parser.add_argument("--dir", default=STATE_DIR, help="diretório dos estados")
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="descarta o estado e incorpora tudo de novo",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        state, results = append_files(
+            args.term, args.files, args.name, args.dir, args.rebuild
+        )
+    except ValueError as error:
+        print(f"erro: {error}", file=sys.stderr)
+        return 1
+
+    for file_path, folded, seconds in results:
+        if folded is None:
+            print(f"{file_path}: já incorporado")
+        else:
+            rows, replaced = folded
+            print(
+                f"{file_path}: {rows} processo(s), {replaced} substituído(s), {seconds:.1f} s"
+            )
+    print(f"{len(state.owners)} processo(s) em {len(state.sources)} arquivo(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
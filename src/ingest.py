@@ -0,0 +1,336 @@
+import json
+import logging
+import os
+import re
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Quantidade de processos normalizados por vez; o pico de memória da leitura
+# cresce com este valor, não com o tamanho do arquivo.
+CHUNK_SIZE = 5000
+READ_SIZE = 1 << 20
+
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+
+# Carga paralela: só compensa abrir o pool com mais de um arquivo e volume
+# suficiente para pagar a criação dos processos e a volta dos frames.
+LOAD_WORKERS = os.cpu_count() or 1
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+
+# Deduplicação dos processos na carga: mesmo processo vindo de mais de um
+# arquivo (ex.: duas empresas do grupo no mesmo processo) ou repetido no arquivo
+KEY_FIELD = "numeroProcessoUnico"
+DEDUP_LATEST = "latest"  # fica a última versão, na ordem dos arquivos
+DEDUP_MERGE_PARTIES = "merge_partes"  # idem, com as partes de todas as versões
+DEDUP_POLICIES = (DEDUP_LATEST, DEDUP_MERGE_PARTIES)
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s*")
+_DECODER = json.JSONDecoder()
+
+
+class _JsonStream:
+    """Leitor incremental de um documento JSON, valor a valor."""
+
+    def __init__(self, file, read_size=READ_SIZE):
+        self.file = file
+        self.read_size = read_size
+        self.buffer = ""
+        self.pos = 0
+
+    def _fill(self):
+        # Descarta o que já foi consumido e lê pelo menos o que falta no buffer,
+        # para que um registro grande não seja decodificado vezes demais.
+        pending = self.buffer[self.pos :]
+        chunk = self.file.read(max(self.read_size, len(pending)))
+        if not chunk:
+            return False
+        self.buffer = pending + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON inválido: esperado {char!r}, encontrado {found!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # Um número no fim do buffer pode estar truncado ("12" de "123").
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_array(stream):
+    stream.expect("[")
+    if stream.peek() == "]":
+        return
+    while True:
+        yield stream.value()
+        if stream.peek() == ",":
+            stream.pos += 1
+            continue
+        stream.expect("]")
+        return
+
+
+def iter_json_records(file):
+    """Percorre a lista de processos de um arquivo no formato
+    ``{"chave": [...]}`` (usando a primeira chave, como ``load_data``) ou
+    de uma lista JSON simples, sem carregar o documento inteiro."""
+    stream = _JsonStream(file)
+    if stream.peek() == "[":
+        yield from _iter_array(stream)
+        return
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    stream.value()
+    stream.expect(":")
+    if stream.peek() == "[":
+        yield from _iter_array(stream)
+    else:
+        yield stream.value()
+
+
+def iter_ndjson_records(file):
+    for line in file:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_records(file_path):
+    with open(file_path, "r") as f:
+        if file_path.endswith(NDJSON_EXTENSIONS):
+            yield from iter_ndjson_records(f)
+        else:
+            yield from iter_json_records(f)
+
+
+def compile_projection(fields):
+    """Árvore de chaves a partir de caminhos com ponto. Um caminho que passa
+    por uma lista vale para cada item dela (``"partes.nome"``); um caminho
+    que termina numa chave mantém o valor inteiro."""
+    tree = {}
+    for field in fields:
+        node = tree
+        keys = field.split(".")
+        for key in keys[:-1]:
+            child = node.setdefault(key, {})
+            if child is None:
+                break  # um prefixo já mantém o valor inteiro
+            node = child
+        else:
+            node[keys[-1]] = None
+    return tree
+
+
+def project_record(record, tree):
+    if not isinstance(record, dict):
+        return record
+    projected = {}
+    for key, value in record.items():
+        if key not in tree:
+            continue
+        subtree = tree[key]
+        if subtree is None:
+            projected[key] = value
+        elif isinstance(value, list):
+            projected[key] = [project_record(item, subtree) for item in value]
+        else:
+            projected[key] = project_record(value, subtree)
+    return projected
+
+
+def iter_chunks(records, chunk_size=CHUNK_SIZE):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def concat_chunks(frames):
+    """Concatena blocos normalizados reproduzindo os dtypes que um único
+    ``pd.json_normalize`` sobre todos os registros teria inferido."""
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+
+    with warnings.catch_warnings():
+        # O ajuste de dtypes abaixo não depende de como o pandas trata blocos
+        # inteiramente nulos na concatenação.
+        warnings.simplefilter("ignore", FutureWarning)
+        df = pd.concat(frames, ignore_index=True)
+
+    # Uma coluna só com nulos em um bloco (ou ausente dele) vira object e
+    # contamina o resultado; a inferência sobre a coluna completa devolve o
+    # dtype que o frame inteiro teria. Colunas de texto ou listas continuam
+    # object.
+    for column in df.columns[(df.dtypes == object).to_numpy()]:
+        df[column] = df[column].infer_objects()
+    return df
+
+
+def load_company_file(file_path, chunk_size=CHUNK_SIZE, fields=None):
+    """Normaliza os processos de um arquivo em blocos de ``chunk_size``.
+
+    Com ``fields``, cada registro é podado para esses caminhos logo após ser
+    decodificado, antes de entrar no bloco: os campos não usados nunca chegam
+    ao ``json_normalize`` nem ao frame.
+    """
+    records = iter_records(file_path)
+    if fields is not None:
+        tree = compile_projection(fields)
+        records = (project_record(record, tree) for record in records)
+    frames = [pd.json_normalize(chunk) for chunk in iter_chunks(records, chunk_size)]
+    return concat_chunks(frames)
+
+
+class DataLoadError(Exception):
+    """Falha na carga de um ou mais arquivos; ``errors`` mapeia cada
+    arquivo à exceção que ele levantou."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        details = "; ".join(f"{path}: {error!r}" for path, error in errors.items())
+        super().__init__(f"Falha ao carregar {len(errors)} arquivo(s): {details}")
+
+
+def _should_parallelize(file_paths, workers, min_bytes):
+    if workers <= 1 or len(file_paths) < 2:
+        return False
+    total = 0
+    for path in file_paths:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass  # o erro aparece na carga, associado ao arquivo
+    return total >= min_bytes
+
+
+def load_files(
+    file_paths, load_file=load_company_file, workers=None, min_bytes=PARALLEL_MIN_BYTES
+):
+    """Carrega cada arquivo com ``load_file`` e devolve os frames na ordem de
+    ``file_paths``. Com volume suficiente a carga é distribuída em um pool de
+    ``workers`` processos; ``load_file`` precisa ser serializável."""
+    workers = LOAD_WORKERS if workers is None else workers
+    frames, errors = {}, {}
+
+    if _should_parallelize(file_paths, workers, min_bytes):
+        with ProcessPoolExecutor(max_workers=min(workers, len(file_paths))) as pool:
+            futures = {path: pool.submit(load_file, path) for path in file_paths}
+            for path, future in futures.items():
+                try:
+                    frames[path] = future.result()
+                except Exception as error:
+                    errors[path] = error
+    else:
+        for path in file_paths:
+            try:
+                frames[path] = load_file(path)
+            except Exception as error:
+                errors[path] = error
+
+    if errors:
+        raise DataLoadError(errors)
+    return [frames[path] for path in file_paths]
+
+
+def _party_key(party):
+    if not isinstance(party, dict):
+        return repr(party)
+    return (party.get("nome"), party.get("polo"), party.get("cnpj"))
+
+
+def _merge_parties(versions):
+    """Partes de todas as versões de um processo, da mais nova para a mais
+    antiga: as da última versão e, depois, as que só as anteriores têm."""
+    merged, seen = [], set()
+    for parties in reversed(versions):
+        for party in parties if isinstance(parties, list) else []:
+            key = _party_key(party)
+            if key not in seen:
+                seen.add(key)
+                merged.append(party)
+    return merged
+
+
+def deduplicate(df, key=KEY_FIELD, policy=DEDUP_LATEST):
+    """Uma linha por processo (``key``), na última versão, e a quantidade de
+    linhas removidas. Linhas sem ``key`` ficam todas.
+
+    As versões são encontradas pela tabela hash do ``duplicated``, com
+    memória proporcional aos processos distintos. Com ``DEDUP_MERGE_PARTIES``
+    a versão mantida recebe também as partes das anteriores; só os processos
+    repetidos passam pelo Python.
+    """
+    if policy not in DEDUP_POLICIES:
+        raise ValueError(f"política de deduplicação desconhecida: {policy!r}")
+    if key not in df.columns or df.empty:
+        return df, 0
+
+    keyed = df[key].notna().to_numpy()
+    duplicated = keyed & df.duplicated(key, keep="last").to_numpy()
+    removed = int(duplicated.sum())
+    if not removed:
+        return df, 0
+    logger.info("%d processo(s) duplicado(s) removido(s) (%s)", removed, policy)
+
+    if policy == DEDUP_MERGE_PARTIES and "partes" in df.columns:
+        df = df.copy(deep=False)
+        partes = df["partes"]
+        arrow_type = (
+            pa.array(partes.array).type
+            if isinstance(partes.dtype, pd.ArrowDtype)
+            else None
+        )
+        values = (
+            pa.array(partes.array).to_pylist()
+            if arrow_type is not None
+            else partes.tolist()
+        )
+        repeated = np.flatnonzero(keyed & df.duplicated(key, keep=False).to_numpy())
+        versions = {}
+        for row, process in zip(repeated, df[key].to_numpy()[repeated]):
+            versions.setdefault(process, []).append(row)
+        for rows in versions.values():
+            values[rows[-1]] = _merge_parties([values[row] for row in rows])
+        if arrow_type is not None:
+            df["partes"] = pd.Series(
+                pd.arrays.ArrowExtensionArray(pa.array(values, type=arrow_type)),
+                index=df.index,
+            )
+        else:
+            df["partes"] = pd.Series(values, index=df.index, dtype=object)
+
+    return df.loc[~duplicated].reset_index(drop=True), removed
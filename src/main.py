@@ -1,22 +1,54 @@
-import json
-import re
+import importlib
+from functools import partial
 
 import pandas as pd
 import plotly.express as px
 import streamlit as st
 from babel.numbers import format_currency
-from unidecode import unidecode
+
+from cache import DatasetCache, MemoryCache, fields_options
+from cube import (
+    ACTIVE_POLES,
+    COUNT,
+    PASSIVE_POLES,
+    POLE_DIMENSION,
+    CubeStore,
+    cube_distributions,
+)
+from dataset import Dataset, dataset_fingerprint
+from distributions import count_distributions, count_histograms
+from entities import cnpj_roots, resolve_names
+from geo import load_geojson
+from heavy_hitters import TOPK_CAPACITY, SpaceSaving
+from ingest import CHUNK_SIZE, DEDUP_LATEST, deduplicate, load_company_file, load_files
+from names import NAME_NORMALIZER, count_names, normalize_names
+from profiling import PROFILER, profiled, stage
+from registry import DatasetRegistry
+from schema import YEAR_COLUMN, apply_schema, year_of
+from snapshots import SnapshotStore
+from tables import (
+    arrow_nested_columns,
+    flatten_records,
+    iter_party_names,
+    normalize_term,
+    principal_subjects,
+)
+from versions import code_version
+
 FAIXAS_MESES_ORDEM = [
-        "0 a 3 meses",
-        "4 a 6 meses",
-        "7 a 9 meses",
-        "10 a 12 meses",
-        "13 a 15 meses",
-        "16 a 18 meses",
-        "19 a 21 meses",
-        "22 a 24 meses",
-        "24+ meses"
-    ]
+    "0 a 3 meses",
+    "4 a 6 meses",
+    "7 a 9 meses",
+    "10 a 12 meses",
+    "13 a 15 meses",
+    "16 a 18 meses",
+    "19 a 21 meses",
+    "22 a 24 meses",
+    "24+ meses",
+]
+
+# Limites, em dias, das faixas acima (a primeira inclui o zero)
+FAIXAS_MESES_LIMITES = [0, 90, 180, 270, 360, 450, 540, 630, 720, float("inf")]
 
 FAIXAS_MESES_COLORS = [
     "#45A874",  # Verde Claro
@@ -31,9 +63,11 @@ FAIXAS_VALOR_ORDEM = [
     "R$5 a R$20 mil",
     "R$20 a R$50 mil",
     "R$50 a R$100 mil",
-    "Acima de R$100 mil"
+    "Acima de R$100 mil",
 ]
 
+FAIXAS_VALOR_LIMITES = [0, 5000, 20000, 50000, 100000, float("inf")]
+
 # Definir a paleta de cores correspondente
 FAIXAS_VALOR_COLORS = [
     "#45A874",  # Verde Claro
@@ -43,25 +77,198 @@ FAIXAS_VALOR_COLORS = [
     "#F4F3EE",  # Off-White
 ]
 
+# Distribuições lidas do cubo: chave -> (dimensão, nomes das colunas, cut, cut_limit)
+DISTRIBUICOES_CUBO = {
+    "distribuicao_ramo_direito": (
+        "statusPredictus.ramoDireito",
+        ["Ramo", "Total"],
+        True,
+        5,
+    ),
+    "distribuicao_status_processos": (
+        "statusPredictus.statusProcesso",
+        ["Status", "Total"],
+        False,
+        5,
+    ),
+    "distribuicao_tribunal": ("tribunal", ["Tribunal", "Total"], True, 5),
+    "distribuicao_segmento": ("segmento", ["Segmento", "Total"], True, 5),
+    "distribuicao_grau": ("grauProcesso", ["Grau", "Total"], False, 5),
+    "df_estado": ("uf", ["UF", "Total"], False, 5),
+}
+
+# Distribuições contadas fora do cubo: chave -> (nomes das colunas, cut, cut_limit)
+DISTRIBUICOES_FRAME = {
+    "distribuicao_julgamento": (["Julgamento", "Total"], False, 5),
+    "distribuicao_classes": (["Classe Processual", "Total"], True, 5),
+    "distribuicao_assuntos": (["Assunto", "Total"], False, 5),
+}
+
+# Faixas dos histogramas: chave -> (limites, rótulos, nomes das colunas)
+HISTOGRAMAS = {
+    "dias_ate_arquivamento": (
+        FAIXAS_MESES_LIMITES,
+        FAIXAS_MESES_ORDEM,
+        ["faixaMeses", "contagem"],
+    ),
+    "dias_ate_transito_julgado": (
+        FAIXAS_MESES_LIMITES,
+        FAIXAS_MESES_ORDEM,
+        ["faixaMeses", "contagem"],
+    ),
+    "totalValorCausa": (
+        FAIXAS_VALOR_LIMITES,
+        FAIXAS_VALOR_ORDEM,
+        ["faixaValor", "contagem"],
+    ),
+    "totalValorExecucao": (
+        FAIXAS_VALOR_LIMITES,
+        FAIXAS_VALOR_ORDEM,
+        ["faixaValorExecucao", "contagem"],
+    ),
+}
+
+DATASET_CACHE = DatasetCache()
+
+# Resultados de `extract_data` por (fingerprint do dataset, termo)
+EXTRACT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+EXTRACT_CACHE = MemoryCache(EXTRACT_CACHE_MAX_BYTES)
+
+# Ranking de partes do painel exato (auditoria) ou aproximado, com memória
+# limitada, para os clientes com dezenas de milhões de partes
+TOP_NAMES_EXACT = True
+
+# Soma no nome canônico as variações de um mesmo nome ("BCO X SA", "BANCO
+# X") que compartilham a raiz de CNPJ (partes) ou a OAB (advogados); nomes
+# sem identificador, como os de pessoas físicas, nunca são unidos. Vale para
+# o ranking exato; o aproximado não guarda os identificadores e conta os
+# nomes normalizados como estão. Desligar para auditar as grafias originais.
+MERGE_NAME_VARIANTS = True
+
+# Processos repetidos nos arquivos: fica a última versão (DEDUP_LATEST) ou
+# a última com as partes de todas (ingest.DEDUP_MERGE_PARTIES); None desliga
+DEDUP_POLICY = DEDUP_LATEST
+
+# Colunas aninhadas (partes, assuntos, julgamentos) em Arrow em vez de
+# listas de dicts do Python; desligado, o frame fica como o json_normalize
+ARROW_NESTED = False
+
+# Um frame por conjunto de dados no processo, mapeado de um arquivo que os
+# workers do `precompute.py` também mapeiam
+REGISTRY = DatasetRegistry()
+
+# Filtros cruzados: dimensão -> rótulo na barra lateral
+FILTROS = {
+    "uf": "Estado",
+    "tribunal": "Tribunal",
+    "segmento": "Segmento",
+    "grauProcesso": "Grau",
+    "statusPredictus.ramoDireito": "Ramo do Direito",
+    YEAR_COLUMN: "Ano de distribuição",
+}
+
+# Períodos de distribuição: rótulo -> meses até hoje (None: sem limite)
+PERIODO_PERSONALIZADO = "Personalizado"
+PERIODOS = {
+    "Todo o período": None,
+    "Últimos 12 meses": 12,
+    "Últimos 24 meses": 24,
+    "Últimos 5 anos": 60,
+    PERIODO_PERSONALIZADO: None,
+}
+
+# Gráficos que filtram o painel quando clicados: chave -> (dimensão, campo do ponto)
+GRAFICOS_FILTRO = {
+    "grafico_estado": ("uf", "location"),
+    "grafico_tribunal": ("tribunal", "label"),
+    "grafico_ramo": ("statusPredictus.ramoDireito", "label"),
+    "grafico_segmento": ("segmento", "label"),
+    "grafico_grau": ("grauProcesso", "label"),
+    "grafico_ano": (YEAR_COLUMN, "x"),
+}
+
+
+def _selectable(key):
+    # Gráfico cujo clique vira filtro (ver GRAFICOS_FILTRO)
+    return {"key": key, "on_select": "rerun", "selection_mode": "points"} if key else {}
+
+
 def format_currency_brl(value):
     return format_currency(value, "BRL", locale="pt_BR")
 
-def load_data(file_paths):
-    dataframes = []
-    for file in file_paths:
-        with open(file, "r") as f:
-            json_data = f.read()
-        json_dict = json.loads(json_data)
-        main_key = next(iter(json_dict))
-        df = pd.json_normalize(json_dict[main_key])
-        dataframes.append(df)
-    return pd.concat(dataframes, ignore_index=True)
+
+def load_data(
+    file_paths,
+    chunk_size=CHUNK_SIZE,
+    use_cache=True,
+    workers=None,
+    fields=None,
+    arrow_nested=False,
+    dedup=DEDUP_LATEST,
+):
+    # Leitura em streaming: normaliza blocos de `chunk_size` processos,
+    # mantendo apenas os campos em `fields` (ver EXTRACT_DATA_FIELDS)
+    if use_cache:
+        options = fields_options(fields)
+        # O frame final (sem duplicados e tipado) do conjunto de arquivos
+        frame_options = {**(options or {}), "dedup": dedup}
+        df = DATASET_CACHE.get_frame(file_paths, frame_options, arrow_nested)
+        if df is not None:
+            return apply_schema(df)
+        load_file = partial(
+            DATASET_CACHE.load,
+            options=options,
+            arrow_nested=arrow_nested,
+            chunk_size=chunk_size,
+            fields=fields,
+        )
+    else:
+        load_file = partial(load_company_file, chunk_size=chunk_size, fields=fields)
+
+    # Arquivos grandes são processados em paralelo, mantendo a ordem de entrada
+    dataframes = load_files(file_paths, load_file, workers)
+    df = pd.concat(dataframes, ignore_index=True)
+    removed = 0
+    if dedup:
+        # Um processo por numeroProcessoUnico (ver ingest.DEDUP_POLICIES)
+        df, removed = deduplicate(df, policy=dedup)
+    if arrow_nested:
+        # Partes, assuntos e julgamentos como list<struct> (ver tables.NESTED_COLUMNS)
+        df = arrow_nested_columns(df)
+    df = apply_schema(df)
+    df.attrs["duplicados_removidos"] = removed
+    if use_cache:
+        DATASET_CACHE.put_frame(file_paths, df, frame_options)
+    return df
 
 
-def load_geojson(geojson_path="resource/brazil_states.geojson"):
-    with open(geojson_path, "r") as file:
-        geojson_brasil = json.load(file)
-    return geojson_brasil
+def load_dataset(file_paths, **kwargs):
+    # O frame só é carregado se alguma extração não estiver em cache
+    return Dataset.from_files(file_paths, partial(load_data, **kwargs), options=kwargs)
+
+
+def attach_dataset(file_paths, **kwargs):
+    # Dataset compartilhado por todas as sessões (ver registry.DatasetRegistry)
+    return REGISTRY.attach(file_paths, partial(load_data, **kwargs), options=kwargs)
+
+
+def prepare_dataset(file_paths, **kwargs):
+    # Grava o arquivo compartilhado sem manter o dataset neste processo
+    return REGISTRY.prepare(file_paths, partial(load_data, **kwargs), options=kwargs)
+
+
+def session_dataset(file_paths, **kwargs):
+    # Cada sessão guarda a sua referência; uma versão nova das fontes troca
+    # a referência, e a da sessão encerrada é devolvida pelo coletor de lixo
+    fingerprint = dataset_fingerprint(file_paths, kwargs)
+    handle = st.session_state.get("dataset_handle")
+    if handle is None or handle.dataset.fingerprint != fingerprint:
+        if handle is not None:
+            handle.release()
+        handle = st.session_state["dataset_handle"] = attach_dataset(
+            file_paths, **kwargs
+        )
+    return handle.dataset
 
 
 def load_states(filename="resource/estados_brasil.txt"):
@@ -70,35 +277,22 @@ def load_states(filename="resource/estados_brasil.txt"):
     return estados_brasil
 
 
-def extract_distribution_by_column(df, column_name, new_column_names, cut=False, cut_limit=5):
-
-    distribution = df[column_name].value_counts().reset_index()
-    distribution.columns = new_column_names
-    if len(distribution) > cut_limit and cut:
-        top_categories = distribution.iloc[:cut_limit]
-        outros_total = distribution.iloc[cut_limit:][new_column_names[1]].sum()
-        outros_row = pd.DataFrame({new_column_names[0]: ["OUTROS"], new_column_names[1]: [outros_total]})
-        distribution = pd.concat([top_categories, outros_row], ignore_index=True)
-    return distribution
+def extract_distribution_by_column(
+    df, column_name, new_column_names, cut=False, cut_limit=5
+):
+    spec = (column_name, new_column_names, cut, cut_limit)
+    return count_distributions(df, {column_name: spec})[column_name]
 
 
-def extract_top_principal_subjects(df, cut=False, cut_limit=5):
-    df_ranking = (
-        df["assuntosCNJ"]
-        .explode()
-        .dropna()
-        .loc[
-            lambda x: x.apply(
-                lambda item: isinstance(item, dict) and item.get("ePrincipal", False)
-            )
-        ]
-        .apply(lambda item: item["titulo"])
-        .value_counts()
-        .reset_index()
-        .rename(columns={"assuntosCNJ": "Assunto", "count": "Total"})
+def extract_top_principal_subjects(subjects, cut=False, cut_limit=5):
+    return rank_principal_subjects(
+        principal_subjects(subjects)["titulo"].value_counts(), cut, cut_limit
     )
 
 
+def rank_principal_subjects(counts, cut=False, cut_limit=5):
+    # `counts`: total de cada assunto principal, já em ordem decrescente
+    df_ranking = counts.rename_axis("Assunto").reset_index(name="Total")
 
     if cut and len(df_ranking) > cut_limit:
         top_categories = df_ranking.iloc[:cut_limit]
@@ -108,85 +302,85 @@ def extract_top_principal_subjects(df, cut=False, cut_limit=5):
 
     return df_ranking
 
-def extract_distribution_from_principal_subjects(df, new_column_names, cut=False, cut_limit=5):
-    # Explodir e filtrar os assuntos principais
-    principal_subjects = (
-        df["assuntosCNJ"]
-        .explode()
-        .dropna()
-        .loc[
-            lambda x: x.apply(
-                lambda item: isinstance(item, dict) and item.get("ePrincipal", False)
-            )
-        ]
-        .apply(lambda item: item["titulo"])
-    )
 
-    # Contar os valores e criar a distribuição
-    distribution = principal_subjects.value_counts().reset_index()
+def extract_distribution_from_principal_subjects(
+    subjects, new_column_names, cut=False, cut_limit=5
+):
+    # Contar os assuntos principais e criar a distribuição
+    distribution = principal_subjects(subjects)["titulo"].value_counts().reset_index()
     distribution.columns = new_column_names
 
     # Aplicar corte, se necessário
     if cut and len(distribution) > cut_limit:
         top_categories = distribution.iloc[:cut_limit]
         outros_total = distribution.iloc[cut_limit:][new_column_names[1]].sum()
-        outros_row = pd.DataFrame({new_column_names[0]: ["OUTROS"], new_column_names[1]: [outros_total]})
+        outros_row = pd.DataFrame(
+            {new_column_names[0]: ["OUTROS"], new_column_names[1]: [outros_total]}
+        )
         distribution = pd.concat([top_categories, outros_row], ignore_index=True)
 
     # Calcular percentual
-    distribution["Percentual"] = (distribution[new_column_names[1]] / distribution[new_column_names[1]].sum()) * 100
+    distribution["Percentual"] = (
+        distribution[new_column_names[1]] / distribution[new_column_names[1]].sum()
+    ) * 100
     distribution["Percentual"] = distribution["Percentual"].apply(lambda x: f"{x:.2f}%")
 
     return distribution
 
 
-def normalize_name(name):
-    if isinstance(name, str):
-        name = unidecode(name.strip().upper())
-        name = re.sub(r'\bS[./\s]?A\b', 'SA', name)
-        name = re.sub(r'[./-]', ' ', name)
-        name = re.sub(r'\b(SA|LTDA|LIMITADA|ME|EPP|EIRELI|INC|LLC?)\b', '', name)
-        name = re.sub(r'\s+', ' ', name)
-        name = name.strip()
-    return name
+def rank_names(counts, top_n=5):
+    # Ranking Nome/Total/Percentual a partir do total de cada nome
+    ranking = (
+        counts.sort_values(ascending=False, kind="stable")
+        .rename_axis("Nome")
+        .reset_index(name="Total")
+    )
+    ranking["Percentual"] = (ranking["Total"] / ranking["Total"].sum()) * 100
+    ranking["Percentual"] = ranking["Percentual"].apply(lambda x: f"{x:.2f}%")
+    return ranking.head(top_n)
 
 
-def extract_top_parties(df, top_n=5):
-    df_parties = df["partes"].explode().apply(pd.Series)
-    df_parties["nome"] = df_parties["nome"].apply(normalize_name)
-    top_parties = (
-        df_parties["nome"]
-        .value_counts()
-        .reset_index()
-        .rename(columns={"nome": "Nome", "count": "Total"})
-    )
-    top_parties["Percentual"] = (top_parties["Total"] / top_parties["Total"].sum()) * 100
-    top_parties["Percentual"] = top_parties["Percentual"].apply(lambda x: f"{x:.2f}%")
-    return top_parties.head(top_n)
+def extract_top_parties(parties, top_n=5, merge_variants=None):
+    names = normalize_names(parties["nome"])
+    if MERGE_NAME_VARIANTS if merge_variants is None else merge_variants:
+        # Só nomes com a mesma raiz de CNPJ; pessoas físicas ficam como estão
+        names = resolve_names(names, identifiers=cnpj_roots(parties["cnpj"]))
+    return rank_names(count_names(names), top_n)
 
 
-def extract_top_lawyers(df, top_n=5):
-    df_parties = df["partes"].explode().apply(pd.Series)
-    df_lawyers = pd.json_normalize(df_parties.explode("advogados")["advogados"]).dropna(
-        subset=["oab.numero"]
-    )
-    df_lawyers["nome"] = df_lawyers["nome"].apply(normalize_name)
-    top_lawyers = (
-        df_lawyers["nome"]
-        .value_counts()
-        .reset_index()
-        .rename(columns={"nome": "Nome", "count": "Total"})
+def extract_top_lawyers(lawyers, top_n=5, merge_variants=None):
+    df_lawyers = lawyers.dropna(subset=["oab.numero"])
+    names = normalize_names(df_lawyers["nome"])
+    if MERGE_NAME_VARIANTS if merge_variants is None else merge_variants:
+        names = resolve_names(names, identifiers=df_lawyers["oab.numero"].astype(str))
+    return rank_names(count_names(names), top_n)
+
+
+def _approximate_ranking(names, top_n, capacity):
+    summary = SpaceSaving(capacity)
+    normalized = NAME_NORMALIZER.normalize_stream(names)
+    summary.update_stream(
+        name for name in normalized if name is not None and name == name
     )
-    top_lawyers["Percentual"] = (top_lawyers["Total"] / top_lawyers["Total"].sum()) * 100
-    top_lawyers["Percentual"] = top_lawyers["Percentual"].apply(lambda x: f"{x:.2f}%")
-    return top_lawyers.head(top_n)
+    NAME_NORMALIZER.save()
+
+    ranking = pd.DataFrame(summary.top(top_n), columns=["Nome", "Total", "Erro máx."])
+    ranking["Percentual"] = (ranking["Total"] / summary.total) * 100
+    ranking["Percentual"] = ranking["Percentual"].apply(lambda x: f"{x:.2f}%")
+    return ranking[["Nome", "Total", "Percentual", "Erro máx."]]
+
+
+def extract_top_parties_approximate(partes, top_n=5, capacity=TOPK_CAPACITY):
+    # Lê os nomes direto da coluna `partes`, com memória limitada a `capacity`
+    # contadores; "Erro máx." é quanto o Total pode estar acima do real
+    return _approximate_ranking(iter_party_names(partes), top_n, capacity)
 
 
 def extract_state_data(df):
     estados_brasil = load_states()
 
     df_states = (
-        df.groupby("uf")
+        df.groupby("uf", observed=True)
         .agg(
             quantidade=("numeroProcessoUnico", "count"),
             valor_total=("valorCausa.valor", "sum"),
@@ -211,58 +405,58 @@ def extract_state_data(df):
 
 
 def extract_dist_vs_arq(df):
-    df["dataDistribuicao"] = pd.to_datetime(df["dataDistribuicao"], errors="coerce")
-    df["statusPredictus.dataArquivamento"] = pd.to_datetime(
-        df["statusPredictus.dataArquivamento"], errors="coerce"
-    )
+    ano_distribuicao = df[YEAR_COLUMN].rename_axis("Ano")
+    ano_arquivamento = year_of(df["statusPredictus.dataArquivamento"]).rename("Ano")
 
-    if pd.api.types.is_datetime64_any_dtype(df["dataDistribuicao"]):
-        distribuidos = df["dataDistribuicao"].dt.year.value_counts().rename("Distribuídos")
-    else:
-        distribuidos = pd.Series(dtype="int", name="Distribuídos")
+    distribuidos = ano_distribuicao.value_counts()
+    arquivados = ano_arquivamento.value_counts()
 
-    print(distribuidos)
+    valor_distribuidos = df.groupby(ano_distribuicao.rename("Ano"))[
+        "valorCausa.valor"
+    ].sum()
+    valor_arquivados = df.groupby(ano_arquivamento)["valorCausa.valor"].sum()
 
-    if pd.api.types.is_datetime64_any_dtype(df["statusPredictus.dataArquivamento"]):
-        arquivados = df["statusPredictus.dataArquivamento"].dt.year.value_counts().rename("Arquivados")
-    else:
-        arquivados = pd.Series(dtype="int", name="Arquivados")
+    return dist_vs_arq_frame(
+        distribuidos, arquivados, valor_distribuidos, valor_arquivados
+    )
 
-    print(arquivados)
 
-    valor_distribuidos = (
-        df.groupby(df["dataDistribuicao"].dt.year)["valorCausa.valor"].sum().rename("Valor de Causa Distribuídos")
+def dist_vs_arq_frame(distribuidos, arquivados, valor_distribuidos, valor_arquivados):
+    # Contagens e valores de causa por ano de distribuição e de arquivamento
+    df_dist_arq = pd.concat(
+        [
+            distribuidos.rename("Distribuídos"),
+            arquivados.rename("Arquivados"),
+            valor_distribuidos.rename("Valor de Causa Distribuídos"),
+            valor_arquivados.rename("Valor de Causa Arquivados"),
+        ],
+        axis=1,
     )
-    print(valor_distribuidos)
-
-    valor_arquivados = (
-        df.groupby(df["statusPredictus.dataArquivamento"].dt.year)["valorCausa.valor"].sum().rename("Valor de Causa Arquivados")
+    df_dist_arq = df_dist_arq.rename_axis("Ano").reset_index()
+    # Anos sem processos ficam vazios (NaN) no gráfico, como antes
+    df_dist_arq = df_dist_arq.astype(
+        {"Distribuídos": "float64", "Arquivados": "float64"}
     )
-    print(valor_arquivados)
-
-    df_dist_arq = pd.concat([distribuidos, arquivados, valor_distribuidos, valor_arquivados], axis=1).reset_index()
-    df_dist_arq = df_dist_arq.rename(columns={"index": "Ano"})
 
     return df_dist_arq
 
 
+def extract_principal_subjects_per_year(subjects, n=3):
+    # Assuntos principais com o ano de distribuição do processo
+    df_assuntos = principal_subjects(subjects).rename(columns={"titulo": "Assunto"})
+    return principal_subjects_per_year(
+        df_assuntos.groupby(["Ano", "Assunto"], dropna=False).size(), n
+    )
 
-def extract_principal_subjects_per_year(df, n=3):
-    # Extrair o ano
-    df["Ano"] = pd.to_datetime(df["dataDistribuicao"], errors="coerce").dt.year
 
-    # Explodir e filtrar os assuntos principais
-    df_assuntos = (
-        df.explode("assuntosCNJ")
-        .dropna(subset=["assuntosCNJ"])
-        .loc[lambda x: x["assuntosCNJ"].apply(lambda item: isinstance(item, dict) and item.get("ePrincipal", False))]
-        .assign(Assunto=lambda x: x["assuntosCNJ"].apply(lambda item: item["titulo"]))
-    )
+def principal_subjects_per_year(counts, n=3):
+    # `counts`: total de cada (Ano, Assunto); assuntos sem título contam só
+    # no total do ano
+    counts = counts[counts.index.get_level_values("Ano").notna()]
 
     # Contar os assuntos por ano
     df_assuntos_contagem = (
-        df_assuntos.groupby(["Ano", "Assunto"])
-        .size()
+        counts[counts.index.get_level_values("Assunto").notna()]
         .reset_index(name="Total")
         .sort_values(by=["Ano", "Total"], ascending=[True, False])
     )
@@ -271,10 +465,14 @@ def extract_principal_subjects_per_year(df, n=3):
     df_top_assuntos = df_assuntos_contagem.groupby("Ano").head(n)
 
     # Calcular o percentual de ocorrência
-    total_por_ano = df_assuntos.groupby("Ano").size().rename("TotalAno")
+    total_por_ano = counts.groupby(level="Ano").sum().rename("TotalAno")
     df_top_assuntos = df_top_assuntos.merge(total_por_ano, on="Ano")
-    df_top_assuntos["Percentual"] = (df_top_assuntos["Total"] / df_top_assuntos["TotalAno"]) * 100
-    df_top_assuntos["Percentual"] = df_top_assuntos["Percentual"].apply(lambda x: f"{x:.2f}%")
+    df_top_assuntos["Percentual"] = (
+        df_top_assuntos["Total"] / df_top_assuntos["TotalAno"]
+    ) * 100
+    df_top_assuntos["Percentual"] = df_top_assuntos["Percentual"].apply(
+        lambda x: f"{x:.2f}%"
+    )
 
     # Selecionar colunas finais e converter o ano para inteiro
     df_top_assuntos = df_top_assuntos[["Ano", "Assunto", "Total", "Percentual"]]
@@ -283,268 +481,241 @@ def extract_principal_subjects_per_year(df, n=3):
     return df_top_assuntos
 
 
-def create_assuntos_df(df):
-    df_assuntos = (
-        df["assuntosCNJ"]
-        .explode()
-        .dropna()
-        .apply(lambda x: x["titulo"] if isinstance(x, dict) and x.get("ePrincipal", False) else None)
-        .dropna()
-        .value_counts()
-        .reset_index()
-    )
+def create_assuntos_df(subjects):
+    df_assuntos = principal_subjects(subjects)["titulo"].value_counts().reset_index()
     df_assuntos.columns = ["Assunto", "Total"]
     return df_assuntos
 
 
-def prepare_date_column(df, column):
-    df[column] = pd.to_datetime(df[column], errors="coerce")
-    df[column] = df[column].dt.strftime("%Y")
-    return df
-
 def add_year_column(df, date_column="dataDistribuicao"):
     if date_column in df.columns:
-        df["Ano"] = pd.to_datetime(df[date_column], errors="coerce").dt.year
+        df["Ano"] = year_of(df[date_column])
     return df
 
 
-@st.cache_data
-def extract_data(df, term):
-    data = {}
+# Campos dos processos usados por `extract_data`. Caminhos que passam por
+# listas (partes, julgamentos) valem para cada item; os demais campos são
+# descartados já na leitura quando `load_data` recebe `fields`.
+EXTRACT_DATA_FIELDS = [
+    "numeroProcessoUnico",
+    "uf",
+    "tribunal",
+    "segmento",
+    "grauProcesso",
+    "dataDistribuicao",
+    "classeProcessual.nome",
+    "valorCausa.valor",
+    "assuntosCNJ",
+    "partes.nome",
+    "partes.polo",
+    "partes.cnpj",
+    "partes.advogados.nome",
+    "partes.advogados.oab.numero",
+    "statusPredictus.ramoDireito",
+    "statusPredictus.statusProcesso",
+    "statusPredictus.julgamentos.tipoJulgamento",
+    "statusPredictus.valorExecucao.valor",
+    "statusPredictus.dataArquivamento",
+    "statusPredictus.dataTransitoJulgado",
+]
 
-    # ========================== Preparar Datas ====================================================================
+# Opções de carga do painel; fazem parte do fingerprint do dataset
+DATASET_OPTIONS = {
+    "fields": EXTRACT_DATA_FIELDS,
+    "arrow_nested": ARROW_NESTED,
+    "dedup": DEDUP_POLICY,
+}
 
-    df = prepare_date_column(df, "dataDistribuicao")
-    df = prepare_date_column(df, "statusPredictus.dataArquivamento")
 
-    # ========================== Separar ativo e Passivo ===========================================================
+def load_or_compute_data(dataset, term):
+    # Snapshot gravado por `precompute.py` para este dataset, se houver
+    with stage("snapshot"):
+        data = SNAPSHOTS.get(dataset.fingerprint, term)
+    if data is None:
+        data = compute_data(dataset, term)
+    return data
 
-    df_ativo = df[
-        df["partes"].apply(
-            lambda partes: any(
-                p.get("polo") == "ATIVO" and p.get("cnpj") == term for p in partes
-            )
-        )
-    ]
 
-    df_passivo = df[
-        df["partes"].apply(
-            lambda partes: any(
-                p.get("polo") == "PASSIVO" and p.get("cnpj") == term for p in partes
-            )
+def extract_data(dataset, term):
+    # CNPJ, raiz ou lista viram uma única chave (ver tables.normalize_term)
+    term = normalize_term(term)
+    with stage("extract_data"):
+        data = EXTRACT_CACHE.get_or_compute(
+            (dataset.fingerprint, term), lambda: load_or_compute_data(dataset, term)
         )
-    ]
-
-    # ========================== Arquivados x Distribuídos =========================================================
-
-    data.update(
-        {
-            "dist_arq": extract_dist_vs_arq(df),
-        }
-    )
-
-    # ========================== Indicadores Gerais ================================================================
-    data.update(
-        {
-            "qtd_processos": df.shape[0],
-            "qtd_polo_ativo": df_ativo.shape[0],
-            "qtd_polo_passivo": df_passivo.shape[0],
-            "valor_causa": df["valorCausa.valor"].sum(),
-            "valor_causa_ativo": df_ativo["valorCausa.valor"].sum(),
-            "valor_causa_passivo": df_passivo["valorCausa.valor"].sum(),
-            "valor_execucao": df["statusPredictus.valorExecucao.valor"].sum(),
-            "valor_execucao_ativo": df_ativo[
-                "statusPredictus.valorExecucao.valor"
-            ].sum(),
-            "valor_execucao_passivo": df_passivo[
-                "statusPredictus.valorExecucao.valor"
-            ].sum(),
-        }
-    )
+    # Cópia dos frames para que os gráficos possam ajustá-los sem alterar o cache
+    return {
+        key: value.copy() if isinstance(value, pd.DataFrame) else value
+        for key, value in data.items()
+    }
+
+
+def indicators_from_cube(cube):
+    # Cards: total e a parte em que o termo é autor (ativo) ou réu (passivo)
+    total = cube.totals()
+    ativo = cube.slice({POLE_DIMENSION: ACTIVE_POLES}).totals()
+    passivo = cube.slice({POLE_DIMENSION: PASSIVE_POLES}).totals()
+    return {
+        "qtd_processos": total[COUNT],
+        "qtd_polo_ativo": ativo[COUNT],
+        "qtd_polo_passivo": passivo[COUNT],
+        "valor_causa": total["valor_causa"],
+        "valor_causa_ativo": ativo["valor_causa"],
+        "valor_causa_passivo": passivo["valor_causa"],
+        "valor_execucao": total["valor_execucao"],
+        "valor_execucao_ativo": ativo["valor_execucao"],
+        "valor_execucao_passivo": passivo["valor_execucao"],
+    }
+
+
+def histogram_values(df):
+    # Dias entre a distribuição e o trânsito em julgado / arquivamento
+    # (nulos quando falta alguma das datas) e valores sem informação
+    # contados como zero
+    return {
+        "dias_ate_arquivamento": (
+            df["statusPredictus.dataArquivamento"] - df["dataDistribuicao"]
+        ).dt.days,
+        "dias_ate_transito_julgado": (
+            df["statusPredictus.dataTransitoJulgado"] - df["dataDistribuicao"]
+        ).dt.days,
+        "totalValorCausa": df["valorCausa.valor"].fillna(0),
+        "totalValorExecucao": df["statusPredictus.valorExecucao.valor"].fillna(0),
+    }
+
+
+def compute_data(dataset, term):
+    data = {}
+    # Numa falta de cache, é aqui que os arquivos são lidos
+    with stage("carga"):
+        df = dataset.df
 
-    # ========================== Distribuições =====================================================================
-    data.update(
-        {
-            "distribuicao_ramo_direito": extract_distribution_by_column(
-                df, "statusPredictus.ramoDireito", ["Ramo", "Total"], True,
-            ),
+    # ========================== Tabelas Filhas ====================================================================
 
-            "distribuicao_status_processos": extract_distribution_by_column(
-                df, "statusPredictus.statusProcesso", ["Status", "Total"]
-            ),
+    # Assuntos e partes são achatados uma única vez por conjunto de dados
+    with stage("tabelas"):
+        subjects = dataset.subjects
 
-            "distribuicao_tribunal": extract_distribution_by_column(
-                df, "tribunal", ["Tribunal", "Total"], True,
-            ),
+    # ========================== Cubo de Agregação =================================================================
 
-            "distribuicao_julgamento": extract_distribution_by_column(
-                df["statusPredictus.julgamentos"]
-                .explode()
-                .dropna()
-                .apply(pd.Series),
-                "tipoJulgamento",
-                ["Julgamento", "Total"],
-            ),
+    # Contagens e somas por ano, UF, tribunal, ramo, status, grau, segmento e
+    # polo do termo; indicadores e distribuições dessas dimensões vêm dele
+    with stage("cubo"):
+        cube = dataset.cube(term, CUBES)
 
-            "distribuicao_classes": extract_distribution_by_column(
-                df, "classeProcessual.nome", ["Classe Processual", "Total"], True
-            ),
+    # ========================== Arquivados x Distribuídos =========================================================
 
-            "distribuicao_segmento": extract_distribution_by_column(
-                df, "segmento", ['Segmento', 'Total'], True,
-            ),
+    with stage("dist_arq"):
+        data.update(
+            {
+                "dist_arq": extract_dist_vs_arq(df),
+            }
+        )
 
-            "distribuicao_grau": extract_distribution_by_column(
-                df, "grauProcesso", ["Grau", "Total"]
-            ),
+    # ========================== Indicadores Gerais ================================================================
+    with stage("indicadores"):
+        data.update(indicators_from_cube(cube))
 
-            "distribuicao_assuntos": extract_distribution_by_column(
-                df, "assuntosCNJ", ["Assunto", "Total"]
-            )
+    # ========================== Distribuições =====================================================================
+    with stage("distribuicoes"):
+        data.update(cube_distributions(cube, DISTRIBUICOES_CUBO))
+        # Dimensões fora do cubo, contadas de uma vez direto do frame
+        julgamentos = flatten_records(
+            df["statusPredictus.julgamentos"], ["tipoJulgamento"]
+        )
+        columns = {
+            "distribuicao_julgamento": julgamentos["tipoJulgamento"],
+            "distribuicao_classes": "classeProcessual.nome",
+            "distribuicao_assuntos": "assuntosCNJ",
         }
-    )
+        data.update(
+            count_distributions(
+                df,
+                {
+                    key: (columns[key], *spec)
+                    for key, spec in DISTRIBUICOES_FRAME.items()
+                },
+            )
+        )
 
     # ========================== Rankings ==========================================================================
 
-    data.update(
-        {
-            "assuntos_principais": extract_top_principal_subjects(df, True),
-            "assuntos_principais_ano": extract_principal_subjects_per_year(df),
-            "assuntos_principais_ano_um": extract_principal_subjects_per_year(df, 1),
-            "top_10_partes": extract_top_parties(df, 10),
-        },
-    )
-
-    # ========================== Dados para Mapa ===================================================================
-
-    data.update(
-        {
-            "df_estado": extract_distribution_by_column(
-                df, "uf", ["UF", "Total"],
-
-            ),
-        }
-    )
-
-    # Definir a ordem das faixas de meses
-
-
-    # ========================== Dias até ===================================================================
-    df['statusPredictus.dataTransitoJulgado'] = pd.to_datetime(df['statusPredictus.dataTransitoJulgado'],
-                                                               errors='coerce')
-    df['dataDistribuicao'] = pd.to_datetime(df['dataDistribuicao'], errors='coerce')
-
-    # Processamento para Transito Julgado
-    df_transito = df[~df['statusPredictus.dataTransitoJulgado'].isna()].copy()
-    df_transito['diasAteArquivamento'] = (
-            df_transito['statusPredictus.dataTransitoJulgado'] - df_transito['dataDistribuicao']
-    ).dt.days
-
-    bins = [0, 90, 180, 270, 360, 450, 540, 630, 720, float('inf')]
-    labels = FAIXAS_MESES_ORDEM
-
-    df_transito['faixaMeses'] = pd.cut(
-        df_transito['diasAteArquivamento'],
-        bins=bins,
-        labels=labels,
-        right=True,
-        include_lowest=True
-    )
-
-    # Garantir que 'faixaMeses' seja categórica com a ordem correta
-    df_transito['faixaMeses'] = pd.Categorical(
-        df_transito['faixaMeses'],
-        categories=FAIXAS_MESES_ORDEM,
-        ordered=True
-    )
+    with stage("rankings"):
+        data.update(
+            {
+                "assuntos_principais": extract_top_principal_subjects(subjects, True),
+                "assuntos_principais_ano": extract_principal_subjects_per_year(
+                    subjects
+                ),
+                "assuntos_principais_ano_um": extract_principal_subjects_per_year(
+                    subjects, 1
+                ),
+                "top_10_partes": (
+                    extract_top_parties(dataset.parties, 10)
+                    if TOP_NAMES_EXACT
+                    else extract_top_parties_approximate(df["partes"], 10)
+                ),
+            },
+        )
 
-    # Calcular a contagem de cada faixa
-    contagem_transito = df_transito['faixaMeses'].value_counts().sort_index()
-    novo_df_meses_transito = contagem_transito.reset_index()
-    novo_df_meses_transito.columns = ['faixaMeses', 'contagem']
-
-    # Processamento para Arquivados
-    df['statusPredictus.dataArquivamento'] = pd.to_datetime(df['statusPredictus.dataArquivamento'], errors='coerce')
-    df_arquivado = df[~df['statusPredictus.dataArquivamento'].isna()].copy()
-    df_arquivado['diasAteArquivamento'] = (
-            df_arquivado['statusPredictus.dataArquivamento'] - df_arquivado['dataDistribuicao']
-    ).dt.days
-
-    df_arquivado['faixaMeses'] = pd.cut(
-        df_arquivado['diasAteArquivamento'],
-        bins=bins,
-        labels=labels,
-        right=True,
-        include_lowest=True
-    )
+    # ========================== Dias até e Faixas de Valor =================================================
+    with stage("faixas"):
+        values = histogram_values(df)
+        data.update(
+            count_histograms(
+                {key: (values[key], *spec) for key, spec in HISTOGRAMAS.items()}
+            )
+        )
 
-    # Garantir que 'faixaMeses' seja categórica com a ordem correta
-    df_arquivado['faixaMeses'] = pd.Categorical(
-        df_arquivado['faixaMeses'],
-        categories=FAIXAS_MESES_ORDEM,
-        ordered=True
-    )
+    return data
 
-    # Calcular a contagem de cada faixa
-    contagem_arquivado = df_arquivado['faixaMeses'].value_counts().sort_index()
-    novo_df_meses_arquivado = contagem_arquivado.reset_index()
-    novo_df_meses_arquivado.columns = ['faixaMeses', 'contagem']
 
-    # Atualizar o dicionário 'data' com os novos DataFrames
-    data.update(
-        {
-            "dias_ate_arquivamento": novo_df_meses_arquivado,
-            "dias_ate_transito_julgado": novo_df_meses_transito
-        }
-    )
+# Versão do cálculo de `compute_data`: o código das etapas e dos módulos que
+# elas usam e as constantes que mudam o resultado. Um snapshot gravado por
+# outra versão não é servido, sem depender de alguém incrementar uma constante.
+COMPUTE_VERSION = code_version(
+    compute_data,
+    extract_dist_vs_arq,
+    dist_vs_arq_frame,
+    indicators_from_cube,
+    histogram_values,
+    extract_top_principal_subjects,
+    rank_principal_subjects,
+    extract_principal_subjects_per_year,
+    principal_subjects_per_year,
+    extract_top_parties,
+    extract_top_parties_approximate,
+    _approximate_ranking,
+    rank_names,
+    *(
+        importlib.import_module(module)
+        for module in (
+            "cube",
+            "dataset",
+            "distributions",
+            "entities",
+            "heavy_hitters",
+            "names",
+            "schema",
+            "tables",
+        )
+    ),
+    DISTRIBUICOES_CUBO,
+    DISTRIBUICOES_FRAME,
+    HISTOGRAMAS,
+    TOP_NAMES_EXACT,
+    MERGE_NAME_VARIANTS,
+    TOPK_CAPACITY,
+)
 
-    # Categorizar 'valorCausa.valor'
-    df['valorCausa.valor'] = pd.to_numeric(df['valorCausa.valor'], errors='coerce').fillna(0)
-    df['faixaValor'] = pd.cut(
-        df['valorCausa.valor'],
-        bins=[0, 5000, 20000, 50000, 100000, float('inf')],
-        labels=FAIXAS_VALOR_ORDEM,
-        right=True,
-        include_lowest=True
-    )
-    df['faixaValor'] = pd.Categorical(
-        df['faixaValor'],
-        categories=FAIXAS_VALOR_ORDEM,
-        ordered=True
-    )
-    contagem_valor = df['faixaValor'].value_counts().sort_index()
-    novo_df_valor_causa = contagem_valor.reset_index()
-    novo_df_valor_causa.columns = ['faixaValor', 'contagem']
-
-    # Categorizar 'statusPredictus.valorExecucao.valor'
-    df['statusPredictus.valorExecucao.valor'] = pd.to_numeric(df['statusPredictus.valorExecucao.valor'],
-                                                              errors='coerce').fillna(0)
-    df['faixaValorExecucao'] = pd.cut(
-        df['statusPredictus.valorExecucao.valor'],
-        bins=[0, 5000, 20000, 50000, 100000, float('inf')],
-        labels=FAIXAS_VALOR_ORDEM,
-        right=True,
-        include_lowest=True
-    )
-    df['faixaValorExecucao'] = pd.Categorical(
-        df['faixaValorExecucao'],
-        categories=FAIXAS_VALOR_ORDEM,
-        ordered=True
-    )
-    contagem_execucao = df['faixaValorExecucao'].value_counts().sort_index()
-    novo_df_valor_execucao = contagem_execucao.reset_index()
-    novo_df_valor_execucao.columns = ['faixaValorExecucao', 'contagem']
-
-    data.update(
-        {
-            "totalValorCausa": novo_df_valor_causa,
-            "totalValorExecucao": novo_df_valor_execucao
-        }
-    )
+# Resultados pré-calculados por `precompute.py`
+SNAPSHOTS = SnapshotStore(version=COMPUTE_VERSION)
 
-    return data
+# Cubos de agregação por (dataset, termo), reaproveitados entre execuções
+CUBES = CubeStore()
 
 
+@profiled
 def create_horizontal_bar_chart(data, title, x_col, y_col):
     with st.container(border=1):
         st.subheader(title)
@@ -560,6 +731,7 @@ def create_horizontal_bar_chart(data, title, x_col, y_col):
         st.plotly_chart(chart, use_container_width=True)
 
 
+@profiled
 def create_card(title, total_value, ativo_value, passivo_value, format_func=None):
     formatted_total = format_func(total_value) if format_func else f"{total_value:n}"
     with st.container(border=1):
@@ -580,7 +752,8 @@ def create_card(title, total_value, ativo_value, passivo_value, format_func=None
         st.progress(passivo_value / total_value if total_value else 0)
 
 
-def create_donut_chart(data, title, names_col, values_col):
+@profiled
+def create_donut_chart(data, title, names_col, values_col, key=None):
     with st.container(border=1):
         st.subheader(title)
 
@@ -600,9 +773,10 @@ def create_donut_chart(data, title, names_col, values_col):
             hole=0.3,
         )
         # chart.update_traces(textinfo="label+percent+value")
-        st.plotly_chart(chart, use_container_width=True)
+        st.plotly_chart(chart, use_container_width=True, **_selectable(key))
 
 
+@profiled
 def create_vertical_bar_chart_custom_month(data, title, x_col, y_col):
     with st.container(border=1):
         st.subheader(title)
@@ -614,21 +788,23 @@ def create_vertical_bar_chart_custom_month(data, title, x_col, y_col):
             color=x_col,  # Associa a cor às categorias do eixo X
             color_discrete_sequence=FAIXAS_MESES_COLORS,
             labels={x_col: "", y_col: ""},
-            height=385
+            height=385,
         )
-        fig.update_traces(texttemplate='%{text}', textposition='outside')
+        fig.update_traces(texttemplate="%{text}", textposition="outside")
         fig.update_layout(
             xaxis=dict(
                 title=None,
-                categoryorder='array',          # Define a ordem personalizada
-                categoryarray=FAIXAS_MESES_ORDEM # Lista das categorias na ordem desejada
+                categoryorder="array",  # Define a ordem personalizada
+                categoryarray=FAIXAS_MESES_ORDEM,  # Lista das categorias na ordem desejada
             ),
             yaxis=dict(title=y_col),
             showlegend=False,
-            margin=dict(l=20, r=20, t=40, b=20)
+            margin=dict(l=20, r=20, t=40, b=20),
         )
         st.plotly_chart(fig, use_container_width=True)
 
+
+@profiled
 def create_vertical_bar_chart_custom(data, title, x_col, y_col, colors):
     """
     Cria um gráfico de barras verticais com a paleta de cores personalizada e ordenação específica.
@@ -650,25 +826,25 @@ def create_vertical_bar_chart_custom(data, title, x_col, y_col, colors):
             color=x_col,  # Associa a cor às categorias do eixo X
             color_discrete_sequence=colors,
             labels={x_col: "", y_col: ""},
-            height=385
+            height=385,
         )
-        fig.update_traces(texttemplate='%{text}', textposition='outside')
+        fig.update_traces(texttemplate="%{text}", textposition="outside")
         fig.update_layout(
             xaxis=dict(
                 title=None,
-                categoryorder='array',
-                categoryarray=FAIXAS_VALOR_ORDEM  # Ordem definida
+                categoryorder="array",
+                categoryarray=FAIXAS_VALOR_ORDEM,  # Ordem definida
             ),
             yaxis=dict(title=y_col),
             showlegend=False,
-            margin=dict(l=20, r=20, t=40, b=20)
+            margin=dict(l=20, r=20, t=40, b=20),
         )
         st.plotly_chart(fig, use_container_width=True)
 
 
-
+@profiled
 def create_choropleth_map(
-    data, geojson, locations_col, featureidkey, color_col, hover_col, title
+    data, geojson, locations_col, featureidkey, color_col, hover_col, title, key=None
 ):
     with st.container(border=1):
         st.subheader(title)
@@ -688,12 +864,16 @@ def create_choropleth_map(
             height=385,
         )
         mapa.update_geos(
-            fitbounds="locations", visible=True, showcoastlines=False, showcountries=False
+            fitbounds="locations",
+            visible=True,
+            showcoastlines=False,
+            showcountries=False,
         )
         mapa.update_traces(marker_line_width=0.5)
-        st.plotly_chart(mapa, use_container_width=True)
+        st.plotly_chart(mapa, use_container_width=True, **_selectable(key))
 
 
+@profiled
 def create_ranking_chart(data, title, x_col, y_col):
     fig = px.bar(
         data,
@@ -714,6 +894,7 @@ def create_ranking_chart(data, title, x_col, y_col):
     st.plotly_chart(fig, use_container_width=True)
 
 
+@profiled
 def create_dataframe(subheader, df, height):
     with st.container(border=1):
         st.subheader(subheader)
@@ -726,20 +907,28 @@ def create_dataframe(subheader, df, height):
             }
         )
 
-        st.dataframe(styled_df, use_container_width=True, hide_index=True, height=height)
+        st.dataframe(
+            styled_df, use_container_width=True, hide_index=True, height=height
+        )
 
 
+@profiled
 def create_table(subheader, df):
     st.subheader(subheader)
     st.table(df)
 
 
-def create_vertical_bar_chart(df):
+@profiled
+def create_vertical_bar_chart(df, key=None):
     with st.container(border=1):
-        st.subheader(f"Processos Distribuídos x Processos Arquivados - Por Ano (com Valor de Causa)")
+        st.subheader(
+            "Processos Distribuídos x Processos Arquivados - Por Ano (com Valor de Causa)"
+        )
 
         # Ordenar os anos e garantir que o eixo X seja categórico
-        df["Ano"] = pd.Categorical(df["Ano"], categories=sorted(df["Ano"].unique()), ordered=True)
+        df["Ano"] = pd.Categorical(
+            df["Ano"], categories=sorted(df["Ano"].unique()), ordered=True
+        )
 
         # Gráfico de barras para processos distribuídos e arquivados
         fig = px.bar(
@@ -754,7 +943,7 @@ def create_vertical_bar_chart(df):
         )
 
         # Obter o máximo do total de processos para dimensionar os valores de causa
-        max_processos = max(df["Distribuídos"].max(), df["Arquivados"].max())
+        max(df["Distribuídos"].max(), df["Arquivados"].max())
 
         # Escalar os valores de causa em relação ao máximo de processos
         # df["Valor de Causa Distribuídos Scaled"] = (df["Valor de Causa Distribuídos"] / df["Valor de Causa Distribuídos"].max()) * max_processos
@@ -798,16 +987,20 @@ def create_vertical_bar_chart(df):
         fig.update_xaxes(categoryorder="category ascending")
         fig.update_layout(
             yaxis=dict(title="Total de Processos"),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+            legend=dict(
+                orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1
+            ),
         )
 
-        st.plotly_chart(fig, use_container_width=True)
-
+        st.plotly_chart(fig, use_container_width=True, **_selectable(key))
 
 
+@profiled
 def create_vertical_bar_chart_assuntos(df, title):
     # Garantir que "Ano" seja tratado como categórico para manter a ordem correta
-    df["Ano"] = df["Ano"].astype(str)  # Converter para string para garantir que não haja lacunas
+    df["Ano"] = df["Ano"].astype(
+        str
+    )  # Converter para string para garantir que não haja lacunas
 
     with st.container(border=1):
         st.subheader(title)
@@ -839,6 +1032,7 @@ def create_vertical_bar_chart_assuntos(df, title):
         st.plotly_chart(fig, use_container_width=True)
 
 
+@profiled
 def create_stacked_bar_chart_assuntos(df):
     # Verificar e corrigir a coluna "Ano"
     df["Ano"] = df["Ano"].astype(float).astype(int).astype(str)
@@ -873,22 +1067,26 @@ def create_stacked_bar_chart_assuntos(df):
         st.plotly_chart(fig, use_container_width=True)
 
 
-
-
-
+@profiled
 def create_principal_subject_chart(df_assunto, key_prefix="assuntos"):
-    anos_disponiveis = sorted(df_assunto["Ano"].unique(), reverse=True) if "Ano" in df_assunto.columns else []
+    anos_disponiveis = (
+        sorted(df_assunto["Ano"].unique(), reverse=True)
+        if "Ano" in df_assunto.columns
+        else []
+    )
 
     ano_selecionado = anos_disponiveis[0] if anos_disponiveis else None
 
-    st.subheader(f"Principais Assuntos" + (f" em {ano_selecionado}" if ano_selecionado else ""))
+    st.subheader(
+        "Principais Assuntos" + (f" em {ano_selecionado}" if ano_selecionado else "")
+    )
     with st.container(border=1):
         if anos_disponiveis:
             ano_selecionado = st.selectbox(
                 "Selecione o ano",
                 anos_disponiveis,
                 index=0,
-                key=f"ano_selecionado_{key_prefix}"
+                key=f"ano_selecionado_{key_prefix}",
             )
             df_filtered = df_assunto[df_assunto["Ano"] == ano_selecionado]
         else:
@@ -901,13 +1099,123 @@ def create_principal_subject_chart(df_assunto, key_prefix="assuntos"):
             text="Total",
             labels={"Assunto": "Assunto", "Total": "Total"},
             color_discrete_sequence=["#45A874"],
-            title=f"Principais Assuntos" + (f" em {ano_selecionado}" if ano_selecionado else "")
+            title="Principais Assuntos"
+            + (f" em {ano_selecionado}" if ano_selecionado else ""),
         )
         fig.update_xaxes(tickangle=45)
         st.plotly_chart(fig, use_container_width=True)
 
 
-def render_dashboard(df, term):
+def create_profile_panel(records):
+    # Painel de depuração com as etapas medidas no último render
+    with st.sidebar:
+        st.subheader("Desempenho")
+        if not records:
+            st.caption("Nenhuma etapa medida.")
+            return
+        df_profile = pd.DataFrame(records)
+        df_profile["etapa"] = [
+            "\u2003" * depth + name
+            for depth, name in zip(df_profile["depth"], df_profile["stage"])
+        ]
+        df_profile["memória (MB)"] = df_profile["peak_bytes"] / 1024**2
+        st.dataframe(
+            df_profile[["etapa", "wall_s", "cpu_s", "memória (MB)"]].rename(
+                columns={"wall_s": "tempo (s)", "cpu_s": "CPU (s)"}
+            ),
+            hide_index=True,
+            use_container_width=True,
+        )
+
+
+def filter_options(cube):
+    # Valores com processos de cada dimensão filtrável, lidos do cubo: montar
+    # a barra lateral não carrega o frame nem os bitmaps
+    options = {}
+    for dimension in FILTROS:
+        if dimension in cube.labels:
+            counts = cube.series(dimension)
+            options[dimension] = [label for label, count in counts.items() if count > 0]
+    return options
+
+
+def _match(values, labels):
+    # Valores cujo texto é um dos rótulos clicados (ex.: o ano "2021")
+    by_text = {str(value): value for value in values}
+    return [by_text[str(label)] for label in labels if str(label) in by_text]
+
+
+def apply_chart_selections(options):
+    # Leva os cliques nos gráficos para os filtros da barra lateral. Só uma
+    # seleção nova conta, para que limpar o filtro não o traga de volta.
+    for key, (dimension, field) in GRAFICOS_FILTRO.items():
+        event = st.session_state.get(key)
+        labels = (
+            tuple(point.get(field) for point in event["selection"]["points"])
+            if event
+            else ()
+        )
+        if labels == st.session_state.get(f"{key}_anterior", ()):
+            continue
+        st.session_state[f"{key}_anterior"] = labels
+        values = _match(options.get(dimension, []), labels)
+        if values:
+            st.session_state[f"filtro_{dimension}"] = values
+
+
+def clear_filters():
+    for dimension in FILTROS:
+        st.session_state[f"filtro_{dimension}"] = []
+    st.session_state["filtro_periodo"] = next(iter(PERIODOS))
+
+
+def create_period_filter(dataset):
+    # Período como [início, fim), resolvido no índice ordenado de datas; o
+    # índice só é montado quando o período personalizado é escolhido
+    escolha = st.selectbox(
+        "Período de distribuição", list(PERIODOS), key="filtro_periodo"
+    )
+    if escolha == PERIODO_PERSONALIZADO:
+        first, last = dataset.time_index.bounds()
+        if first is None:
+            return None
+        selected = st.date_input(
+            "Distribuídos entre",
+            value=(first.date(), last.date()),
+            min_value=first.date(),
+            max_value=last.date(),
+            format="DD/MM/YYYY",
+            key="filtro_datas",
+        )
+        if len(selected) < 2:
+            return None
+        return pd.Timestamp(selected[0]), pd.Timestamp(selected[1]) + pd.Timedelta(
+            days=1
+        )
+    meses = PERIODOS[escolha]
+    if meses is None:
+        return None
+    fim = pd.Timestamp.today().normalize() + pd.Timedelta(days=1)
+    return fim - pd.DateOffset(months=meses), fim
+
+
+def create_filter_panel(dataset, options):
+    with st.sidebar:
+        st.subheader("Filtros")
+        period = create_period_filter(dataset)
+        filters = {
+            dimension: st.multiselect(
+                label, options[dimension], key=f"filtro_{dimension}"
+            )
+            for dimension, label in FILTROS.items()
+            if dimension in options
+        }
+        st.button("Limpar filtros", on_click=clear_filters)
+    return filters, period
+
+
+def render_dashboard(dataset, term):
+    term = normalize_term(term)
 
     st.set_page_config(
         layout="wide",
@@ -915,139 +1223,165 @@ def render_dashboard(df, term):
         page_icon="📊",
     )
 
-    data = extract_data(df, term)
+    with PROFILER.run(term=term, dataset=dataset.fingerprint):
+        # Opções e total vêm do cubo (em disco depois da primeira vez); os
+        # bitmaps e o índice de datas só são montados quando um filtro é
+        # usado, então um painel em cache ou pré-calculado não lê o frame
+        with stage("filtros"):
+            cube = dataset.cube(term, CUBES)
+            options = filter_options(cube)
+            apply_chart_selections(options)
+            filters, period = create_filter_panel(dataset, options)
+            total = cube.totals()[COUNT]
+            selected = dataset.filtered(filters, period)
+            shown = total if selected is dataset else len(selected)
+            dataset = selected
+        with st.sidebar:
+            st.caption(f"{shown:n} de {total:n} processos")
+        data = extract_data(dataset, term)
 
-    st.markdown(
-        "<h1 style='text-align: center;'>Visão Geral</h1>",
-        unsafe_allow_html=True,
-    )
-    st.markdown("---")
+        st.markdown(
+            "<h1 style='text-align: center;'>Visão Geral</h1>",
+            unsafe_allow_html=True,
+        )
+        st.markdown("---")
 
-    col1, col2, col3 = st.columns(3)
+        col1, col2, col3 = st.columns(3)
 
-    with col1:
-        create_card(
-            "Processos encontrados",
-            data["qtd_processos"],
-            data["qtd_polo_ativo"],
-            data["qtd_polo_passivo"],
-        )
+        with col1:
+            create_card(
+                "Processos encontrados",
+                data["qtd_processos"],
+                data["qtd_polo_ativo"],
+                data["qtd_polo_passivo"],
+            )
 
-    with col2:
-        create_card(
-            "Valor das causas",
-            data["valor_causa"],
-            data["valor_causa_ativo"],
-            data["valor_causa_passivo"],
-            format_func=format_currency_brl,
-        )
+        with col2:
+            create_card(
+                "Valor das causas",
+                data["valor_causa"],
+                data["valor_causa_ativo"],
+                data["valor_causa_passivo"],
+                format_func=format_currency_brl,
+            )
 
-    with col3:
-        create_card(
-            "Valor das execuções",
-            data["valor_execucao"],
-            data["valor_execucao_ativo"],
-            data["valor_execucao_passivo"],
-            format_func=format_currency_brl,
-        )
+        with col3:
+            create_card(
+                "Valor das execuções",
+                data["valor_execucao"],
+                data["valor_execucao_ativo"],
+                data["valor_execucao_passivo"],
+                format_func=format_currency_brl,
+            )
 
-    with col1:
-        create_horizontal_bar_chart(
-            data["distribuicao_status_processos"],
-            "Distribuição por Status do Processo",
-            "Total",
-            "Status",
-        )
+        with col1:
+            create_horizontal_bar_chart(
+                data["distribuicao_status_processos"],
+                "Distribuição por Status do Processo",
+                "Total",
+                "Status",
+            )
 
-    with col2:
-        create_donut_chart(
-            data["distribuicao_ramo_direito"],
-            "Distribuição por Ramo do Direito",
-            "Ramo",
-            "Total",
-        )
+        with col2:
+            create_donut_chart(
+                data["distribuicao_ramo_direito"],
+                "Distribuição por Ramo do Direito",
+                "Ramo",
+                "Total",
+                key="grafico_ramo",
+            )
 
-    with col3:
-        create_donut_chart(
-            data["distribuicao_tribunal"],
-            "Distribuição por Tribunal",
-            "Tribunal",
-            "Total",
-        )
+        with col3:
+            create_donut_chart(
+                data["distribuicao_tribunal"],
+                "Distribuição por Tribunal",
+                "Tribunal",
+                "Total",
+                key="grafico_tribunal",
+            )
 
-    with col1:
-        create_horizontal_bar_chart(
-            data["distribuicao_julgamento"],
-            "Distribuição por Tipo de Julgamento",
-            "Total",
-            "Julgamento",
-        )
+        with col1:
+            create_horizontal_bar_chart(
+                data["distribuicao_julgamento"],
+                "Distribuição por Tipo de Julgamento",
+                "Total",
+                "Julgamento",
+            )
 
-    with col2:
-        create_donut_chart(
-            data["distribuicao_segmento"],
-            "Distribuição por Segmento",
-            "Segmento",
-            "Total"
-        )
+        with col2:
+            create_donut_chart(
+                data["distribuicao_segmento"],
+                "Distribuição por Segmento",
+                "Segmento",
+                "Total",
+                key="grafico_segmento",
+            )
 
-    with col3:
-        create_donut_chart(
-            data["distribuicao_grau"],
-            "Distribuição por Grau",
-            "Grau",
-            "Total",
-        )
+        with col3:
+            create_donut_chart(
+                data["distribuicao_grau"],
+                "Distribuição por Grau",
+                "Grau",
+                "Total",
+                key="grafico_grau",
+            )
 
-    col1, col2 = st.columns(2)
-
-    with col1:
-        create_dataframe("Assuntos Principais", data["assuntos_principais"], 245)
-        create_choropleth_map(
-            data["df_estado"],
-            load_geojson('resource/brazil_states.geojson'),
-            "UF",
-            "properties.sigla",
-            "Total",
-            "UF",
-            "Distribuição de Processo por Estado",
-        )
-        create_dataframe("Principais 10 Partes Envolvidas", data["top_10_partes"], 380)
-        create_vertical_bar_chart_custom_month(
-            data['dias_ate_arquivamento'],
-            "Distribuição de Processos por Faixa de Meses até Arquivamento",
-            "faixaMeses",
-            "contagem"
-        )
+        col1, col2 = st.columns(2)
+
+        with col1:
+            create_dataframe("Assuntos Principais", data["assuntos_principais"], 245)
+            create_choropleth_map(
+                data["df_estado"],
+                load_geojson(),
+                "UF",
+                "properties.sigla",
+                "Total",
+                "UF",
+                "Distribuição de Processo por Estado",
+                key="grafico_estado",
+            )
+            create_dataframe(
+                "Principais 10 Partes Envolvidas", data["top_10_partes"], 380
+            )
+            create_vertical_bar_chart_custom_month(
+                data["dias_ate_arquivamento"],
+                "Distribuição de Processos por Faixa de Meses até Arquivamento",
+                "faixaMeses",
+                "contagem",
+            )
 
-        create_vertical_bar_chart_custom(
-            data["totalValorCausa"],
-            "Distribuição de Processos por Faixa de Valor da Causa",
-            "faixaValor",
-            "contagem",
-            FAIXAS_VALOR_COLORS
-        )
+            create_vertical_bar_chart_custom(
+                data["totalValorCausa"],
+                "Distribuição de Processos por Faixa de Valor da Causa",
+                "faixaValor",
+                "contagem",
+                FAIXAS_VALOR_COLORS,
+            )
 
-    with col2:
-        create_dataframe("Distribuição Por Classe Processual", data['distribuicao_classes'], 245)
-        create_vertical_bar_chart(data['dist_arq'])
-        # create_vertical_bar_chart_assuntos(data["assuntos_principais_ano"], "Principais Assuntos por Ano")
-        create_stacked_bar_chart_assuntos(data["assuntos_principais_ano"])
-        create_vertical_bar_chart_custom_month(
-            data['dias_ate_transito_julgado'],
-            "Distribuição de Processos por Faixa de Meses até Transito em Julgado",
-            "faixaMeses",
-            "contagem"
-        )
+        with col2:
+            create_dataframe(
+                "Distribuição Por Classe Processual", data["distribuicao_classes"], 245
+            )
+            create_vertical_bar_chart(data["dist_arq"], key="grafico_ano")
+            # create_vertical_bar_chart_assuntos(data["assuntos_principais_ano"], "Principais Assuntos por Ano")
+            create_stacked_bar_chart_assuntos(data["assuntos_principais_ano"])
+            create_vertical_bar_chart_custom_month(
+                data["dias_ate_transito_julgado"],
+                "Distribuição de Processos por Faixa de Meses até Transito em Julgado",
+                "faixaMeses",
+                "contagem",
+            )
 
-        create_vertical_bar_chart_custom(
-            data["totalValorExecucao"],
-            "Distribuição de Execuções por Faixa de Valor",
-            "faixaValorExecucao",
-            "contagem",
-            FAIXAS_VALOR_COLORS
-        )
+            create_vertical_bar_chart_custom(
+                data["totalValorExecucao"],
+                "Distribuição de Execuções por Faixa de Valor",
+                "faixaValorExecucao",
+                "contagem",
+                FAIXAS_VALOR_COLORS,
+            )
 
+    if PROFILER.enabled:
+        create_profile_panel(PROFILER.records)
 
 
 def main():
@@ -1057,11 +1391,15 @@ def main():
         "resource/dados_empresa3.json",
     ]
 
-    df = load_data(arquivos_json)
+    # `?profile=1` na URL liga a instrumentação (ver profiling.PROFILE_ENV)
+    if st.query_params.get("profile") == "1":
+        PROFILER.enable()
+
+    dataset = session_dataset(arquivos_json, **DATASET_OPTIONS)
 
     term = "00000000000191"
 
-    render_dashboard(df, term)
+    render_dashboard(dataset, term)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,148 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+from versions import code_version
+
+NAMES_MEMO_PATH = ".cache/names.json"
+NAMES_MEMO_SIZE = 200_000
+
+_SA_PATTERN = re.compile(r"\bS[./\s]?A\b")
+_PUNCTUATION_PATTERN = re.compile(r"[./-]")
+_SUFFIX_PATTERN = re.compile(r"\b(SA|LTDA|LIMITADA|ME|EPP|EIRELI|INC|LLC?)\b")
+_SPACES_PATTERN = re.compile(r"\s+")
+
+
+def normalize_name(name):
+    if isinstance(name, str):
+        name = unidecode(name.strip().upper())
+        name = _SA_PATTERN.sub("SA", name)
+        name = _PUNCTUATION_PATTERN.sub(" ", name)
+        name = _SUFFIX_PATTERN.sub("", name)
+        name = _SPACES_PATTERN.sub(" ", name)
+        name = name.strip()
+    return name
+
+
+# Versão das regras de `normalize_name`, gravada no memo: um memo de outras
+# regras é descartado na leitura
+NAMES_MEMO_VERSION = code_version(
+    normalize_name, _SA_PATTERN, _PUNCTUATION_PATTERN, _SUFFIX_PATTERN, _SPACES_PATTERN
+)
+
+
+class NameNormalizer:
+    """Normaliza colunas inteiras de nomes com ``normalize_name``.
+
+    Os nomes se repetem muito entre processos, então cada valor distinto é
+    normalizado uma única vez e o resultado volta para a coluna como
+    categórico. Os nomes já vistos ficam em um memo limitado a
+    ``max_entries`` (descartando os menos usados), gravado em ``memo_path``
+    para ser reaproveitado entre execuções.
+
+    O memo é compartilhado pelas sessões do Streamlit (threads do mesmo
+    processo), então toda leitura e escrita dele passa por um lock.
+    """
+
+    def __init__(self, memo_path=NAMES_MEMO_PATH, max_entries=NAMES_MEMO_SIZE):
+        self.memo_path = memo_path
+        self.max_entries = max_entries
+        self._memo = None
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    @property
+    def memo(self):
+        with self._lock:
+            if self._memo is None:
+                self._memo = OrderedDict()
+                if self.memo_path and os.path.exists(self.memo_path):
+                    try:
+                        with open(self.memo_path, "r") as f:
+                            stored = json.load(f)
+                        if stored.get("version") == NAMES_MEMO_VERSION:
+                            self._memo.update(stored["names"])
+                    except (OSError, ValueError, AttributeError, KeyError, TypeError):
+                        pass  # memo corrompido ou de outro formato: recomeça vazio
+            return self._memo
+
+    def _normalize_unique(self, name):
+        if not isinstance(name, str):
+            return normalize_name(name)
+        with self._lock:
+            memo = self.memo
+            normalized = memo.get(name)
+            if normalized is None:
+                normalized = memo[name] = normalize_name(name)
+                self._dirty = True
+            else:
+                memo.move_to_end(name)
+            return normalized
+
+    def normalize(self, names):
+        """Devolve ``names`` normalizada como uma série categórica, com o
+        mesmo índice e nome da série original."""
+        codes, uniques = pd.factorize(names)
+        with self._lock:
+            normalized = [self._normalize_unique(name) for name in uniques]
+            self._trim()
+
+        # Nomes diferentes podem normalizar para o mesmo valor
+        category_codes, categories = pd.factorize(pd.Index(normalized, dtype=object))
+        codes = (
+            np.where(codes >= 0, category_codes[codes], -1)
+            if len(category_codes)
+            else codes
+        )
+        categorical = pd.Categorical.from_codes(codes, categories=categories)
+        index = names.index if isinstance(names, pd.Series) else None
+        name = names.name if isinstance(names, pd.Series) else None
+        return pd.Series(categorical, index=index, name=name)
+
+    def normalize_stream(self, names):
+        """Normaliza nomes um a um, para fluxos que não cabem em uma série."""
+        for name in names:
+            yield self._normalize_unique(name)
+        self._trim()
+
+    def _trim(self):
+        with self._lock:
+            memo = self.memo
+            while len(memo) > self.max_entries:
+                memo.popitem(last=False)
+
+    def save(self):
+        with self._lock:
+            if not self._dirty or not self.memo_path:
+                return
+            # Cópia feita com o lock: a gravação não vê o memo mudando
+            payload = {"version": NAMES_MEMO_VERSION, "names": dict(self.memo)}
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.memo_path) or ".", exist_ok=True)
+        tmp_path = f"{self.memo_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, self.memo_path)
+
+
+NAME_NORMALIZER = NameNormalizer()
+
+
+def normalize_names(names, normalizer=NAME_NORMALIZER):
+    normalized = normalizer.normalize(names)
+    normalizer.save()
+    return normalized
+
+
+def count_names(normalized):
+    """``value_counts`` de uma série de nomes normalizados, com os nomes
+    como valores comuns (não categóricos) no índice."""
+    counts = normalized.value_counts()
+    counts.index = counts.index.astype(object)
+    return counts
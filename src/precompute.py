@@ -0,0 +1,157 @@
+"""Pré-calcula, fora do Streamlit, os dados do painel de cada CNPJ.
+
+    python src/precompute.py --files resource/dados_empresa*.json --terms 00000000000191
+    python src/precompute.py --files resource/dados_empresa*.json --terms 00000000 11222333000181,44555666000199
+    python src/precompute.py --manifest jobs.json --workers 8
+    python src/precompute.py --prune
+
+Cada termo é um CNPJ, uma raiz de CNPJ (8 dígitos, todas as filiais) ou
+uma lista deles separada por vírgulas (ou, no manifesto, uma lista JSON).
+O manifesto é uma lista JSON de ``{"files": [...], "terms": [...]}``. Os
+resultados vão para o ``SnapshotStore`` que o painel consulta antes de
+calcular ao vivo.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dataset import dataset_fingerprint
+from main import (
+    COMPUTE_VERSION,
+    CUBES,
+    DATASET_OPTIONS,
+    attach_dataset,
+    compute_data,
+    load_dataset,
+    prepare_dataset,
+)
+from snapshots import SNAPSHOT_DIR, SnapshotStore
+from tables import normalize_term
+
+PRECOMPUTE_WORKERS = os.cpu_count() or 1
+
+
+def precompute_terms(file_paths, terms, snapshot_dir=SNAPSHOT_DIR):
+    """Calcula e grava o snapshot de cada termo sobre um mesmo conjunto de
+    arquivos, carregado uma única vez. Devolve (termo, segundos, erro)."""
+    store = SnapshotStore(snapshot_dir, COMPUTE_VERSION)
+    # Mapeia o arquivo compartilhado em vez de carregar uma cópia própria
+    with attach_dataset(file_paths, **DATASET_OPTIONS) as handle:
+        dataset = handle.dataset
+        results = []
+        for term in terms:
+            start = time.perf_counter()
+            try:
+                data = compute_data(dataset, term)
+                store.put(
+                    dataset.fingerprint, term, data, dataset.sources, dataset.options
+                )
+                results.append((term, time.perf_counter() - start, None))
+            except Exception as error:
+                results.append((term, time.perf_counter() - start, repr(error)))
+    return results
+
+
+def _split(items, parts):
+    return [items[index::parts] for index in range(parts) if items[index::parts]]
+
+
+def plan_jobs(jobs, store, workers, force=False):
+    """Divide os termos pendentes de cada conjunto de arquivos em até
+    ``workers`` grupos."""
+    tasks, skipped = [], 0
+    for job in jobs:
+        files = list(job["files"])
+        # O dataset só é lido pelos workers; aqui basta o fingerprint
+        fingerprint = load_dataset(files, **DATASET_OPTIONS).fingerprint
+        terms = list(dict.fromkeys(normalize_term(term) for term in job["terms"]))
+        if not force:
+            pending = [term for term in terms if not store.exists(fingerprint, term)]
+            skipped += len(terms) - len(pending)
+            terms = pending
+        tasks += [(files, group) for group in _split(terms, workers)]
+    return tasks, skipped
+
+
+def run(jobs, workers=PRECOMPUTE_WORKERS, snapshot_dir=SNAPSHOT_DIR, force=False):
+    store = SnapshotStore(snapshot_dir, COMPUTE_VERSION)
+    tasks, skipped = plan_jobs(jobs, store, workers, force)
+    if skipped:
+        print(f"{skipped} termo(s) já com snapshot atual")
+
+    failures = 0
+
+    def report(batch):
+        nonlocal failures
+        for term, seconds, error in batch:
+            if error:
+                failures += 1
+                print(f"{term}: erro: {error}", file=sys.stderr)
+            else:
+                print(f"{term}: {seconds:.1f} s")
+
+    if workers <= 1 or len(tasks) <= 1:
+        for files, terms in tasks:
+            report(precompute_terms(files, terms, snapshot_dir))
+        return failures
+
+    # Grava o dataset compartilhado antes de abrir o pool, para que os
+    # workers só mapeiem o arquivo, sem ler os mesmos JSONs ao mesmo tempo
+    for files in dict.fromkeys(tuple(files) for files, _ in tasks):
+        prepare_dataset(list(files), **DATASET_OPTIONS)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        futures = [
+            pool.submit(precompute_terms, files, terms, snapshot_dir)
+            for files, terms in tasks
+        ]
+        for future in as_completed(futures):
+            report(future.result())
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pré-calcula os snapshots do painel.")
+    parser.add_argument("--files", nargs="+", help="arquivos de origem dos termos")
+    parser.add_argument(
+        "--terms", nargs="+", help="CNPJs ou raízes de CNPJ (8 dígitos) a pré-calcular"
+    )
+    parser.add_argument("--manifest", help="lista JSON de {files, terms}")
+    parser.add_argument("--workers", type=int, default=PRECOMPUTE_WORKERS)
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help="diretório dos snapshots")
+    parser.add_argument(
+        "--force", action="store_true", help="recalcula snapshots atuais"
+    )
+    parser.add_argument(
+        "--prune", action="store_true", help="remove snapshots e cubos desatualizados"
+    )
+    args = parser.parse_args(argv)
+
+    if args.prune:
+        removed = SnapshotStore(args.dir, COMPUTE_VERSION).prune(dataset_fingerprint)
+        print(f"{removed} snapshot(s) removido(s)")
+        removed = CUBES.prune(dataset_fingerprint)
+        print(f"{removed} cubo(s) removido(s)")
+
+    jobs = []
+    if args.manifest:
+        with open(args.manifest, "r") as f:
+            jobs += json.load(f)
+    if args.files or args.terms:
+        if not (args.files and args.terms):
+            parser.error("--files e --terms devem ser usados juntos")
+        jobs.append({"files": args.files, "terms": args.terms})
+    if not jobs:
+        if args.prune:
+            return 0
+        parser.error("informe --files/--terms ou --manifest")
+
+    return 1 if run(jobs, args.workers, args.dir, args.force) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
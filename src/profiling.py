@@ -0,0 +1,130 @@
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+# Instrumentação opcional: ligada com GENERAL_VISION_PROFILE=1 (ou pelo
+# painel, via `Profiler.enable`). Desligada, `stage` não mede nada.
+PROFILE_ENV = "GENERAL_VISION_PROFILE"
+PROFILE_LOGGER = "general_vision.profile"
+
+logger = logging.getLogger(PROFILE_LOGGER)
+
+
+def _configure_logger():
+    # Uma linha JSON por registro, em stderr, se ninguém configurou antes
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+class Profiler:
+    """Mede tempo de parede, tempo de CPU da thread e pico de memória
+    (tracemalloc) de cada etapa.
+
+    Os registros ficam por thread, já que cada sessão do Streamlit roda na
+    sua própria. O pico de memória é do processo: com sessões simultâneas,
+    as alocações de uma aparecem nas etapas da outra.
+    """
+
+    def __init__(self, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get(PROFILE_ENV, "") not in ("", "0")
+        self.enabled = False
+        self._local = threading.local()
+        if enabled:
+            self.enable()
+
+    def enable(self):
+        if not self.enabled:
+            _configure_logger()
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self.enabled = True
+
+    @property
+    def records(self):
+        if not hasattr(self._local, "records"):
+            self._local.records = []
+            self._local.stack = []
+            self._local.run = None
+        return self._local.records
+
+    @contextmanager
+    def run(self, **context):
+        """Agrupa as etapas de uma execução (ex.: um render do painel) e
+        descarta os registros da anterior."""
+        if not self.enabled:
+            yield
+            return
+        self.records.clear()
+        self._local.run = {"run": uuid.uuid4().hex[:12], **context}
+        try:
+            with self.stage("total"):
+                yield
+        finally:
+            self._local.run = None
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        records, stack = self.records, self._local.stack
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+        entry = {"base": current, "peak": current}
+        stack.append(entry)
+        # Registrado na entrada, para que o painel mostre as etapas na ordem
+        record = {**(self._local.run or {}), "stage": name, "depth": len(stack) - 1}
+        records.append(record)
+
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            entry["peak"] = max(entry["peak"], tracemalloc.get_traced_memory()[1])
+            stack.pop()
+            if stack:
+                stack[-1]["peak"] = max(stack[-1]["peak"], entry["peak"])
+            tracemalloc.reset_peak()
+
+            record.update(
+                wall_s=round(wall, 6),
+                cpu_s=round(cpu, 6),
+                peak_bytes=entry["peak"] - entry["base"],
+            )
+            logger.info(json.dumps(record, default=str))
+
+    def profiled(self, function=None, name=None):
+        """Decorador: cada chamada de ``function`` vira uma etapa."""
+        if function is None:
+            return lambda function: self.profiled(function, name)
+
+        stage_name = name or function.__name__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+            with self.stage(stage_name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+
+PROFILER = Profiler()
+stage = PROFILER.stage
+profiled = PROFILER.profiled
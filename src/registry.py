@@ -0,0 +1,191 @@
+import fcntl
+import json
+import os
+import threading
+import weakref
+
+import pyarrow as pa
+
+from cache import frame_from_arrow, frame_to_arrow
+from dataset import Dataset, dataset_fingerprint
+from schema import apply_schema
+
+SHARED_DIR = ".cache/shared"
+
+
+class DatasetHandle:
+    """Referência a um dataset do ``DatasetRegistry``. É devolvida com
+    ``release`` (ou ao sair do ``with``); se for esquecida, o coletor de
+    lixo a devolve quando o dono (ex.: a sessão do Streamlit) deixa de
+    existir."""
+
+    def __init__(self, registry, dataset):
+        self.dataset = dataset
+        self._finalizer = weakref.finalize(self, registry.release, dataset.fingerprint)
+
+    def release(self):
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class DatasetRegistry:
+    """Datasets carregados e tipados compartilhados pelo processo inteiro.
+
+    Cada conjunto de arquivos e opções de carga (o fingerprint do
+    ``Dataset``) é gravado uma única vez em ``root`` como Arrow IPC. As
+    sessões do mesmo processo recebem o mesmo ``Dataset``, com um só frame
+    e as mesmas tabelas derivadas. Outros processos (workers do
+    ``precompute.py``) mapeiam o mesmo arquivo, e as páginas ficam
+    compartilhadas pelo sistema operacional.
+
+    Só é lido sem cópia o que o pandas consegue usar direto dos buffers do
+    Arrow: as colunas aninhadas e os textos (mapeados como ``pd.ArrowDtype``,
+    qualquer que seja o ``arrow_nested`` das opções), os números sem nulos e
+    as datas. Números com nulos e os códigos dos categóricos são copiados
+    para a memória do processo, e as colunas gravadas como JSON viram
+    objetos do Python.
+
+    ``attach`` conta as referências de cada dataset, que sai da memória
+    quando a última é devolvida, e mantém uma trava compartilhada
+    (``flock``) em ``<fingerprint>.lock`` enquanto houver referências.
+    Quando as fontes mudam, o fingerprint muda, e o próximo ``attach``
+    carrega a versão nova. O arquivo da versão antiga é apagado quando
+    nenhum processo tem mais a trava dela.
+    """
+
+    def __init__(self, root=SHARED_DIR):
+        self.root = root
+        self._entries = {}  # fingerprint -> [dataset, referências, trava]
+        self._lock = threading.Lock()
+
+    def _path(self, fingerprint):
+        return os.path.join(self.root, f"{fingerprint}.arrow")
+
+    def _meta_path(self, fingerprint):
+        return os.path.join(self.root, f"{fingerprint}.json")
+
+    def _lock_path(self, fingerprint):
+        return os.path.join(self.root, f"{fingerprint}.lock")
+
+    def _hold(self, fingerprint):
+        # Trava compartilhada da versão; se o arquivo da trava foi apagado
+        # (versão removida) entre o open e o flock, tenta de novo com um novo
+        os.makedirs(self.root, exist_ok=True)
+        path = self._lock_path(fingerprint)
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            try:
+                if os.stat(path).st_ino == os.fstat(fd).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    def prepare(self, file_paths, loader, options=None):
+        """Grava o arquivo compartilhado do dataset, se ainda não existir, e
+        devolve o seu caminho. ``loader(file_paths)`` carrega o frame."""
+        fingerprint = dataset_fingerprint(file_paths, options)
+        path = self._path(fingerprint)
+        if os.path.exists(path):
+            return path
+
+        table = frame_to_arrow(loader(list(file_paths)))
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        meta = {
+            "sources": [os.path.abspath(source) for source in file_paths],
+            "options": options or {},
+        }
+        meta = json.loads(json.dumps(meta, default=str))
+        with open(self._meta_path(fingerprint), "w") as f:
+            json.dump(meta, f)
+        self._remove_stale(fingerprint, meta)
+        return path
+
+    def _map(self, file_paths, loader, options):
+        path = self.prepare(file_paths, loader, options)
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        return apply_schema(
+            frame_from_arrow(table, arrow_nested=True, arrow_strings=True)
+        )
+
+    def attach(self, file_paths, loader, options=None):
+        """``DatasetHandle`` do dataset de ``file_paths`` com ``options``.
+        O frame só é mapeado quando alguém o usa."""
+        file_paths = list(file_paths)
+        fingerprint = dataset_fingerprint(file_paths, options)
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                dataset = Dataset(
+                    loader=lambda: self._map(file_paths, loader, options),
+                    fingerprint=fingerprint,
+                    sources=file_paths,
+                    options=options,
+                )
+                entry = self._entries[fingerprint] = [
+                    dataset,
+                    0,
+                    self._hold(fingerprint),
+                ]
+            entry[1] += 1
+        return DatasetHandle(self, entry[0])
+
+    def release(self, fingerprint):
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._entries[fingerprint]
+                os.close(entry[2])
+
+    def references(self, fingerprint):
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            return entry[1] if entry else 0
+
+    def _remove_stale(self, fingerprint, current):
+        # Versões anteriores das mesmas fontes e opções cuja trava ninguém,
+        # neste ou em outro processo, tem: sem a trava exclusiva, fica
+        for name in os.listdir(self.root):
+            if not name.endswith(".json") or name == f"{fingerprint}.json":
+                continue
+            other = name[: -len(".json")]
+            try:
+                with open(os.path.join(self.root, name), "r") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if meta != current or self.references(other):
+                continue
+            fd = os.open(self._lock_path(other), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            try:
+                for path in (
+                    self._path(other),
+                    self._meta_path(other),
+                    self._lock_path(other),
+                ):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+            finally:
+                os.close(fd)
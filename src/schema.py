@@ -0,0 +1,65 @@
+import pandas as pd
+
+DATE_COLUMNS = [
+    "dataDistribuicao",
+    "statusPredictus.dataArquivamento",
+    "statusPredictus.dataTransitoJulgado",
+]
+
+MONEY_COLUMNS = [
+    "valorCausa.valor",
+    "statusPredictus.valorExecucao.valor",
+]
+
+CATEGORY_COLUMNS = [
+    "uf",
+    "tribunal",
+    "segmento",
+    "grauProcesso",
+    "classeProcessual.nome",
+    "statusPredictus.ramoDireito",
+    "statusPredictus.statusProcesso",
+]
+
+YEAR_COLUMN = "anoDistribuicao"
+YEAR_DTYPE = "Int16"
+
+
+def year_of(dates):
+    """Ano de uma coluna datetime64, como inteiro anulável."""
+    return dates.dt.year.astype(YEAR_DTYPE)
+
+
+def _to_category(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    # Categorias na ordem em que aparecem, como a contagem de um object faz;
+    # assim os empates dos rankings saem na mesma ordem de antes.
+    return pd.Series(
+        pd.Categorical(values, categories=pd.unique(values.dropna())),
+        index=values.index,
+        name=values.name,
+    )
+
+
+def apply_schema(df):
+    """Converte, uma única vez, as colunas do frame normalizado para os tipos
+    usados nas extrações: datas em datetime64, valores em float64 e campos
+    enumerados em categórico. Acrescenta o ano de distribuição em
+    ``YEAR_COLUMN``. Colunas ausentes são ignoradas; colunas já convertidas
+    não são processadas de novo."""
+    df = df.copy(deep=False)
+    for column in DATE_COLUMNS:
+        if column in df.columns and not pd.api.types.is_datetime64_any_dtype(
+            df[column]
+        ):
+            df[column] = pd.to_datetime(df[column], errors="coerce")
+    for column in MONEY_COLUMNS:
+        if column in df.columns and df[column].dtype != "float64":
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("float64")
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = _to_category(df[column])
+    if "dataDistribuicao" in df.columns:
+        df[YEAR_COLUMN] = year_of(df["dataDistribuicao"])
+    return df
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+SNAPSHOT_DIR = ".cache/snapshots"
+# Incrementar quando o formato dos snapshots mudar; mudanças no cálculo já
+# mudam a versão do código guardada com cada um (ver `SnapshotStore.version`)
+SNAPSHOT_VERSION = 2
+SNAPSHOT_COMPRESSION = "zstd"
+
+_META_FILE = "meta.json"
+
+
+def _scalar(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _nested_columns(df):
+    # Colunas com listas ou dicts (ex.: os rótulos de `distribuicao_assuntos`):
+    # o Arrow as devolveria como arrays do numpy, então vão como JSON
+    return [
+        column
+        for column in df.columns
+        if df[column].dtype == object
+        and any(isinstance(value, (list, dict)) for value in df[column])
+    ]
+
+
+def _encode_nested(df, columns):
+    return df.assign(
+        **{
+            column: [
+                json.dumps(value, ensure_ascii=False, default=str)
+                for value in df[column]
+            ]
+            for column in columns
+        }
+    )
+
+
+def _decode_nested(df, columns):
+    return df.assign(
+        **{
+            column: pd.Series([json.loads(value) for value in df[column]], dtype=object)
+            for column in columns
+        }
+    )
+
+
+class SnapshotStore:
+    """Resultados de ``compute_data`` gravados em disco, um diretório por
+    (fingerprint do dataset, termo): os valores escalares em ``meta.json`` e
+    cada frame num arquivo Arrow IPC comprimido. Colunas com listas ou dicts
+    são gravadas como JSON e voltam como os mesmos objetos do Python.
+
+    Como o fingerprint muda junto com os arquivos de origem (tamanho, mtime)
+    e as opções de carga, e a versão do código do cálculo é conferida na
+    leitura, um snapshot encontrado é sempre de dados e código atuais;
+    ``prune`` remove os que deixaram de corresponder a eles.
+    """
+
+    def __init__(self, root=SNAPSHOT_DIR, version=None):
+        self.root = root
+        # Versão do código que calcula os snapshots (ver
+        # versions.code_version): os de outra versão não são servidos
+        self.version = version
+
+    def _path(self, fingerprint, term):
+        name = hashlib.blake2b(str(term).encode(), digest_size=8).hexdigest()
+        return os.path.join(self.root, fingerprint, name)
+
+    def _read_meta(self, path):
+        try:
+            with open(os.path.join(path, _META_FILE), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _current_meta(self, path, term):
+        meta = self._read_meta(path)
+        if meta is None or meta.get("term") != term or not self._current_version(meta):
+            return None
+        return meta
+
+    def _current_version(self, meta):
+        return (
+            meta.get("version") == SNAPSHOT_VERSION and meta.get("code") == self.version
+        )
+
+    def exists(self, fingerprint, term):
+        return self._current_meta(self._path(fingerprint, term), term) is not None
+
+    def get(self, fingerprint, term):
+        path = self._path(fingerprint, term)
+        meta = self._current_meta(path, term)
+        if meta is None:
+            return None
+
+        data = dict(meta["values"])
+        nested = meta.get("nested", {})
+        try:
+            for key in meta["frames"]:
+                with pa.memory_map(os.path.join(path, f"{key}.arrow"), "r") as source:
+                    df = pa.ipc.open_file(source).read_all().to_pandas()
+                data[key] = _decode_nested(df, nested.get(key, []))
+        except (OSError, ValueError, pa.ArrowInvalid):
+            return None  # snapshot incompleto: recalculado ao vivo
+        return data
+
+    def put(self, fingerprint, term, data, sources=None, options=None):
+        path = self._path(fingerprint, term)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+
+        frames, values, nested = [], {}, {}
+        write_options = pa.ipc.IpcWriteOptions(compression=SNAPSHOT_COMPRESSION)
+        for key, value in data.items():
+            if isinstance(value, pd.DataFrame):
+                columns = _nested_columns(value)
+                if columns:
+                    nested[key] = columns
+                table = pa.Table.from_pandas(_encode_nested(value, columns))
+                with pa.OSFile(os.path.join(tmp_path, f"{key}.arrow"), "wb") as sink:
+                    with pa.ipc.new_file(
+                        sink, table.schema, options=write_options
+                    ) as writer:
+                        writer.write_table(table)
+                frames.append(key)
+            else:
+                values[key] = _scalar(value)
+
+        meta = {
+            "version": SNAPSHOT_VERSION,
+            "code": self.version,
+            "fingerprint": fingerprint,
+            "term": term,
+            "created_at": time.time(),
+            "sources": [os.path.abspath(source) for source in sources or []],
+            "options": options or {},
+            "values": values,
+            "frames": frames,
+            "nested": nested,
+        }
+        with open(os.path.join(tmp_path, _META_FILE), "w") as f:
+            json.dump(meta, f)
+
+        # Troca o diretório inteiro para que um leitor nunca veja metade dele
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    def prune(self, fingerprint_of):
+        """Remove os snapshots cujo dataset ou código mudou.
+        ``fingerprint_of(sources, options)`` recalcula o fingerprint atual
+        de um snapshot."""
+        if not os.path.isdir(self.root):
+            return 0
+        removed = 0
+        for fingerprint in os.listdir(self.root):
+            directory = os.path.join(self.root, fingerprint)
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                meta = self._read_meta(path)
+                try:
+                    fresh = (
+                        meta is not None
+                        and self._current_version(meta)
+                        and fingerprint_of(meta["sources"], meta["options"])
+                        == fingerprint
+                    )
+                except OSError:
+                    fresh = False  # fonte removida
+                if not fresh:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+            if not os.listdir(directory):
+                os.rmdir(directory)
+        return removed
@@ -0,0 +1,305 @@
+import itertools
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from schema import YEAR_COLUMN
+
+_ARROW_ERRORS = (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError)
+
+# Colunas de listas de dicts que podem ficar em Arrow (list<struct>) no frame
+NESTED_COLUMNS = ["partes", "assuntosCNJ", "statusPredictus.julgamentos"]
+
+
+def _get_path(item, path):
+    for key in path:
+        if not isinstance(item, dict):
+            return None
+        item = item.get(key)
+    return item
+
+
+def is_arrow_backed(values):
+    return isinstance(getattr(values, "dtype", None), pd.ArrowDtype)
+
+
+def _to_arrow(values):
+    if is_arrow_backed(values):
+        # Os buffers da coluna, sem passar pelos objetos do Python
+        values = pa.array(values.array)
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        array = values
+    else:
+        try:
+            array = pa.array(values, from_pandas=True)
+        except _ARROW_ERRORS:
+            return None
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    if not pa.types.is_list(array.type) or not pa.types.is_struct(
+        array.type.value_type
+    ):
+        return None
+    return array
+
+
+def _struct_path(items, path):
+    values = items
+    for key in path.split("."):
+        if not pa.types.is_struct(values.type) or values.type.get_field_index(key) < 0:
+            return pa.nulls(len(items))
+        # Um item nulo na lista anula também os seus campos
+        values = pc.struct_field(values, key)
+    return values
+
+
+def _flatten_arrow(values, fields, child):
+    array = _to_arrow(values)
+    if array is None:
+        return None
+
+    items = pc.list_flatten(array)
+    columns = {"row": pc.list_parent_indices(array).to_numpy()}
+    for field in fields:
+        columns[field] = _struct_path(items, field).to_pandas()
+    child_values = _struct_path(items, child) if child else None
+    return pd.DataFrame(columns), child_values
+
+
+def _flatten_python(values, fields, child):
+    if is_arrow_backed(values):
+        values = pa.array(values.array)
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        values = values.to_pylist()
+    lists = [value if isinstance(value, list) else [] for value in values]
+    rows = np.repeat(np.arange(len(lists)), [len(value) for value in lists])
+    items = list(itertools.chain.from_iterable(lists))
+    columns = {"row": rows}
+    for field in fields:
+        path = field.split(".")
+        columns[field] = pd.Series(
+            [_get_path(item, path) for item in items], dtype=object
+        )
+    child_values = None
+    if child:
+        path = child.split(".")
+        child_values = [_get_path(item, path) for item in items]
+    return pd.DataFrame(columns), child_values
+
+
+def to_arrow_column(values):
+    """Série de listas de dicts como ``list<struct>`` do Arrow
+    (``pd.ArrowDtype``), ou a própria série quando o Arrow não a tipa."""
+    if is_arrow_backed(values):
+        return values
+    array = _to_arrow(values)
+    if array is None:
+        return values
+    return pd.Series(
+        pd.arrays.ArrowExtensionArray(array), index=values.index, name=values.name
+    )
+
+
+def arrow_nested_columns(df, columns=NESTED_COLUMNS):
+    """Converte as colunas aninhadas de ``df`` para Arrow; as extrações
+    passam a achatá-las pelos offsets e arrays filhos, sem criar um objeto
+    do Python por item."""
+    df = df.copy(deep=False)
+    for column in columns:
+        if column in df.columns:
+            df[column] = to_arrow_column(df[column])
+    return df
+
+
+def flatten_records(values, fields, child=None):
+    """Achata uma coluna de listas de dicts em uma tabela com a posição da
+    linha de origem (``row``) e os campos pedidos (caminhos com ponto, como
+    ``"oab.numero"``). Itens que não são dicts geram campos nulos.
+
+    Com ``child``, devolve também a lista aninhada naquele campo, alinhada às
+    linhas da tabela, para ser achatada em seguida.
+
+    A conversão para Arrow percorre os objetos uma única vez, em C++, e o
+    achatamento usa os offsets das listas; colunas que o Arrow não consegue
+    tipar caem no caminho em Python puro, com o mesmo resultado.
+    """
+    result = _flatten_arrow(values, fields, child)
+    if result is None:
+        result = _flatten_python(values, fields, child)
+    table, child_values = result
+    return (table, child_values) if child else table
+
+
+def _truthy(values):
+    # Mesma semântica de `item.get("ePrincipal", False)` usado como filtro
+    return values.notna() & values.astype(bool)
+
+
+def build_subjects_table(df):
+    """Tabela filha de ``assuntosCNJ``: uma linha por assunto, com a linha do
+    processo, o título, se é o assunto principal e o ano de distribuição."""
+    subjects = flatten_records(df["assuntosCNJ"], ["titulo", "ePrincipal"])
+    subjects["ePrincipal"] = _truthy(subjects["ePrincipal"])
+    subjects["Ano"] = df[YEAR_COLUMN].array.take(subjects["row"].to_numpy())
+    return subjects
+
+
+def principal_subjects(subjects):
+    return subjects.loc[subjects["ePrincipal"]]
+
+
+def build_parties_tables(df):
+    """Tabelas normalizadas de ``partes`` e dos seus ``advogados``.
+
+    Cada parte guarda a linha do processo (``row``); cada advogado guarda a
+    parte (``party``, posição na tabela de partes) e a linha do processo.
+    """
+    parties, lawyers_values = flatten_records(
+        df["partes"], ["nome", "polo", "cnpj"], child="advogados"
+    )
+    lawyers = flatten_records(lawyers_values, ["nome", "oab.numero"])
+    lawyers = lawyers.rename(columns={"row": "party"})
+    lawyers.insert(1, "row", parties["row"].to_numpy()[lawyers["party"].to_numpy()])
+    return parties, lawyers
+
+
+def row_remap(rows, size):
+    """Array de ``size`` posições com a nova posição de cada linha de
+    ``rows`` em um recorte do frame, e -1 para as linhas que ficaram fora."""
+    remap = np.full(size, -1, dtype=np.int64)
+    remap[rows] = np.arange(len(rows))
+    return remap
+
+
+def select_rows(table, remap):
+    """Linhas de uma tabela filha cujos processos estão no recorte descrito
+    por ``remap`` (ver ``row_remap``), com ``row`` renumerado. Devolve também
+    a máscara das linhas mantidas."""
+    rows = remap[table["row"].to_numpy()]
+    keep = rows >= 0
+    selected = table.loc[keep].reset_index(drop=True)
+    selected["row"] = rows[keep]
+    return selected, keep
+
+
+def select_parties_tables(parties, lawyers, remap):
+    """``select_rows`` para as tabelas de partes e advogados, mantendo a
+    referência de cada advogado à posição da sua parte."""
+    parties, keep = select_rows(parties, remap)
+    lawyers, _ = select_rows(lawyers, remap)
+    party_remap = np.cumsum(keep) - 1
+    lawyers["party"] = party_remap[lawyers["party"].to_numpy()]
+    return parties, lawyers
+
+
+def _items(values):
+    for items in values:
+        if isinstance(items, list):
+            for item in items:
+                if isinstance(item, dict):
+                    yield item
+
+
+def _iter_arrow(values, batch_size=100_000):
+    # Um lote de cada vez vira objetos do Python, só com o campo pedido
+    for start in range(0, len(values), batch_size):
+        yield from values.slice(start, batch_size).to_pylist()
+
+
+def iter_party_names(partes):
+    """Nomes das partes direto da coluna ``partes``, sem montar a tabela."""
+    if is_arrow_backed(partes):
+        array = _to_arrow(partes)
+        if array is not None:
+            yield from _iter_arrow(_struct_path(pc.list_flatten(array), "nome"))
+            return
+    for party in _items(partes):
+        yield party.get("nome")
+
+
+CNPJ_ROOT_LENGTH = 8
+CNPJ_LENGTH = 14
+
+_NON_DIGITS_PATTERN = re.compile(r"\D")
+
+
+def normalize_term(term):
+    """Chave canônica de um termo de busca: um CNPJ, uma raiz de CNPJ (os 8
+    primeiros dígitos, que pegam todas as filiais) ou uma lista deles, numa
+    string como ``"00000000,11222333000181"``. Listas iguais geram a mesma
+    chave, que serve para os caches e snapshots."""
+    parts = term.split(",") if isinstance(term, str) else list(term)
+    digits = sorted({_NON_DIGITS_PATTERN.sub("", str(part)) for part in parts} - {""})
+    for part in digits:
+        if len(part) not in (CNPJ_ROOT_LENGTH, CNPJ_LENGTH):
+            raise ValueError(f"CNPJ ou raiz de CNPJ inválido: {part!r} em {term!r}")
+    if not digits:
+        raise ValueError(f"termo vazio: {term!r}")
+    return ",".join(digits)
+
+
+class CnpjIndex:
+    """Índice de (polo, CNPJ) para as linhas dos processos em que a parte
+    aparece.
+
+    Para cada polo, os CNPJs (só os dígitos) ficam ordenados num array, e as
+    linhas de cada um, ordenadas e sem repetição, num único array na mesma
+    ordem. Como os CNPJs de uma mesma raiz são vizinhos, um CNPJ ou uma raiz
+    vira, com duas buscas binárias, uma fatia contínua desse array, sem
+    percorrer as partes.
+    """
+
+    def __init__(self, parties):
+        keyed = parties.loc[
+            parties["cnpj"].notna() & parties["polo"].notna(), ["polo", "cnpj", "row"]
+        ]
+        keyed = (
+            keyed.assign(
+                cnpj=keyed["cnpj"]
+                .astype(str)
+                .str.replace(_NON_DIGITS_PATTERN, "", regex=True)
+            )
+            .drop_duplicates()
+            .sort_values(["polo", "cnpj", "row"])
+        )
+        self._rows = keyed["row"].to_numpy()
+        # polo -> (CNPJs ordenados, início das linhas de cada um e o fim)
+        self._keys = {}
+        start = 0
+        for polo, sizes in (
+            keyed.groupby(["polo", "cnpj"], sort=False)
+            .size()
+            .groupby(level="polo", sort=False)
+        ):
+            cnpjs = (
+                sizes.index.get_level_values("cnpj").to_numpy(dtype=object).astype(str)
+            )
+            bounds = start + np.concatenate(([0], np.cumsum(sizes.to_numpy())))
+            self._keys[polo] = (cnpjs, bounds)
+            start = bounds[-1]
+
+    def _span(self, polo, prefix):
+        cnpjs, bounds = self._keys[polo]
+        # CNPJs com o prefixo: de `prefix` até logo antes do próximo prefixo
+        lo = np.searchsorted(cnpjs, prefix, side="left")
+        hi = np.searchsorted(cnpjs, prefix + "\uffff", side="left")
+        return bounds[lo], bounds[hi]
+
+    def rows(self, term, polo):
+        """Linhas (ordenadas) dos processos em que algum CNPJ de ``term``
+        (ver ``normalize_term``) está no ``polo``."""
+        if polo not in self._keys:
+            return self._rows[:0]
+        prefixes = normalize_term(term).split(",")
+        spans = [self._span(polo, prefix) for prefix in prefixes]
+        if len(prefixes) == 1 and len(prefixes[0]) == CNPJ_LENGTH:
+            # Um só CNPJ: as linhas já estão ordenadas e sem repetição
+            start, stop = spans[0]
+            return self._rows[start:stop]
+        # Filiais de uma raiz podem estar no mesmo processo
+        return np.unique(
+            np.concatenate([self._rows[start:stop] for start, stop in spans])
+        )
@@ -0,0 +1,21 @@
+import hashlib
+import inspect
+
+
+def code_version(*parts):
+    """Hash curto do código e das constantes de que um resultado gravado
+    depende: módulos, classes e funções entram pelo código-fonte, os demais
+    valores pelo ``repr``. Mudar qualquer um deles muda a versão, e o que
+    foi gravado com a anterior deixa de valer."""
+    digest = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        if inspect.ismodule(part) or inspect.isclass(part) or inspect.isroutine(part):
+            try:
+                text = inspect.getsource(part)
+            except (OSError, TypeError):
+                text = f"{getattr(part, '__module__', '')}.{getattr(part, '__qualname__', repr(part))}"
+        else:
+            text = repr(part)
+        digest.update(text.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
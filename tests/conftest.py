@@ -0,0 +1,125 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import generate  # noqa: E402
+
+TERM = generate.COMPANY_ROOT + generate.COMPANY_BRANCHES[0]
+ROOT_TERM = generate.COMPANY_ROOT
+
+
+def make_records(count, seed=7, start=0):
+    # Poucas pessoas, empresas e advogados, para que os rankings tenham
+    # nomes repetidos mesmo com algumas centenas de processos
+    generator = generate.ProcessGenerator(seed, people=150, companies=40, lawyers=60)
+    return [generator.process(number) for number in range(start, start + count)]
+
+
+def edge_records():
+    """Processos com os casos que os dados sintéticos não cobrem: sem data de
+    distribuição, sem assuntos, julgamentos ou partes, com o CNPJ do termo
+    formatado e sem número de processo."""
+    return [
+        {
+            "numeroProcessoUnico": "9000001-00.2020.8.26.0001",
+            "grauProcesso": 1,
+            "uf": "SP",
+            "tribunal": "TJSP",
+            "segmento": "JUSTIÇA ESTADUAL",
+            "dataDistribuicao": None,
+            "classeProcessual": {"nome": "Monitória"},
+            "assuntosCNJ": [],
+            "valorCausa": None,
+            "partes": [
+                {"nome": "Empresa Exemplo S.A.", "cnpj": "00.000.000/0001-91", "polo": "PASSIVO", "advogados": []},
+            ],
+            "statusPredictus": {"ramoDireito": "CÍVEL", "statusProcesso": "ATIVO", "julgamentos": []},
+        },
+        {
+            "numeroProcessoUnico": "9000002-00.2021.8.26.0001",
+            "grauProcesso": 2,
+            "uf": "RJ",
+            "tribunal": "TJRJ",
+            "segmento": "JUSTIÇA ESTADUAL",
+            "dataDistribuicao": "2021-06-30T23:59:59",
+            "classeProcessual": {"nome": "Cobrança"},
+            "assuntosCNJ": [{"codigoCNJ": 7, "titulo": None, "ePrincipal": True}],
+            "valorCausa": {"valor": 1500.0},
+            "partes": [],
+            "statusPredictus": {
+                "ramoDireito": "CONSUMIDOR",
+                "statusProcesso": "ARQUIVADO",
+                "julgamentos": [{"tipoJulgamento": "ACORDO"}],
+                "valorExecucao": {"valor": 800.0},
+                "dataArquivamento": "2021-06-30",
+            },
+        },
+        {
+            "numeroProcessoUnico": None,
+            "grauProcesso": 1,
+            "uf": "MG",
+            "tribunal": "TJMG",
+            "segmento": "JUSTIÇA ESTADUAL",
+            "dataDistribuicao": "2019-01-01T00:00:00",
+            "classeProcessual": {"nome": "Monitória"},
+            "assuntosCNJ": [{"codigoCNJ": 8, "titulo": "Cobrança", "ePrincipal": True}],
+            "valorCausa": {"valor": 0.0},
+            "partes": [
+                {"nome": "EMPRESA EXEMPLO SA", "cnpj": TERM, "polo": "ATIVO", "advogados": [{"nome": "ANA SILVA", "oab": None}]},
+                {"nome": "EMPRESA EXEMPLO SA", "cnpj": ROOT_TERM + generate.COMPANY_BRANCHES[1], "polo": "PASSIVO", "advogados": []},
+            ],
+            "statusPredictus": {"ramoDireito": "CÍVEL", "statusProcesso": "ATIVO"},
+        },
+    ]
+
+
+def revised(records):
+    # Nova versão dos mesmos processos, como num arquivo que chega depois
+    updated = []
+    for record in records:
+        record = json.loads(json.dumps(record))
+        record["valorCausa"] = {"valor": 12345.0}
+        record["statusPredictus"]["statusProcesso"] = "BAIXADO"
+        record["partes"].append({"nome": "NOVA PARTE LTDA", "cnpj": "99888777000100", "polo": "ATIVO", "advogados": []})
+        updated.append(record)
+    return updated
+
+
+def write_json(path, records):
+    with open(path, "w") as f:
+        json.dump({"processos": records}, f, ensure_ascii=False)
+    return str(path)
+
+
+def write_ndjson(path, records):
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n\n")
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    # Os caches em disco (.cache/...) são relativos ao diretório atual
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def records():
+    return make_records(300) + edge_records()
+
+
+@pytest.fixture
+def files(tmp_path, records):
+    """Dois arquivos de empresa: o segundo repete 40 processos do primeiro
+    em versões novas. Devolve os caminhos e os registros de cada arquivo."""
+    first = records[:200]
+    second = revised(records[160:200]) + records[200:]
+    paths = [write_json(tmp_path / "dados_empresa1.json", first), write_ndjson(tmp_path / "dados_empresa2.ndjson", second)]
+    return paths, [first, second]
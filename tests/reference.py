@@ -0,0 +1,260 @@
+"""Extrações do painel recalculadas em Python puro sobre os registros JSON,
+na lógica do ``extract_data`` original: cada processo, parte, assunto e
+julgamento percorrido um a um e contado, sem frame, cubo nem índice.
+
+``assert_matches_reference`` compara o dicionário devolvido por qualquer
+caminho otimizado (``compute_data``, recortes, estado incremental) com ela.
+Empates dos rankings podem sair em qualquer ordem, então os rankings são
+comparados pelos totais e pelo total de cada nome, não pela posição.
+"""
+import json
+import math
+import re
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import pytest
+
+from distributions import OTHERS_LABEL
+from main import DISTRIBUICOES_CUBO, DISTRIBUICOES_FRAME, HISTOGRAMAS
+from names import normalize_name
+from tables import normalize_term
+
+KEY = "numeroProcessoUnico"
+CUT_LIMIT = 5
+
+FIELDS = {
+    "distribuicao_ramo_direito": "statusPredictus.ramoDireito",
+    "distribuicao_status_processos": "statusPredictus.statusProcesso",
+    "distribuicao_tribunal": "tribunal",
+    "distribuicao_segmento": "segmento",
+    "distribuicao_grau": "grauProcesso",
+    "df_estado": "uf",
+    "distribuicao_classes": "classeProcessual.nome",
+}
+
+HISTOGRAM_VALUES = {
+    "dias_ate_arquivamento": lambda record: _days(record, "statusPredictus.dataArquivamento"),
+    "dias_ate_transito_julgado": lambda record: _days(record, "statusPredictus.dataTransitoJulgado"),
+    "totalValorCausa": lambda record: _money(record, "valorCausa.valor"),
+    "totalValorExecucao": lambda record: _money(record, "statusPredictus.valorExecucao.valor"),
+}
+
+
+def latest_versions(records):
+    """Última versão de cada processo, na ordem dos registros; os sem número
+    ficam todos."""
+    last = {record[KEY]: index for index, record in enumerate(records) if record.get(KEY) is not None}
+    return [record for index, record in enumerate(records) if record.get(KEY) is None or last[record[KEY]] == index]
+
+
+def get_path(record, path):
+    for key in path.split("."):
+        if not isinstance(record, dict):
+            return None
+        record = record.get(key)
+    return record
+
+
+def _money(record, path):
+    value = get_path(record, path)
+    return 0.0 if value is None else float(value)
+
+
+def _date(record, path):
+    value = get_path(record, path)
+    return None if value is None else datetime.fromisoformat(value)
+
+
+def _days(record, path):
+    start, end = _date(record, "dataDistribuicao"), _date(record, path)
+    return None if start is None or end is None else (end - start).days
+
+
+def _parties(record):
+    return [party for party in record.get("partes") or [] if isinstance(party, dict)]
+
+
+def has_term(record, term, polo):
+    prefixes = tuple(normalize_term(term).split(","))
+    return any(
+        party.get("polo") == polo
+        and party.get("cnpj") is not None
+        and re.sub(r"\D", "", str(party["cnpj"])).startswith(prefixes)
+        for party in _parties(record)
+    )
+
+
+def subject_key(value):
+    return json.dumps(value, sort_keys=True, ensure_ascii=False) if isinstance(value, list) else None
+
+
+def _counts(values):
+    return Counter(value for value in values if value is not None)
+
+
+def indicators(records, term):
+    groups = {
+        "": records,
+        "_ativo": [record for record in records if has_term(record, term, "ATIVO")],
+        "_passivo": [record for record in records if has_term(record, term, "PASSIVO")],
+    }
+    result = {
+        "qtd_processos": len(records),
+        "qtd_polo_ativo": len(groups["_ativo"]),
+        "qtd_polo_passivo": len(groups["_passivo"]),
+    }
+    for suffix, group in groups.items():
+        result[f"valor_causa{suffix}"] = sum(_money(record, "valorCausa.valor") for record in group)
+        result[f"valor_execucao{suffix}"] = sum(
+            _money(record, "statusPredictus.valorExecucao.valor") for record in group
+        )
+    return result
+
+
+def distributions(records):
+    result = {key: _counts(get_path(record, path) for record in records) for key, path in FIELDS.items()}
+    result["distribuicao_julgamento"] = _counts(
+        julgamento.get("tipoJulgamento")
+        for record in records
+        for julgamento in get_path(record, "statusPredictus.julgamentos") or []
+    )
+    result["distribuicao_assuntos"] = _counts(subject_key(record.get("assuntosCNJ")) for record in records)
+    return result
+
+
+def principal_subjects(records):
+    # (ano de distribuição, título) de cada assunto principal
+    return [
+        (None if _date(record, "dataDistribuicao") is None else _date(record, "dataDistribuicao").year, subject.get("titulo"))
+        for record in records
+        for subject in record.get("assuntosCNJ") or []
+        if subject.get("ePrincipal")
+    ]
+
+
+def party_names(records):
+    return _counts(
+        normalize_name(party["nome"]) for record in records for party in _parties(record) if party.get("nome") is not None
+    )
+
+
+def dist_vs_arq(records):
+    # Ano -> [distribuídos, arquivados, valor distribuídos, valor arquivados]
+    years = defaultdict(lambda: [None, None, None, None])
+    for position, path in ((0, "dataDistribuicao"), (1, "statusPredictus.dataArquivamento")):
+        for record in records:
+            date = _date(record, path)
+            if date is None:
+                continue
+            row = years[date.year]
+            row[position] = (row[position] or 0) + 1
+            row[position + 2] = (row[position + 2] or 0.0) + _money(record, "valorCausa.valor")
+    return dict(years)
+
+
+def bin_of(value, edges):
+    # Faixas (edges[i], edges[i+1]], com a primeira fechada à esquerda
+    if value is None:
+        return None
+    if value == edges[0]:
+        return 0
+    for index in range(len(edges) - 1):
+        if edges[index] < value <= edges[index + 1]:
+            return index
+    return None
+
+
+def histograms(records):
+    result = {}
+    for key, (edges, *_rest) in HISTOGRAMAS.items():
+        counts = [0] * (len(edges) - 1)
+        for record in records:
+            index = bin_of(HISTOGRAM_VALUES[key](record), edges)
+            if index is not None:
+                counts[index] += 1
+        result[key] = counts
+    return result
+
+
+def assert_distribution(frame, expected, cut, key=str):
+    # `key` vale para os rótulos do frame; `expected` já vem com as chaves
+    # em texto (os assuntos, por ``subject_key``)
+    label, total = frame.columns[:2]
+    rows = {key(value): int(count) for value, count in zip(frame[label], frame[total])}
+    assert len(rows) == len(frame)
+    expected = {str(value): count for value, count in expected.items()}
+    counts = sorted(expected.values(), reverse=True)
+    if cut and len(expected) > CUT_LIMIT:
+        assert list(frame[label])[-1] == OTHERS_LABEL
+        others = rows.pop(OTHERS_LABEL)
+        assert sorted(rows.values(), reverse=True) == counts[:CUT_LIMIT]
+        assert others == sum(counts[CUT_LIMIT:])
+        assert all(expected[value] == count for value, count in rows.items())
+        totals = list(frame[total])[:-1]
+    else:
+        assert rows == expected
+        totals = list(frame[total])
+    assert totals == sorted(totals, reverse=True)
+
+
+def assert_ranking(frame, column, expected, top_n):
+    rows = dict(zip(frame[column], frame["Total"]))
+    assert len(rows) == len(frame)
+    assert sorted(map(int, rows.values()), reverse=True) == sorted(expected.values(), reverse=True)[:top_n]
+    assert all(expected[name] == count for name, count in rows.items())
+    assert list(frame["Total"]) == sorted(frame["Total"], reverse=True)
+
+
+def _optional(value):
+    return None if value is None or (isinstance(value, float) and math.isnan(value)) else value
+
+
+def assert_matches_reference(data, records, term):
+    """``data`` (o dicionário do ``compute_data``) bate com a extração de
+    referência sobre ``records``, já sem versões repetidas."""
+    for key, value in indicators(records, term).items():
+        assert data[key] == pytest.approx(value), key
+
+    counts = distributions(records)
+    for key, (_dimension, _names, cut, _limit) in DISTRIBUICOES_CUBO.items():
+        assert_distribution(data[key], counts[key], cut)
+    for key, (_names, cut, _limit) in DISTRIBUICOES_FRAME.items():
+        assert_distribution(data[key], counts[key], cut, subject_key if key == "distribuicao_assuntos" else str)
+
+    subjects = principal_subjects(records)
+    assert_distribution(data["assuntos_principais"], _counts(title for _year, title in subjects), True)
+    for key, top_n in (("assuntos_principais_ano", 3), ("assuntos_principais_ano_um", 1)):
+        frame = data[key]
+        years = {year for year, _title in subjects if year is not None}
+        titled = {year for year, title in subjects if year is not None and title is not None}
+        assert set(frame["Ano"]) == {str(year) for year in titled}
+        for year in years:
+            rows = frame.loc[frame["Ano"] == str(year)]
+            in_year = [title for subject_year, title in subjects if subject_year == year]
+            assert_ranking(rows, "Assunto", _counts(in_year), top_n)
+            assert list(rows["Percentual"]) == [f"{count / len(in_year) * 100:.2f}%" for count in rows["Total"]]
+
+    names = party_names(records)
+    ranking = data["top_10_partes"]
+    assert_ranking(ranking, "Nome", names, 10)
+    assert list(ranking["Percentual"]) == [f"{count / sum(names.values()) * 100:.2f}%" for count in ranking["Total"]]
+
+    dist_arq = {
+        int(row["Ano"]): [
+            _optional(row["Distribuídos"]),
+            _optional(row["Arquivados"]),
+            _optional(row["Valor de Causa Distribuídos"]),
+            _optional(row["Valor de Causa Arquivados"]),
+        ]
+        for _, row in data["dist_arq"].iterrows()
+    }
+    expected = dist_vs_arq(records)
+    assert dist_arq.keys() == expected.keys()
+    for year, values in expected.items():
+        assert dist_arq[year] == pytest.approx(values), year
+
+    for key, counts in histograms(records).items():
+        edges, labels, (label, total) = HISTOGRAMAS[key]
+        assert [str(value) for value in data[key][label]] == labels
+        assert list(data[key][total]) == counts, key
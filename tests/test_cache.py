@@ -0,0 +1,85 @@
+import os
+
+import pandas as pd
+import pytest
+
+import main
+from cache import DatasetCache
+from conftest import TERM, make_records, write_json
+from dataset import Dataset
+from reference import assert_matches_reference, latest_versions
+
+
+def load(paths, **options):
+    return main.load_data(paths, **{**main.DATASET_OPTIONS, **options})
+
+
+def without_nulls(value):
+    # O Arrow grava listas de dicts como list<struct>: a chave ausente de
+    # um dict volta como None, e o NaN do json_normalize também, o que os
+    # `.get` e `notna` das extrações não distinguem
+    if isinstance(value, dict):
+        return {key: without_nulls(item) for key, item in value.items() if without_nulls(item) is not None}
+    if isinstance(value, list):
+        return [without_nulls(item) for item in value]
+    return None if isinstance(value, float) and value != value else value
+
+
+def assert_same_frame(df, expected):
+    nested = [column for column in df.columns if df[column].dtype == object]
+    for column in nested:
+        assert [without_nulls(value) for value in df[column]] == [without_nulls(value) for value in expected[column]], column
+    pd.testing.assert_frame_equal(df.drop(columns=nested), expected.drop(columns=nested))
+
+
+@pytest.mark.parametrize("arrow_nested", [False, True])
+def test_warm_load_matches_uncached(files, arrow_nested):
+    paths, _contents = files
+    expected = load(paths, use_cache=False, arrow_nested=arrow_nested)
+    cold = load(paths, arrow_nested=arrow_nested)
+    warm = load(paths, arrow_nested=arrow_nested)
+    for df in (cold, warm):
+        assert_same_frame(df, expected)
+        assert df.attrs == expected.attrs
+
+
+@pytest.mark.parametrize("arrow_nested", [False, True])
+def test_warm_load_matches_reference(files, arrow_nested):
+    paths, contents = files
+    load(paths, arrow_nested=arrow_nested)
+    data = main.compute_data(Dataset(load(paths, arrow_nested=arrow_nested)), TERM)
+    assert_matches_reference(data, latest_versions(contents[0] + contents[1]), TERM)
+
+
+def test_warm_load_reads_one_frame(files, monkeypatch):
+    paths, _contents = files
+    expected = load(paths)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("carga a frio num cache aquecido")
+
+    monkeypatch.setattr(main, "load_files", fail)
+    assert_same_frame(load(paths), expected)
+    # Outra política de duplicados é outra entrada
+    with pytest.raises(AssertionError):
+        load(paths, dedup=None)
+
+
+def test_frame_entry_follows_the_sources(tmp_path):
+    paths = [write_json(tmp_path / f"dados{index}.json", make_records(5, start=index * 5)) for index in range(2)]
+    cache = DatasetCache(tmp_path / "cache")
+    df = pd.DataFrame({"a": [1, 2]})
+    df.attrs["duplicados_removidos"] = 3
+    cache.put_frame(paths, df)
+    assert cache.get_frame(paths).attrs == {"duplicados_removidos": 3}
+    assert cache.get_frame(paths[::-1]) is None
+
+    # Arquivo só tocado continua valendo; conteúdo novo descarta a entrada
+    os.utime(paths[1], ns=(0, 0))
+    pd.testing.assert_frame_equal(cache.get_frame(paths), df)
+    write_json(paths[1], make_records(6))
+    assert cache.get_frame(paths) is None
+
+    cache.put_frame(paths, df)
+    assert cache.purge([paths[0]]) == 1
+    assert cache.get_frame(paths) is None
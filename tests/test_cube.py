@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import COUNT, Cube, CubeStore, build_process_cube
+from dataset import dataset_fingerprint
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame(
+        {
+            "uf": pd.Categorical(["SP", "RJ", "SP", None, "MG", "SP", "RJ", "MG"]),
+            "ano": pd.array([2019, 2019, 2020, 2020, None, 2021, 2021, 2019], dtype="Int16"),
+            "valor": [10.0, 20.0, np.nan, 5.0, 1.0, 2.5, 7.5, 3.0],
+        }
+    )
+
+
+def cube_of(df):
+    return Cube.from_columns({"uf": df["uf"], "ano": df["ano"]}, {"valor": df["valor"]})
+
+
+def as_dict(series):
+    return {str(label): value for label, value in series.items() if value}
+
+
+def test_from_columns_matches_groupby(df):
+    cube = cube_of(df)
+    assert cube.totals() == {COUNT: 8, "valor": pytest.approx(49.0)}
+    assert as_dict(cube.series("uf")) == {"SP": 3, "RJ": 2, "MG": 2}
+    assert as_dict(cube.series("ano")) == {"2019": 3, "2020": 2, "2021": 2}
+    assert as_dict(cube.series("uf", "valor")) == pytest.approx({"SP": 12.5, "RJ": 27.5, "MG": 4.0})
+    # Nulos ficam numa célula própria, fora das séries
+    assert len(cube) == len(df[["uf", "ano"]].astype(object).drop_duplicates())
+
+
+def test_rollup_and_slice(df):
+    cube = cube_of(df)
+    rolled = cube.rollup(["uf"])
+    assert rolled.dimensions == ["uf"]
+    assert as_dict(rolled.series("uf")) == as_dict(cube.series("uf"))
+
+    sliced = cube.slice({"uf": ["SP", "MG"], "ano": [2019, "2021"]})
+    expected = cube_of(df.loc[[0, 5, 7]])
+    assert sliced.totals() == pytest.approx(expected.totals())
+    assert as_dict(sliced.series("uf")) == as_dict(expected.series("uf"))
+    assert cube.slice({"uf": []}).totals() == cube.totals()
+    assert cube.slice({"uf": ["XX"]}).totals() == {COUNT: 0, "valor": 0.0}
+
+
+def test_merge_and_scaled(df):
+    first, second = cube_of(df.iloc[:5]), cube_of(df.iloc[5:])
+    full = cube_of(df)
+    merged = first.merge(second)
+    assert merged.totals() == pytest.approx(full.totals())
+    for dimension in ("uf", "ano"):
+        assert as_dict(merged.series(dimension)) == pytest.approx(as_dict(full.series(dimension)))
+    assert len(merged) == len(full)
+
+    # Descontar uma parte devolve a outra, sem as células zeradas
+    removed = full.merge(second.scaled(-1))
+    assert removed.totals() == pytest.approx(first.totals())
+    assert len(removed) == len(first)
+    assert as_dict(removed.series("uf")) == as_dict(first.series("uf"))
+    assert len(full.merge(full.scaled(-1))) == 0
+
+
+def test_arrow_roundtrip(df):
+    cube = cube_of(df)
+    restored = Cube.from_arrow(cube.to_arrow())
+    assert restored.dimensions == cube.dimensions
+    assert restored.totals() == pytest.approx(cube.totals())
+    assert as_dict(restored.series("ano")) == as_dict(cube.series("ano"))
+
+
+def test_build_process_cube_poles(df):
+    df = df.rename(columns={"valor": "valorCausa.valor"})
+    cube = build_process_cube(df, np.array([0, 2, 5]), np.array([2, 3]))
+    assert as_dict(cube.series("polo")) == {"NENHUM": 4, "ATIVO": 2, "PASSIVO": 1, "AMBOS": 1}
+    assert cube.slice({"polo": ["ATIVO", "AMBOS"]}).totals()["valor_causa"] == pytest.approx(12.5)
+
+
+def test_cube_store(df, tmp_path):
+    store = CubeStore(tmp_path / "cubos", version="v1")
+    cube = cube_of(df)
+    assert store.get("dataset", "00000000") is None
+    store.put("dataset", "00000000", cube)
+    assert store.get("dataset", "00000000").totals() == pytest.approx(cube.totals())
+    # Cubo gravado por outra versão do código não é lido
+    assert CubeStore(tmp_path / "cubos", version="v2").get("dataset", "00000000") is None
+
+
+def test_cube_store_prune(df, tmp_path):
+    source = tmp_path / "dados.json"
+    source.write_text('{"processos": []}')
+    sources = [str(source)]
+    store = CubeStore(tmp_path / "cubos", version="v1")
+    store.put(dataset_fingerprint(sources, {}), "00000000", cube_of(df), sources, {})
+    assert store.prune(dataset_fingerprint) == 0
+    assert CubeStore(tmp_path / "cubos", version="v2").prune(dataset_fingerprint) == 1
+
+    store.put(dataset_fingerprint(sources, {}), "00000000", cube_of(df), sources, {})
+    source.write_text('{"processos": [{}]}')
+    assert store.prune(dataset_fingerprint) == 1
+    assert not any((tmp_path / "cubos").iterdir())
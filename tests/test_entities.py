@@ -0,0 +1,73 @@
+import pandas as pd
+
+import main
+from entities import cnpj_roots, resolve_entities
+from main import extract_top_parties
+
+
+def test_resolve_entities_without_names():
+    assert resolve_entities([]) == {}
+    assert resolve_entities(pd.Series([], dtype=object)) == {}
+
+
+def test_resolve_entities_merges_abbreviations():
+    names = ["BANCO ALFA", "BCO ALFA", "BANCO BETA"]
+    assert resolve_entities(names, weights=[1, 5, 3]) == {"BANCO ALFA": "BCO ALFA"}
+
+
+def test_resolve_entities_requires_shared_identifier():
+    names = ["BANCO ALFA", "BCO ALFA"]
+    same = [frozenset({"11222333"}), frozenset({"11222333", "44555666"})]
+    other = [frozenset({"11222333"}), frozenset({"44555666"})]
+    missing = [frozenset(), frozenset()]
+    assert resolve_entities(names, [3, 1], identifiers=same) == {"BCO ALFA": "BANCO ALFA"}
+    assert resolve_entities(names, [3, 1], identifiers=other) == {}
+    assert resolve_entities(names, [3, 1], identifiers=missing) == {}
+
+
+def test_resolve_entities_keeps_numbered_units_apart():
+    names = ["SUPERMERCADO CENTRAL DO BRASIL FILIAL 12", "SUPERMERCADO CENTRAL DO BRASIL FILIAL 13"]
+    assert resolve_entities(names) == {}
+
+
+def test_cnpj_roots():
+    roots = cnpj_roots(pd.Series(["00.000.000/0001-91", None, "", "11222333000181"], dtype=object))
+    assert roots.tolist()[0] == "00000000"
+    assert roots.tolist()[3] == "11222333"
+    assert roots.isna().tolist() == [False, True, True, False]
+
+
+def test_top_parties_merge_only_legal_entities(monkeypatch):
+    parties = pd.DataFrame(
+        {
+            "nome": [
+                "Banco Alfa S.A.",
+                "BCO ALFA S/A",
+                "BCO ALFA",
+                "ANTONIO CARLOS PEREIRA DA SILVA",
+                "ANTONIO CARLOS PEREIRA DA SILVEIRA",
+            ],
+            "cnpj": ["11222333000181", "11.222.333/0002-62", None, None, None],
+        }
+    )
+
+    def totals(ranking):
+        return dict(zip(ranking["Nome"], ranking["Total"]))
+
+    exact = totals(extract_top_parties(parties, 10, merge_variants=False))
+    assert exact == {
+        "BCO ALFA": 2,
+        "BANCO ALFA": 1,
+        "ANTONIO CARLOS PEREIRA DA SILVA": 1,
+        "ANTONIO CARLOS PEREIRA DA SILVEIRA": 1,
+    }
+    merged = totals(extract_top_parties(parties, 10, merge_variants=True))
+    assert merged == {
+        "BCO ALFA": 3,
+        "ANTONIO CARLOS PEREIRA DA SILVA": 1,
+        "ANTONIO CARLOS PEREIRA DA SILVEIRA": 1,
+    }
+    # O padrão segue MERGE_NAME_VARIANTS, ligado; desligar é a auditoria
+    assert totals(extract_top_parties(parties, 10)) == merged
+    monkeypatch.setattr(main, "MERGE_NAME_VARIANTS", False)
+    assert totals(extract_top_parties(parties, 10)) == exact
@@ -0,0 +1,121 @@
+import pandas as pd
+import pytest
+
+import main
+from conftest import ROOT_TERM, TERM, generate
+from dataset import Dataset
+from reference import get_path, assert_matches_reference, has_term, latest_versions
+
+
+def load(paths, **options):
+    return main.load_data(paths, **{**main.DATASET_OPTIONS, "use_cache": False, **options})
+
+
+@pytest.mark.parametrize("term", [TERM, ROOT_TERM, f"{TERM},{ROOT_TERM}{generate.COMPANY_BRANCHES[1]}"])
+def test_compute_data_matches_reference(files, term):
+    paths, contents = files
+    data = main.compute_data(Dataset(load(paths)), term)
+    assert_matches_reference(data, latest_versions(contents[0] + contents[1]), term)
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{"arrow_nested": True}, {"use_cache": True}, {"fields": None}, {"chunk_size": 17}],
+    ids=["arrow_nested", "cache", "all_fields", "chunks"],
+)
+def test_load_options_do_not_change_the_result(files, options):
+    paths, contents = files
+    data = main.compute_data(Dataset(load(paths, **options)), TERM)
+    assert_matches_reference(data, latest_versions(contents[0] + contents[1]), TERM)
+
+
+def test_duplicates_are_removed(files):
+    paths, contents = files
+    df = load(paths)
+    assert df.attrs["duplicados_removidos"] == 40
+    assert len(df) == len(latest_versions(contents[0] + contents[1]))
+
+
+def test_approximate_ranking_matches_exact_counts(files, monkeypatch):
+    # Com todos os nomes cabendo no resumo, o Space-Saving é exato
+    monkeypatch.setattr(main, "TOP_NAMES_EXACT", False)
+    paths, contents = files
+    data = main.compute_data(Dataset(load(paths)), TERM)
+    assert_matches_reference(data, latest_versions(contents[0] + contents[1]), TERM)
+    assert (data["top_10_partes"]["Erro máx."] == 0).all()
+
+
+@pytest.mark.parametrize(
+    "filters, period",
+    [
+        ({"uf": ["SP", "RJ"]}, None),
+        ({"grauProcesso": [2], "statusPredictus.ramoDireito": ["CÍVEL", "TRABALHISTA"]}, None),
+        ({}, (pd.Timestamp("2012-03-15"), pd.Timestamp("2019-07-01"))),
+        ({"uf": ["SP"]}, (pd.Timestamp("2010-01-01"), pd.Timestamp("2016-01-01"))),
+    ],
+)
+def test_filtered_dataset_matches_reference(files, filters, period):
+    paths, contents = files
+    records = latest_versions(contents[0] + contents[1])
+    dataset = Dataset(load(paths))
+    # O cubo completo já montado, como no painel, antes do recorte
+    main.compute_data(dataset, TERM)
+
+    selected = [
+        record
+        for record in records
+        if all(get_path(record, dimension) in values for dimension, values in filters.items())
+        and (
+            period is None
+            or (record["dataDistribuicao"] is not None and period[0] <= pd.Timestamp(record["dataDistribuicao"]) < period[1])
+        )
+    ]
+    subset = dataset.filtered(filters, period)
+    assert len(subset) == len(selected)
+    assert_matches_reference(main.compute_data(subset, TERM), selected, TERM)
+
+
+@pytest.mark.parametrize(
+    "filters, period",
+    [
+        ({"uf": ["RN"], "grauProcesso": [3], "tribunal": ["TST"]}, None),
+        ({"uf": ["XX"]}, None),
+        ({}, (pd.Timestamp("1990-01-01"), pd.Timestamp("1991-01-01"))),
+    ],
+)
+def test_empty_selection(files, filters, period):
+    paths, _contents = files
+    dataset = Dataset(load(paths))
+    subset = dataset.filtered(filters, period)
+    assert len(subset) == 0
+
+    data = main.compute_data(subset, TERM)
+    for key, value in data.items():
+        if key.startswith(("qtd_", "valor_")):
+            assert value == 0, key
+        elif key in main.HISTOGRAMAS:
+            assert (value.iloc[:, 1] == 0).all(), key
+        else:
+            assert len(value) == 0, key
+    assert_matches_reference(data, [], TERM)
+
+
+def test_term_without_processes(files):
+    paths, contents = files
+    records = latest_versions(contents[0] + contents[1])
+    data = main.compute_data(Dataset(load(paths)), "12345678")
+    assert not any(has_term(record, "12345678", "ATIVO") for record in records)
+    assert data["qtd_polo_ativo"] == data["qtd_polo_passivo"] == 0
+    assert data["qtd_processos"] == len(records)
+
+
+def test_extract_data_caches_by_dataset_and_term(files):
+    paths, _contents = files
+    dataset = main.load_dataset(paths, **{**main.DATASET_OPTIONS, "use_cache": False})
+    first = main.extract_data(dataset, TERM)
+    # Mesmo termo escrito de outro jeito, mesma entrada do cache
+    again = main.extract_data(dataset, "00.000.000/0001-91")
+    assert first.keys() == again.keys()
+    pd.testing.assert_frame_equal(first["top_10_partes"], again["top_10_partes"])
+    first["top_10_partes"].drop(index=first["top_10_partes"].index, inplace=True)
+    assert len(main.extract_data(dataset, TERM)["top_10_partes"]) > 0
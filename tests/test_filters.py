@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from filters import FilterIndex, TimeIndex, filters_key, normalize_filters
+from main import DATASET_OPTIONS, load_data
+from schema import YEAR_COLUMN
+
+
+@pytest.fixture
+def df(files):
+    paths, _contents = files
+    return load_data(paths, **{**DATASET_OPTIONS, "use_cache": False})
+
+
+def test_normalize_filters_and_key():
+    assert normalize_filters({"uf": ["SP", "RJ", "SP"], "tribunal": [], "grauProcesso": [2, 1]}) == {
+        "grauProcesso": [1, 2],
+        "uf": ["RJ", "SP"],
+    }
+    assert filters_key({}) == filters_key(None) == filters_key({"uf": []}) == ""
+    assert filters_key({"uf": ["SP", "RJ"]}) == filters_key({"uf": ["RJ", "SP"], "tribunal": []})
+    assert filters_key({"uf": ["SP"]}) != filters_key({"uf": ["SP"]}, ("2020-01-01", "2021-01-01"))
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {},
+        {"uf": ["SP"]},
+        {"uf": ["SP", "RJ"], "grauProcesso": [1]},
+        {"statusPredictus.ramoDireito": ["CÍVEL"], YEAR_COLUMN: [2015, 2016]},
+        {"uf": ["XX"]},
+        {"uf": ["SP"], "tribunal": ["TJRJ"]},
+        {"coluna_inexistente": ["x"]},
+    ],
+)
+def test_filter_index_matches_mask(df, filters):
+    index = FilterIndex(df)
+    mask = np.ones(len(df), dtype=bool)
+    for dimension, values in filters.items():
+        column = df[dimension] if dimension in df.columns else pd.Series(np.nan, index=df.index)
+        mask &= column.isin(values).to_numpy(dtype=bool)
+    assert index.rows(filters).tolist() == np.flatnonzero(mask).tolist()
+    assert index.count(filters) == mask.sum()
+
+
+def test_filter_index_values(df):
+    index = FilterIndex(df)
+    assert len(index) == len(df)
+    assert "uf" in index and "coluna_inexistente" not in index
+    assert sorted(index.values("uf")) == sorted(df["uf"].dropna().unique())
+    assert index.match(YEAR_COLUMN, ["2015", 2016, "1900"]) == [2015, 2016]
+
+
+@pytest.fixture
+def dates():
+    values = pd.Series(
+        pd.to_datetime(
+            ["2019-05-01", None, "2018-12-31 23:00", "2019-01-01", "2020-03-01", "2018-01-01", "2019-12-31", None],
+            format="mixed",
+        )
+    )
+    return values, values.dt.year.astype("Int16")
+
+
+@pytest.mark.parametrize(
+    "start, end",
+    [
+        (None, None),
+        ("2019-01-01", "2020-01-01"),
+        ("2018-06-01", "2019-06-01"),
+        ("2018-12-31 23:00", "2019-01-01"),
+        ("2021-01-01", None),
+        (None, "2018-01-01"),
+        ("2019-06-01", "2019-01-01"),
+    ],
+)
+def test_time_index_rows_and_split(dates, start, end):
+    values, years = dates
+    index = TimeIndex(values, years)
+    lower = pd.Timestamp.min if start is None else pd.Timestamp(start)
+    upper = pd.Timestamp.max if end is None else pd.Timestamp(end)
+    expected = values.index[values.notna() & (values >= lower) & (values < upper)]
+
+    rows = index.rows(start, end)
+    assert sorted(rows.tolist()) == expected.tolist()
+    assert values[rows].is_monotonic_increasing
+
+    full, boundary = index.split(start, end)
+    in_full = years[expected].isin(full).to_numpy(dtype=bool)
+    assert sorted(boundary.tolist()) == expected[~in_full].tolist()
+    # Um ano só é inteiro se todas as suas datas estão no período
+    for year in full:
+        assert set(values.index[(years == year).fillna(False).to_numpy(dtype=bool)]) <= set(expected)
+
+
+def test_time_index_without_dates():
+    values = pd.Series(pd.to_datetime([None, None]))
+    index = TimeIndex(values, values.dt.year.astype("Int16"))
+    assert len(index) == 0
+    assert index.bounds() == (None, None)
+    assert index.rows().tolist() == []
+    full, boundary = index.split("2019-01-01", "2020-01-01")
+    assert full == [] and boundary.tolist() == []
+
+    empty = pd.Series([], dtype="datetime64[ns]")
+    assert len(TimeIndex(empty, empty.dt.year.astype("Int16"))) == 0
+
+
+def test_time_index_bounds(dates):
+    values, years = dates
+    assert TimeIndex(values, years).bounds() == (pd.Timestamp("2018-01-01"), pd.Timestamp("2020-03-01"))
@@ -0,0 +1,46 @@
+import random
+from collections import Counter
+
+import pytest
+
+from heavy_hitters import SpaceSaving
+
+
+def zipf_stream(size, distinct=500, seed=3):
+    generator = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    return generator.choices([f"item{rank}" for rank in range(distinct)], weights=weights, k=size)
+
+
+def test_exact_while_items_fit():
+    stream = zipf_stream(5_000, distinct=50)
+    summary = SpaceSaving(capacity=100).update_stream(stream, batch_size=333)
+    exact = Counter(stream)
+    assert summary.total == len(stream)
+    assert summary.error_bound == 0
+    assert [(item, count) for item, count, _error in summary.top(10)] == [
+        (item, exact[item]) for item, _count, _error in summary.top(10)
+    ]
+    assert sorted(count for _item, count, _error in summary.top(10)) == sorted(count for _item, count in exact.most_common(10))
+
+
+@pytest.mark.parametrize("capacity, batch_size", [(20, 1), (50, 100), (100, 1_000)])
+def test_bounds_with_limited_memory(capacity, batch_size):
+    stream = zipf_stream(20_000)
+    summary = SpaceSaving(capacity).update_stream(stream, batch_size=batch_size)
+    exact = Counter(stream)
+    top = summary.top(capacity)
+    assert len(top) <= capacity
+    for item, count, error in top:
+        # A estimativa nunca fica abaixo do real nem acima do real mais o erro
+        assert count - error <= exact[item] <= count
+    listed = {item for item, _count, _error in top}
+    assert all(count <= summary.error_bound for item, count in exact.items() if item not in listed)
+    # Os itens mais frequentes de verdade estão no topo do resumo
+    assert exact.most_common(1)[0][0] == summary.top(1)[0][0]
+
+
+def test_empty_stream():
+    summary = SpaceSaving(10).update_stream(iter(()))
+    assert summary.total == 0
+    assert summary.top(5) == []
@@ -0,0 +1,75 @@
+import pytest
+
+import main
+from conftest import ROOT_TERM, TERM, write_json
+from dataset import dataset_fingerprint
+from incremental import PanelState, append_files
+from ingest import DEDUP_MERGE_PARTIES
+from reference import assert_matches_reference, latest_versions
+
+
+def load(paths):
+    return main.load_data(paths, **{**main.DATASET_OPTIONS, "use_cache": False})
+
+
+@pytest.mark.parametrize("term", [TERM, ROOT_TERM])
+def test_panel_state_matches_reference(files, term):
+    paths, contents = files
+    state = PanelState.from_frame(load(paths), term)
+    assert_matches_reference(state.to_data(), latest_versions(contents[0] + contents[1]), term)
+
+
+def test_panel_state_merge_adds_and_removes(tmp_path, records):
+    first, second = records[:150], records[150:]
+    a = PanelState.from_frame(load([write_json(tmp_path / "a.json", first)]), TERM)
+    b = PanelState.from_frame(load([write_json(tmp_path / "b.json", second)]), TERM)
+    assert_matches_reference(a.merge(b).to_data(), records, TERM)
+    assert_matches_reference(a.merge(b).merge(b, sign=-1).to_data(), first, TERM)
+    assert_matches_reference(a.merge(a, sign=-1).to_data(), [], TERM)
+
+
+def test_panel_state_save_and_load(tmp_path, files):
+    paths, contents = files
+    state = PanelState.from_frame(load(paths), TERM)
+    state.save(str(tmp_path / "estado"))
+    loaded = PanelState.load(str(tmp_path / "estado"))
+    assert_matches_reference(loaded.to_data(), latest_versions(contents[0] + contents[1]), TERM)
+
+
+def test_append_files_matches_full_load(tmp_path, files):
+    paths, contents = files
+    root = str(tmp_path / "estados")
+
+    state, results = append_files(TERM, paths[:1], root=root)
+    assert results[0][1] == (len(contents[0]), 0)
+
+    # O segundo arquivo traz 40 versões novas de processos do primeiro
+    state, results = append_files(TERM, paths, root=root)
+    assert results[0][1] is None
+    assert results[1][1] == (len(contents[1]), 40)
+
+    expected = latest_versions(contents[0] + contents[1])
+    assert_matches_reference(state.panels.to_data(), expected, TERM)
+    snapshot = main.SNAPSHOTS.get(dataset_fingerprint(paths, main.DATASET_OPTIONS), TERM)
+    assert_matches_reference(snapshot, expected, TERM)
+
+    # O painel aberto sobre os mesmos arquivos usa o snapshot sem ler o frame
+    dataset = main.load_dataset(paths, **main.DATASET_OPTIONS)
+    assert_matches_reference(main.extract_data(dataset, TERM), expected, TERM)
+    assert "df" not in dataset.__dict__
+
+
+def test_append_files_rejects_changed_source(tmp_path, files):
+    paths, contents = files
+    root = str(tmp_path / "estados")
+    append_files(TERM, paths[:1], root=root)
+    write_json(paths[0], contents[0][:10])
+    with pytest.raises(ValueError):
+        append_files(TERM, paths, root=root)
+
+
+def test_append_files_requires_latest_wins(tmp_path, files, monkeypatch):
+    paths, _contents = files
+    monkeypatch.setitem(main.DATASET_OPTIONS, "dedup", DEDUP_MERGE_PARTIES)
+    with pytest.raises(ValueError):
+        append_files(TERM, paths, root=str(tmp_path / "estados"), rebuild=True)
@@ -0,0 +1,168 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+import ingest
+from conftest import make_records, write_json, write_ndjson
+from ingest import (
+    DEDUP_LATEST,
+    DEDUP_MERGE_PARTIES,
+    DataLoadError,
+    compile_projection,
+    deduplicate,
+    iter_json_records,
+    iter_ndjson_records,
+    load_company_file,
+    load_files,
+    project_record,
+)
+from main import EXTRACT_DATA_FIELDS
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('{"processos": [{"a": 1}, {"a": [1, 2]}, 3]}', [{"a": 1}, {"a": [1, 2]}, 3]),
+        ('  [ {"a": 1} ,\n {"b": null} ]  ', [{"a": 1}, {"b": None}]),
+        ('{"processos": []}', []),
+        ("{}", []),
+        ('{"processo": {"a": 1}}', [{"a": 1}]),
+    ],
+)
+def test_iter_json_records(text, expected):
+    assert list(iter_json_records(io.StringIO(text))) == expected
+
+
+@pytest.mark.parametrize("read_size", [1, 3, 64])
+def test_json_stream_across_buffer_boundaries(read_size):
+    records = make_records(20)
+    text = json.dumps({"processos": records, "outra": [1]}, ensure_ascii=False)
+    stream = ingest._JsonStream(io.StringIO(text), read_size)
+    stream.expect("{")
+    stream.value()
+    stream.expect(":")
+    assert list(ingest._iter_array(stream)) == records
+
+
+def test_iter_json_records_rejects_invalid_json():
+    with pytest.raises(ValueError):
+        list(iter_json_records(io.StringIO('{"processos": [{"a": 1} {"a": 2}]}')))
+
+
+def test_iter_ndjson_records_skips_blank_lines():
+    text = '{"a": 1}\n\n  \n{"a": 2}\n'
+    assert list(iter_ndjson_records(io.StringIO(text))) == [{"a": 1}, {"a": 2}]
+
+
+def test_compile_projection():
+    tree = compile_projection(["uf", "partes.nome", "partes.advogados.oab.numero", "valorCausa"])
+    assert tree == {
+        "uf": None,
+        "partes": {"nome": None, "advogados": {"oab": {"numero": None}}},
+        "valorCausa": None,
+    }
+    # Um prefixo mantém o valor inteiro, em qualquer ordem
+    assert compile_projection(["a", "a.b"]) == compile_projection(["a.b", "a"]) == {"a": None}
+
+
+def test_project_record():
+    record = {
+        "uf": "SP",
+        "movimentos": [{"data": "2020-01-01"}],
+        "valorCausa": None,
+        "partes": [
+            {"nome": "A", "cpf": "1", "advogados": [{"nome": "X", "oab": {"numero": "9", "uf": "SP"}}]},
+            {"nome": "B", "advogados": None},
+        ],
+    }
+    tree = compile_projection(["uf", "valorCausa.valor", "partes.nome", "partes.advogados.oab.numero"])
+    assert project_record(record, tree) == {
+        "uf": "SP",
+        "valorCausa": None,
+        "partes": [
+            {"nome": "A", "advogados": [{"oab": {"numero": "9"}}]},
+            {"nome": "B", "advogados": None},
+        ],
+    }
+
+
+@pytest.mark.parametrize("fields", [None, EXTRACT_DATA_FIELDS])
+@pytest.mark.parametrize("chunk_size", [1, 7, 10_000])
+def test_load_company_file_matches_json_normalize(tmp_path, fields, chunk_size):
+    records = make_records(60)
+    # Bloco inteiro sem um campo: o dtype da coluna tem que ser o do frame todo
+    for record in records[:20]:
+        record["valorCausa"] = None
+    if fields is not None:
+        tree = compile_projection(fields)
+        expected = pd.json_normalize([project_record(record, tree) for record in records])
+    else:
+        expected = pd.json_normalize(records)
+    for path in (write_json(tmp_path / "dados.json", records), write_ndjson(tmp_path / "dados.ndjson", records)):
+        df = load_company_file(path, chunk_size=chunk_size, fields=fields)
+        pd.testing.assert_frame_equal(df, expected, check_like=True)
+
+
+def test_load_files_keeps_order_and_reports_errors(tmp_path):
+    paths = [write_json(tmp_path / f"dados{index}.json", make_records(5, start=index * 5)) for index in range(3)]
+    frames = load_files(paths, workers=1)
+    assert [frame["numeroProcessoUnico"].tolist() for frame in frames] == [
+        [record["numeroProcessoUnico"] for record in make_records(5, start=index * 5)] for index in range(3)
+    ]
+
+    missing = str(tmp_path / "ausente.json")
+    with pytest.raises(DataLoadError) as error:
+        load_files(paths + [missing], workers=1)
+    assert list(error.value.errors) == [missing]
+
+
+def _processes():
+    return pd.DataFrame(
+        {
+            "numeroProcessoUnico": ["a", "b", "a", None, None, "c", "b"],
+            "versao": [1, 1, 2, 1, 2, 1, 2],
+            "partes": [
+                [{"nome": "X", "polo": "ATIVO", "cnpj": "1"}],
+                [{"nome": "Y", "polo": "PASSIVO", "cnpj": None}],
+                [{"nome": "Z", "polo": "ATIVO", "cnpj": "2"}, {"nome": "X", "polo": "ATIVO", "cnpj": "1"}],
+                [],
+                [],
+                [{"nome": "W", "polo": "ATIVO", "cnpj": None}],
+                [{"nome": "Y", "polo": "PASSIVO", "cnpj": None}],
+            ],
+        }
+    )
+
+
+def test_deduplicate_latest():
+    df, removed = deduplicate(_processes(), policy=DEDUP_LATEST)
+    assert removed == 2
+    assert df["numeroProcessoUnico"].tolist() == ["a", None, None, "c", "b"]
+    assert df["versao"].tolist() == [2, 1, 2, 1, 2]
+    assert df.index.tolist() == list(range(5))
+    assert df["partes"][0] == [{"nome": "Z", "polo": "ATIVO", "cnpj": "2"}, {"nome": "X", "polo": "ATIVO", "cnpj": "1"}]
+
+
+def test_deduplicate_merge_parties():
+    df = _processes()
+    df.loc[0, "partes"].append({"nome": "V", "polo": "PASSIVO", "cnpj": "3"})
+    df, removed = deduplicate(df, policy=DEDUP_MERGE_PARTIES)
+    assert removed == 2
+    # Partes da última versão primeiro, depois as que só as anteriores têm
+    assert [party["nome"] for party in df["partes"][0]] == ["Z", "X", "V"]
+    assert [party["nome"] for party in df["partes"][4]] == ["Y"]
+    assert [party["nome"] for party in df["partes"][3]] == ["W"]
+
+
+def test_deduplicate_without_duplicates_or_key():
+    df = _processes().drop_duplicates("numeroProcessoUnico", keep="last")
+    assert deduplicate(df)[1] == 0
+    assert deduplicate(df.drop(columns="numeroProcessoUnico"))[1] == 0
+    assert deduplicate(df.iloc[:0])[1] == 0
+
+
+def test_deduplicate_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        deduplicate(_processes(), policy="primeira")
@@ -0,0 +1,60 @@
+import fcntl
+import os
+from functools import partial
+
+import pandas as pd
+import pytest
+
+import main
+from conftest import TERM, make_records, write_json
+from dataset import dataset_fingerprint
+from reference import assert_matches_reference, latest_versions
+from registry import DatasetRegistry
+
+OPTIONS = {**main.DATASET_OPTIONS, "use_cache": False}
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return DatasetRegistry(tmp_path / "compartilhado")
+
+
+def attach(registry, paths):
+    return registry.attach(paths, partial(main.load_data, **OPTIONS), options=OPTIONS)
+
+
+def test_attach_shares_one_mapped_dataset(registry, files):
+    paths, contents = files
+    with attach(registry, paths) as first, attach(registry, paths) as second:
+        assert first.dataset is second.dataset
+        assert registry.references(first.dataset.fingerprint) == 2
+        df = first.dataset.df
+        # Aninhadas e textos ficam nos buffers do arquivo mapeado
+        for column in ("partes", "assuntosCNJ", "numeroProcessoUnico"):
+            assert isinstance(df[column].dtype, pd.ArrowDtype), column
+        data = main.compute_data(first.dataset, TERM)
+        assert_matches_reference(data, latest_versions(contents[0] + contents[1]), TERM)
+    assert registry.references(first.dataset.fingerprint) == 0
+
+
+def test_stale_version_is_kept_while_locked(registry, tmp_path):
+    path = write_json(tmp_path / "dados.json", make_records(5))
+
+    def prepare():
+        registry.prepare([path], partial(main.load_data, **OPTIONS), options=OPTIONS)
+        return dataset_fingerprint([path], OPTIONS)
+
+    first = prepare()
+    # Outro processo usando a primeira versão: trava compartilhada própria
+    fd = os.open(registry._lock_path(first), os.O_RDWR | os.O_CREAT)
+    fcntl.flock(fd, fcntl.LOCK_SH)
+    write_json(path, make_records(6))
+    second = prepare()
+    assert os.path.exists(registry._path(first))
+
+    os.close(fd)
+    write_json(path, make_records(7))
+    third = prepare()
+    assert not os.path.exists(registry._path(first))
+    assert not os.path.exists(registry._path(second))
+    assert os.path.exists(registry._path(third))
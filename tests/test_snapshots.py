@@ -0,0 +1,27 @@
+import pandas as pd
+
+import main
+from conftest import TERM
+from dataset import Dataset
+from snapshots import SnapshotStore
+
+
+def test_snapshot_roundtrip_matches_compute_data(tmp_path, files):
+    paths, _contents = files
+    df = main.load_data(paths, **{**main.DATASET_OPTIONS, "use_cache": False})
+    data = main.compute_data(Dataset(df), TERM)
+
+    store = SnapshotStore(str(tmp_path / "snapshots"), version="v1")
+    store.put("dataset", TERM, data, paths, main.DATASET_OPTIONS)
+    restored = store.get("dataset", TERM)
+
+    assert restored.keys() == data.keys()
+    for key, value in data.items():
+        if isinstance(value, pd.DataFrame):
+            pd.testing.assert_frame_equal(restored[key], value, obj=key)
+        else:
+            assert restored[key] == value, key
+    # Os rótulos dos assuntos voltam como listas, não arrays
+    assert all(isinstance(label, list) for label in restored["distribuicao_assuntos"]["Assunto"])
+
+    assert SnapshotStore(str(tmp_path / "snapshots"), version="v2").get("dataset", TERM) is None
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import ROOT_TERM, TERM, generate
+from reference import has_term
+from tables import CnpjIndex, arrow_nested_columns, build_parties_tables, normalize_term
+
+
+@pytest.mark.parametrize(
+    "term, expected",
+    [
+        ("00000000000191", "00000000000191"),
+        ("00.000.000/0001-91", "00000000000191"),
+        ("00000000", "00000000"),
+        (" 11222333000181 , 00000000 ", "00000000,11222333000181"),
+        (["11222333000181", "00000000", "00.000.000"], "00000000,11222333000181"),
+        ("00000000,", "00000000"),
+    ],
+)
+def test_normalize_term(term, expected):
+    assert normalize_term(term) == expected
+
+
+@pytest.mark.parametrize("term", ["123", "000000000001", "00000000,123456789", "", " , ", []])
+def test_normalize_term_rejects_invalid(term):
+    with pytest.raises(ValueError):
+        normalize_term(term)
+
+
+@pytest.fixture
+def processes(records):
+    return pd.DataFrame({"partes": [record["partes"] for record in records]})
+
+
+TERMS = [
+    TERM,
+    ROOT_TERM,
+    ROOT_TERM + generate.COMPANY_BRANCHES[2],
+    f"{TERM},{ROOT_TERM}",
+    f"{TERM},{ROOT_TERM}{generate.COMPANY_BRANCHES[3]}",
+    "99999999",
+    "99888777000100",
+]
+
+
+@pytest.mark.parametrize("arrow", [False, True])
+@pytest.mark.parametrize("term", TERMS)
+def test_cnpj_index_matches_scan(records, processes, arrow, term):
+    df = arrow_nested_columns(processes) if arrow else processes
+    index = CnpjIndex(build_parties_tables(df)[0])
+    for polo in ("ATIVO", "PASSIVO", "TERCEIRO", "DESCONHECIDO"):
+        expected = [row for row, record in enumerate(records) if has_term(record, term, polo)]
+        rows = index.rows(term, polo)
+        assert rows.tolist() == expected, polo
+        assert np.all(np.diff(rows) > 0)
+
+
+def test_cnpj_index_root_covers_branches(records, processes):
+    index = CnpjIndex(build_parties_tables(processes)[0])
+    branches = [index.rows(ROOT_TERM + branch, "PASSIVO") for branch in generate.COMPANY_BRANCHES]
+    assert index.rows(ROOT_TERM, "PASSIVO").tolist() == np.unique(np.concatenate(branches)).tolist()
+    # O CNPJ formatado do processo de borda entra pela raiz e pelo CNPJ
+    formatted = next(row for row, record in enumerate(records) if record["partes"] and record["partes"][0].get("cnpj") == "00.000.000/0001-91")
+    assert formatted in index.rows(TERM, "PASSIVO")
+
+
+def test_build_parties_tables(processes, records):
+    parties, lawyers = build_parties_tables(processes)
+    assert len(parties) == sum(len(record["partes"]) for record in records)
+    assert parties["row"].tolist() == [row for row, record in enumerate(records) for _party in record["partes"]]
+    expected = [
+        (row, lawyer["nome"])
+        for row, record in enumerate(records)
+        for party in record["partes"]
+        for lawyer in party.get("advogados") or []
+    ]
+    assert list(zip(lawyers["row"], lawyers["nome"])) == expected
+    # Cada advogado aponta para a sua parte
+    assert (parties["row"].to_numpy()[lawyers["party"].to_numpy()] == lawyers["row"].to_numpy()).all()